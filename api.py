@@ -0,0 +1,617 @@
+# Minecraft Server Management Tool v1.0.0-release
+# Local HTTP/JSON control API. A single asyncio loop serves every client; blocking
+# backend calls run in the loop's thread pool, and console/metrics streams are served
+# as long-polls or WebSockets without a thread per connection.
+
+import asyncio
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import signal
+import struct
+import time
+import urllib.parse
+
+import core
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_BODY_BYTES = 1024 * 1024
+LONG_POLL_MAX_SECONDS = 60
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# --- Console Notifications ---
+class ConsoleFeed:
+    """
+    Bridges supervisor output threads to the event loop. Each server gets one listener;
+    bursts of lines schedule at most one wake-up until the loop has handled it.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.events = {}
+        self.watched = set()
+        self.pending = set()
+
+    def event_for(self, supervisor):
+        path = supervisor.server_path
+        if path not in self.watched:
+            self.watched.add(path)
+            supervisor.add_listener(lambda line: self._schedule(path))
+        event = self.events.get(path)
+        if event is None:
+            event = self.events[path] = asyncio.Event()
+        return event
+
+    def _schedule(self, path):
+        if path not in self.pending:
+            self.pending.add(path)
+            self.loop.call_soon_threadsafe(self._wake, path)
+
+    def _wake(self, path):
+        self.pending.discard(path)
+        event = self.events.pop(path, None)
+        if event is not None:
+            event.set()
+
+# --- Status Helpers ---
+def describe_metrics(server_path, since=0.0):
+    """Host samples newer than since plus the parser's game stats for one server."""
+    samples = []
+    history = core.get_server_metrics(server_path)
+    if history is not None and history.count:
+        series = {field: history.series(field) for field in history.fields}
+        for index, timestamp in enumerate(history.timestamps()):
+            if timestamp > since:
+                samples.append(dict({field: values[index] for field, values in series.items()}, time=timestamp))
+    supervisor = core.SUPERVISORS.get(os.path.normpath(server_path))
+    game = None
+    if supervisor is not None:
+        parser = supervisor.parser
+        game = {'ready': parser.ready, 'players': sorted(parser.players), 'tps': parser.tps, 'mspt': parser.mspt,
+                'ticks_behind': parser.ticks_behind, 'startup_seconds': parser.startup_seconds}
+    return {'samples': samples, 'game': game}
+
+def describe_server(server):
+    path = server['path']
+    supervisor = core.SUPERVISORS.get(os.path.normpath(path))
+    supervised = supervisor is not None and supervisor.is_running()
+    return dict(server, running=supervised or core.find_server_process(path) is not None, supervised=supervised)
+
+def stop_any_server(server_path, timeout):
+    if core.is_server_running(server_path):
+        return core.stop_server(server_path, timeout)
+    proc = core.find_server_process(server_path)
+    if proc is None:
+        raise Exception(f"伺服器 {os.path.basename(server_path)} 沒有在執行中！")
+    return core.terminate_server_process(proc, timeout)
+
+# --- HTTP Server ---
+class ControlServer:
+    """
+    Routes:
+      GET  /api/servers                      scan_for_servers with running state
+      POST /api/servers/start|stop|backup    {"path": ...}; backup with "queue": true goes through the backup queue
+      POST /api/servers/command              {"path": ..., "command": ...}
+      POST /api/servers/affinity             {"path": ..., "cpus": [0, 1] or "0-3,6" or "all"}
+      POST /api/servers/restart              {"path": ..., "countdown": true}; warns players, saves, stops and starts again
+      GET  /api/capacity?running=            memory plan of registered (or running) servers with suggested heaps
+      GET  /api/properties?path=             server.properties as an object
+      POST /api/properties                   {"path": ..., "values": {...}}
+      POST /api/properties/batch             {"paths": [...] and/or "core"/"version", "values": {...}, "remove": [...]}
+      GET  /api/jvm?path=                    JVM profile, generated arguments and per-profile run comparison
+      POST /api/jvm                          {"path": ..., "profile"/"min_ram_mb"/"max_ram_mb"/"extra_args": ...}
+      GET  /api/backups?path=                backups, schedule and next run of a server
+      GET  /api/backups/queue                running, queued and recent backup jobs
+      POST /api/backups/schedule             {"path": ..., "schedule": cron expression, "off" or null for the default}
+      POST /api/backups/prune                {"path": ..., "dry_run": false}
+      GET  /api/backups/files?path=&name=&prefix=   folders and files inside a backup, from its cached index
+      POST /api/backups/restore              {"path": ..., "name": ..., and optionally "dimension" or "files": [...]}
+      GET  /api/world?path=&inhabited=       per-dimension region file statistics
+      POST /api/world/prune                  {"path": ..., "max_inhabited_seconds": ..., "dimensions": [...], "dry_run": false}
+      GET  /api/pregen                       status of every world pre-generation job (chunks/s, ETA, memory)
+      POST /api/pregen/start                 {"path": ..., "radius": blocks, "center": [x, z], "method": ..., "dimension": ...}
+      POST /api/pregen/pause|resume|cancel   {"path": ...}
+      GET  /api/restarts                     running and recent restarts and the next scheduled ones
+      POST /api/restarts/schedule            {"path": ..., "schedule": cron expression, "off" or null for the default}
+      POST /api/restarts/cancel              {"path": ...}; only before the server has been stopped
+      GET  /api/console?path=&since=&wait=   long-poll for lines after sequence 'since'
+      GET  /api/metrics?path=&since=&wait=   long-poll for samples newer than 'since'
+      GET  /api/ws?path=                     WebSocket: console lines and metrics out, commands in
+    """
+    def __init__(self, host=None, port=None, token=None):
+        settings = core.load_settings()
+        self.host = host or settings.get('api_host', '127.0.0.1')
+        self.port = port if port is not None else settings.get('api_port', 8765)
+        self.token = settings.get('api_token', '') if token is None else token
+        self.server = None
+        self.feed = None
+        self.routes = {
+            ('GET', '/api/servers'): self.list_servers,
+            ('POST', '/api/servers/start'): self.start_server,
+            ('POST', '/api/servers/stop'): self.stop_server,
+            ('POST', '/api/servers/backup'): self.backup_server,
+            ('POST', '/api/servers/command'): self.send_command,
+            ('POST', '/api/servers/affinity'): self.set_affinity,
+            ('GET', '/api/capacity'): self.get_capacity,
+            ('GET', '/api/properties'): self.get_properties,
+            ('POST', '/api/properties'): self.set_properties,
+            ('POST', '/api/properties/batch'): self.set_properties_batch,
+            ('GET', '/api/jvm'): self.get_jvm,
+            ('POST', '/api/jvm'): self.set_jvm,
+            ('GET', '/api/backups'): self.get_backups,
+            ('GET', '/api/backups/queue'): self.get_backup_queue,
+            ('POST', '/api/backups/schedule'): self.set_backup_schedule,
+            ('POST', '/api/backups/prune'): self.prune_backups,
+            ('GET', '/api/backups/files'): self.browse_backup,
+            ('POST', '/api/backups/restore'): self.restore_backup,
+            ('GET', '/api/world'): self.analyze_world,
+            ('POST', '/api/world/prune'): self.prune_world,
+            ('GET', '/api/pregen'): self.get_pregen,
+            ('POST', '/api/pregen/start'): self.start_pregen,
+            ('POST', '/api/pregen/pause'): self.pause_pregen,
+            ('POST', '/api/pregen/resume'): self.resume_pregen,
+            ('POST', '/api/pregen/cancel'): self.cancel_pregen,
+            ('POST', '/api/servers/restart'): self.restart_server,
+            ('GET', '/api/restarts'): self.get_restarts,
+            ('POST', '/api/restarts/schedule'): self.set_restart_schedule,
+            ('POST', '/api/restarts/cancel'): self.cancel_restart,
+            ('GET', '/api/console'): self.poll_console,
+            ('GET', '/api/metrics'): self.poll_metrics,
+        }
+
+    async def start(self):
+        self.feed = ConsoleFeed(asyncio.get_running_loop())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def run_in_thread(self, func, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        except ApiError:
+            raise
+        except Exception as e:
+            raise ApiError(400, str(e))
+
+    # --- Connection handling ---
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                if path == '/api/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                    await self.handle_websocket(reader, writer, query, headers)
+                    break
+                status, payload = await self.dispatch(method, path, query, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return None
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            return None
+        if length > MAX_BODY_BYTES:
+            return None
+        body = await reader.readexactly(length) if length else b''
+        url = urllib.parse.urlsplit(target)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        return method.upper(), url.path, query, headers, body
+
+    async def write_response(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+                  500: 'Internal Server Error'}.get(status, 'Error')
+        writer.write((f"HTTP/1.1 {status} {reason}\r\n"
+                      f"Content-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    def authorized(self, headers, query):
+        if not self.token:
+            return True
+        supplied = headers.get('authorization', '')
+        supplied = supplied[7:] if supplied.startswith('Bearer ') else query.get('token', '')
+        return hmac.compare_digest(supplied, self.token)
+
+    async def dispatch(self, method, path, query, headers, body):
+        if not self.authorized(headers, query):
+            return 401, {'error': "API 權杖無效"}
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return 405, {'error': f"不支援的方法：{method}"}
+            return 404, {'error': f"找不到路徑：{path}"}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError
+        except ValueError:
+            return 400, {'error': "請求內容不是有效的 JSON 物件"}
+        try:
+            return 200, await handler(dict(query, **data))
+        except ApiError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            # Anything a handler raised on the loop thread still gets a response instead of a dropped connection
+            return 500, {'error': str(e)}
+
+    # --- Route handlers ---
+    @staticmethod
+    def server_path(params):
+        path = params.get('path')
+        if not path:
+            raise ApiError(400, "缺少參數：path")
+        return os.path.normpath(os.path.abspath(path))
+
+    async def list_servers(self, params):
+        scan_path = params.get('scan_path') or core.load_settings()['scan_path']
+        servers = await self.run_in_thread(lambda: [describe_server(server) for server in core.scan_for_servers(scan_path)])
+        return {'servers': servers}
+
+    async def start_server(self, params):
+        path = self.server_path(params)
+        warning = await self.run_in_thread(core.run_server, path)
+        return {'path': path, 'running': True, 'warning': warning}
+
+    async def stop_server(self, params):
+        path = self.server_path(params)
+        exit_code = await self.run_in_thread(stop_any_server, path, params.get('timeout'))
+        return {'path': path, 'running': False, 'exit_code': exit_code}
+
+    async def backup_server(self, params):
+        path = self.server_path(params)
+        if params.get('queue'):
+            return {'path': path, 'queued': core.BACKUP_QUEUE.submit(path, 'api')}
+        name = await self.run_in_thread(core.create_backup, path, lambda text, value: None)
+        return {'path': path, 'backup': name}
+
+    async def get_backups(self, params):
+        path = self.server_path(params)
+        def describe():
+            expression = core.get_backup_schedule(core.read_server_profile(path))
+            next_run = core.CronSchedule(expression).next_after(datetime.datetime.now()) if expression else None
+            return {'path': path, 'backup_dir': core.get_backup_dir(path), 'schedule': expression,
+                    'next_run': next_run.isoformat() if next_run else None,
+                    'retention': core.get_backup_retention(path), 'backups': core.list_backups(path)}
+        return await self.run_in_thread(describe)
+
+    async def get_backup_queue(self, params):
+        return core.BACKUP_QUEUE.status()
+
+    async def set_backup_schedule(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.set_backup_schedule, path, params.get('schedule'))
+        return {'path': path, 'schedule': params.get('schedule')}
+
+    async def prune_backups(self, params):
+        path = self.server_path(params)
+        removed = await self.run_in_thread(core.prune_backups, path, bool(params.get('dry_run')))
+        return {'path': path, 'removed': removed, 'dry_run': bool(params.get('dry_run'))}
+
+    async def browse_backup(self, params):
+        path = self.server_path(params)
+        if not params.get('name'):
+            raise ApiError(400, "缺少參數：name")
+        children = await self.run_in_thread(core.browse_backup, path, params['name'], params.get('prefix', ''))
+        return {'path': path, 'name': params['name'], 'prefix': params.get('prefix', ''), 'children': children}
+
+    async def restore_backup(self, params):
+        path = self.server_path(params)
+        if not params.get('name'):
+            raise ApiError(400, "缺少參數：name")
+        files = params.get('files')
+        if isinstance(files, str):
+            files = [files]
+        restored = await self.run_in_thread(lambda: core.restore_backup(path, params['name'], lambda text, value: None,
+                                                                        dimension=params.get('dimension'), paths=files))
+        return {'path': path, 'name': params['name'], 'restored_files': restored}
+
+    async def analyze_world(self, params):
+        path = self.server_path(params)
+        inhabited = str(params.get('inhabited', '')).lower() in ('1', 'true', 'yes')
+        return await self.run_in_thread(core.analyze_world, path, inhabited)
+
+    async def prune_world(self, params):
+        path = self.server_path(params)
+        result = await self.run_in_thread(core.prune_world, path, params.get('max_inhabited_seconds'),
+                                          params.get('dimensions'), bool(params.get('dry_run')))
+        return dict(result, path=path)
+
+    async def get_pregen(self, params):
+        return {'jobs': core.PREGEN.status()}
+
+    async def start_pregen(self, params):
+        path = self.server_path(params)
+        options = {key: params[key] for key in ('center', 'method', 'dimension', 'mspt_threshold') if params.get(key) is not None}
+        job = await self.run_in_thread(lambda: core.PREGEN.start(path, params.get('radius'), **options))
+        return job.status()
+
+    async def pause_pregen(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.PREGEN.pause, path)
+        return core.PREGEN.get(path).status()
+
+    async def resume_pregen(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.PREGEN.resume, path)
+        return core.PREGEN.get(path).status()
+
+    async def cancel_pregen(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.PREGEN.cancel, path)
+        return core.PREGEN.get(path).status()
+
+    async def restart_server(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.restart_server, path, params.get('countdown', True) is not False)
+        return {'path': path, 'restarting': True}
+
+    async def get_restarts(self, params):
+        def describe():
+            status = core.RESTARTS.status()
+            status['upcoming'] = [{'path': path, 'next_run': next_run.isoformat()} for next_run, path in core.RESTART_SCHEDULER.upcoming()]
+            return status
+        return await self.run_in_thread(describe)
+
+    async def set_restart_schedule(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.set_restart_schedule, path, params.get('schedule'))
+        return {'path': path, 'schedule': params.get('schedule')}
+
+    async def cancel_restart(self, params):
+        path = self.server_path(params)
+        await self.run_in_thread(core.RESTARTS.cancel, path)
+        return {'path': path, 'cancelled': True}
+
+    async def send_command(self, params):
+        path = self.server_path(params)
+        if not params.get('command'):
+            raise ApiError(400, "缺少參數：command")
+        await self.run_in_thread(core.send_server_command, path, params['command'])
+        return {'path': path, 'sent': params['command']}
+
+    async def set_affinity(self, params):
+        path = self.server_path(params)
+        cpus = params.get('cpus', 'all')
+        if not isinstance(cpus, list):
+            cpus = await self.run_in_thread(core.parse_cpu_list, cpus)
+        await self.run_in_thread(core.set_cpu_affinity, path, cpus)
+        return {'path': path, 'cpus': sorted(set(cpus))}
+
+    async def get_capacity(self, params):
+        running_only = str(params.get('running', '')).lower() in ('1', 'true', 'yes')
+        return await self.run_in_thread(core.plan_capacity, None, running_only)
+
+    async def get_properties(self, params):
+        path = self.server_path(params)
+        props = await self.run_in_thread(core.read_properties, path)
+        if props is None:
+            raise ApiError(404, f"找不到 server.properties：{path}")
+        return {'path': path, 'properties': props}
+
+    async def set_properties(self, params):
+        path = self.server_path(params)
+        values = params.get('values')
+        if not isinstance(values, dict) or not values:
+            raise ApiError(400, "values 必須是非空的物件")
+        await self.run_in_thread(core.write_properties, path, values)
+        return {'path': path, 'updated': sorted(values)}
+
+    async def set_properties_batch(self, params):
+        values, remove = params.get('values') or {}, params.get('remove') or []
+        if not isinstance(values, dict) or not isinstance(remove, list) or not (values or remove):
+            raise ApiError(400, "values 必須是物件，remove 必須是陣列，且至少要有一項變更")
+        paths = [self.server_path({'path': path}) for path in params.get('paths') or []]
+        if params.get('core') or params.get('version'):
+            paths += await self.run_in_thread(core.select_servers, params.get('core'), params.get('version'))
+        if not paths:
+            raise ApiError(400, "沒有符合條件的伺服器")
+        changed = await self.run_in_thread(core.apply_properties_batch, list(dict.fromkeys(paths)), values, remove)
+        return {'servers': len(paths), 'changed': changed}
+
+    async def get_jvm(self, params):
+        path = self.server_path(params)
+        def describe():
+            profile = core.read_server_profile(path)
+            return {'path': path, 'profile': profile.get('jvm_profile', 'custom'),
+                    'extra_args': profile.get('jvm_extra_args', []),
+                    'min_ram_mb': profile.get('min_ram_mb'), 'max_ram_mb': profile.get('max_ram_mb'),
+                    'java_version': core.server_java_version(profile), 'args': core.server_jvm_args(path, profile),
+                    'comparison': core.compare_jvm_profiles(path)}
+        return await self.run_in_thread(describe)
+
+    async def set_jvm(self, params):
+        path = self.server_path(params)
+        extra_args = params.get('extra_args')
+        if extra_args is not None and not isinstance(extra_args, list):
+            raise ApiError(400, "extra_args 必須是陣列")
+        args = await self.run_in_thread(core.update_jvm_settings, path, params.get('profile'),
+                                        params.get('min_ram_mb'), params.get('max_ram_mb'), extra_args)
+        return {'path': path, 'args': args}
+
+    @staticmethod
+    def wait_seconds(params):
+        try:
+            return min(max(float(params.get('wait', 25)), 0.0), LONG_POLL_MAX_SECONDS)
+        except (TypeError, ValueError):
+            raise ApiError(400, "wait 必須是數字")
+
+    @staticmethod
+    def known_supervisor(path):
+        # get_supervisor() would create (and the feed would watch) a supervisor for any path a client sends
+        supervisor = core.SUPERVISORS.get(path)
+        if supervisor is None:
+            raise ApiError(404, f"此程式沒有管理這個伺服器：{path}")
+        return supervisor
+
+    async def poll_console(self, params):
+        supervisor = self.known_supervisor(self.server_path(params))
+        try:
+            since = int(params.get('since', 0))
+        except (TypeError, ValueError):
+            raise ApiError(400, "since 必須是整數")
+        deadline = time.monotonic() + self.wait_seconds(params)
+        while True:
+            # Registering the event before reading closes the gap where a line could slip past
+            event = self.feed.event_for(supervisor)
+            lines, seq = supervisor.console_since(since)
+            remaining = deadline - time.monotonic()
+            if lines or remaining <= 0:
+                return {'lines': lines, 'next': seq, 'running': supervisor.is_running()}
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll_metrics(self, params):
+        path = self.server_path(params)
+        try:
+            since = float(params.get('since', 0))
+        except (TypeError, ValueError):
+            raise ApiError(400, "since 必須是數字")
+        deadline = time.monotonic() + self.wait_seconds(params)
+        interval = max(0.1, core.load_settings().get('metrics_interval_seconds', 2) / 2)
+        while True:
+            metrics = describe_metrics(path, since)
+            if metrics['samples'] or time.monotonic() >= deadline:
+                return dict(metrics, path=path)
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+    # --- WebSocket ---
+    async def handle_websocket(self, reader, writer, query, headers):
+        if not self.authorized(headers, query):
+            await self.write_response(writer, 401, {'error': "API 權杖無效"}, keep_alive=False)
+            return
+        try:
+            supervisor = self.known_supervisor(self.server_path(query))
+        except ApiError as e:
+            await self.write_response(writer, e.status, {'error': str(e)}, keep_alive=False)
+            return
+        accept = base64.b64encode(hashlib.sha1((headers.get('sec-websocket-key', '') + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+        sender = asyncio.ensure_future(self.websocket_sender(writer, supervisor, query))
+        try:
+            while True:
+                opcode, payload = await read_websocket_frame(reader)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    writer.write(encode_websocket_frame(payload, 0xA))
+                elif opcode == 0x1:
+                    try:
+                        await self.run_in_thread(supervisor.send_command, payload.decode('utf-8'))
+                    except ApiError as e:
+                        writer.write(encode_websocket_frame(json.dumps({'type': 'error', 'error': str(e)}, ensure_ascii=False).encode('utf-8')))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            sender.cancel()
+            try:
+                writer.write(encode_websocket_frame(b'', 0x8))
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def websocket_sender(self, writer, supervisor, query):
+        seq = int(query['since']) if query.get('since', '').isdigit() else supervisor.console_seq
+        last_sample = time.time()
+        interval = core.load_settings().get('metrics_interval_seconds', 2)
+        next_metrics = time.monotonic()
+        while True:
+            event = self.feed.event_for(supervisor)
+            lines, seq = supervisor.console_since(seq)
+            messages = [{'type': 'console', 'line': line, 'seq': seq} for line in lines]
+            if time.monotonic() >= next_metrics:
+                next_metrics = time.monotonic() + interval
+                metrics = describe_metrics(supervisor.server_path, last_sample)
+                if metrics['samples']:
+                    last_sample = metrics['samples'][-1]['time']
+                messages.append(dict(metrics, type='metrics', running=supervisor.is_running()))
+            for message in messages:
+                writer.write(encode_websocket_frame(json.dumps(message, ensure_ascii=False).encode('utf-8')))
+            if messages:
+                await writer.drain()
+            try:
+                await asyncio.wait_for(event.wait(), max(0.05, next_metrics - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+def encode_websocket_frame(payload, opcode=0x1):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+async def read_websocket_frame(reader):
+    """Reads one client frame. Fragmented messages are not used by browsers for short commands."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    if length > MAX_BODY_BYTES:
+        raise ConnectionError("WebSocket frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+# --- Entry Point ---
+async def serve(host=None, port=None, token=None):
+    """Runs the API until SIGINT/SIGTERM (or cancellation)."""
+    control = ControlServer(host, port, token)
+    server = await control.start()
+    if control.host not in ('127.0.0.1', 'localhost', '::1') and not control.token:
+        print("警告：API 未設定權杖卻對外開放，任何人都能控制伺服器！")
+    print(f"控制 API 已啟動：http://{control.host}:{control.port}/api/servers", flush=True)
+    stop_requested = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, stop_requested.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows, or not running in the main thread
+            pass
+    async with server:
+        await stop_requested.wait()
+
+def run_api_server(host=None, port=None, token=None):
+    asyncio.run(serve(host, port, token))
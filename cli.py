@@ -0,0 +1,505 @@
+# Minecraft Server Management Tool v1.0.0-release
+# Headless command line interface. Only imports the core backend, never the GUI toolkit,
+# so it starts quickly and works over SSH on machines without a display.
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+import api
+import core
+
+# --- Output Helpers ---
+def print_progress(text, value):
+    print(f"[{int(value * 100):3d}%] {text}", flush=True)
+
+def resolve_servers(paths, use_all):
+    if use_all:
+        return [server['path'] for server in core.scan_for_servers(core.load_settings()['scan_path'])]
+    return [os.path.abspath(path) for path in paths]
+
+def wait_for_pregen(job):
+    """Prints the progress of a pre-generation job until it ends; Ctrl+C cancels it."""
+    try:
+        while not job.finished_event.wait(5):
+            print(core.format_pregen_status(job.status()), flush=True)
+    except KeyboardInterrupt:
+        print("正在取消預先生成...", flush=True)
+        job.cancel_event.set()
+        job.finished_event.wait()
+    status = job.status()
+    if status['state'] == 'failed':
+        raise Exception(status['error'])
+    print(core.format_pregen_status(status))
+
+def wait_for_shutdown_signal():
+    """Blocks until SIGINT or SIGTERM arrives."""
+    stop_requested = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop_requested.set())
+    # Event.wait with a timeout keeps the main thread responsive to signals on Windows
+    while not stop_requested.wait(1):
+        pass
+
+# --- Commands ---
+def cmd_install(args):
+    options = {}
+    if args.min_ram: options['min_ram_mb'] = args.min_ram
+    if args.max_ram: options['max_ram_mb'] = args.max_ram
+    if args.prop: options['properties'] = dict(parse_assignment(item) for item in args.prop)
+    if args.jvm_profile: options['jvm_profile'] = args.jvm_profile
+    if args.jvm_args: options['jvm_extra_args'] = args.jvm_args.split()
+    if args.pregen_radius: options['pregen_radius'] = args.pregen_radius
+
+    def manual_download(page_url, path):
+        print(f"請手動下載 Forge 安裝檔並放入 {path}：{page_url}")
+        input("完成後按 Enter 繼續...")
+        return True
+
+    result = core.install_server(args.core, args.version, os.path.abspath(args.path), print_progress,
+                                 options, manual_download)
+    print(result)
+    if args.pregen_radius:
+        wait_for_pregen(core.PREGEN.get(os.path.abspath(args.path)))
+
+def cmd_pregen(args):
+    job = core.PREGEN.start(os.path.abspath(args.path), args.radius, center=args.center, method=args.method,
+                            dimension=args.dimension, mspt_threshold=args.mspt)
+    wait_for_pregen(job)
+
+def cmd_list(args):
+    servers = core.scan_for_servers(args.scan_path or core.load_settings()['scan_path'])
+    # One pass over the process table for all servers
+    running = core.find_server_processes([server['path'] for server in servers])
+    if args.json:
+        for server in servers:
+            server['running'] = server['path'] in running
+        print(json.dumps(servers, ensure_ascii=False, indent=2))
+        return
+    for server in servers:
+        status = "執行中" if server['path'] in running else "已停止"
+        print(f"{server.get('core_type', '?'):<10} {server.get('version', '?'):<12} {status:<6} {server['path']}")
+
+def cmd_start(args):
+    server_path = os.path.abspath(args.path)
+    supervisor = core.get_supervisor(server_path)
+    supervisor.add_listener(lambda line: print(line, flush=True))
+    core.run_server(server_path)
+
+    def forward_stdin():
+        for line in sys.stdin:
+            try: supervisor.send_command(line.rstrip('\r\n'))
+            except Exception as e: print(e)
+    threading.Thread(target=forward_stdin, daemon=True).start()
+
+    try:
+        wait_for_shutdown_signal()
+    finally:
+        print("正在關閉伺服器...", flush=True)
+        core.stop_all_servers()
+
+def cmd_stop(args):
+    server_path = os.path.abspath(args.path)
+    proc = core.find_server_process(server_path)
+    if proc is None:
+        raise Exception(f"伺服器 {os.path.basename(server_path)} 沒有在執行中！")
+    core.terminate_server_process(proc, args.timeout)
+    print(f"伺服器 {os.path.basename(server_path)} 已停止")
+
+def cmd_backup(args):
+    for server_path in resolve_servers(args.paths, args.all):
+        print(f"備份 {server_path}")
+        print(core.create_backup(server_path, print_progress))
+        if args.prune:
+            for name in core.prune_backups(server_path):
+                print(f"  已刪除舊備份 {name}")
+
+def cmd_backups(args):
+    if args.backups_command == 'list':
+        server_path = os.path.abspath(args.path)
+        backups = core.list_backups(server_path)
+        if args.json:
+            print(json.dumps(backups, ensure_ascii=False, indent=2))
+            return
+        print(f"備份位置：{core.get_backup_dir(server_path)}")
+        for backup in backups:
+            size = '' if backup['size'] is None else f"{backup['size'] / 1024 / 1024:8.1f} MB"
+            print(f"{backup['created']}  {backup['kind']:<11} {size:>11}  {backup['name']}")
+    elif args.backups_command == 'prune':
+        server_paths = resolve_servers(args.paths, args.all)
+        if not server_paths:
+            raise Exception("沒有指定任何伺服器！")
+        for server_path in server_paths:
+            removed = core.prune_backups(server_path, dry_run=args.dry_run)
+            print(f"{'將刪除' if args.dry_run else '已刪除'} {len(removed)} 個備份：{server_path}")
+            for name in removed:
+                print(f"  {name}")
+    elif args.backups_command == 'schedule':
+        server_path = os.path.abspath(args.path)
+        if args.default:
+            core.set_backup_schedule(server_path, None)
+        elif args.expression is not None:
+            core.set_backup_schedule(server_path, args.expression)
+        expression = core.get_backup_schedule(core.read_server_profile(server_path))
+        print(f"排程：{expression or '停用'}")
+    elif args.backups_command == 'files':
+        server_path = os.path.abspath(args.path)
+        children = core.browse_backup(server_path, args.name, args.prefix)
+        if args.json:
+            print(json.dumps(children, ensure_ascii=False, indent=2))
+            return
+        for child in children:
+            name = child['name'] + ('/' if child['type'] == 'dir' else '')
+            print(f"{child['size'] / 1024 / 1024:10.1f} MB  {child['files']:>7}  {name}")
+    elif args.backups_command == 'restore':
+        server_path = os.path.abspath(args.path)
+        count = core.restore_backup(server_path, args.name, print_progress, dimension=args.dimension, paths=args.files)
+        print(f"已從 {args.name} 還原 {count} 個檔案")
+    else:
+        for next_run, server_path in core.BACKUP_SCHEDULER.upcoming():
+            print(f"{next_run:%Y-%m-%d %H:%M}  {server_path}")
+
+def cmd_restarts(args):
+    if args.restarts_command == 'schedule':
+        server_path = os.path.abspath(args.path)
+        if args.default:
+            core.set_restart_schedule(server_path, None)
+        elif args.expression is not None:
+            core.set_restart_schedule(server_path, args.expression)
+        expression = core.get_restart_schedule(core.read_server_profile(server_path))
+        print(f"排程：{expression or '停用'}")
+    else:
+        for next_run, server_path in core.RESTART_SCHEDULER.upcoming():
+            print(f"{next_run:%Y-%m-%d %H:%M}  {server_path}")
+
+def parse_assignment(text):
+    if '=' not in text:
+        raise argparse.ArgumentTypeError(f"格式應為 key=value：{text}")
+    key, value = text.split('=', 1)
+    return key.strip(), value.strip()
+
+def cmd_props(args):
+    if args.props_command == 'get':
+        server_path = os.path.abspath(args.path)
+        props = core.read_properties(server_path)
+        if props is None:
+            raise Exception(f"找不到 server.properties：{server_path}")
+        for key in (args.keys or sorted(props)):
+            print(f"{key}={props.get(key, '')}")
+        return
+
+    # Targets mix server paths and KEY=VALUE pairs: "props set ./a ./b view-distance=8"
+    server_paths = [os.path.abspath(item) for item in args.targets if '=' not in item]
+    changes = dict(parse_assignment(item) for item in args.targets if '=' in item)
+    if args.all or args.core or args.version:
+        scan_path = core.load_settings()['scan_path']
+        core.scan_for_servers(scan_path)
+        server_paths += core.select_servers(args.core, args.version, scan_path)
+    if not server_paths:
+        raise Exception("沒有指定任何伺服器！")
+    if not changes and not args.unset:
+        raise Exception("沒有指定任何要修改的設定！")
+    changed = core.apply_properties_batch(list(dict.fromkeys(server_paths)), changes, args.unset or ())
+    print(f"已更新 {len(changed)} 個伺服器 (共 {len(server_paths)} 個)")
+    for server_path in changed:
+        print(f"  {server_path}")
+
+def cmd_jvm(args):
+    if args.jvm_command == 'set':
+        extra_args = None if args.extra_args is None else args.extra_args.split()
+        server_paths = resolve_servers(args.paths, args.all)
+        if not server_paths:
+            raise Exception("沒有指定任何伺服器！")
+        for server_path in server_paths:
+            jvm_args = core.update_jvm_settings(server_path, args.profile, args.min_ram, args.max_ram, extra_args)
+            print(f"{server_path}\n  {' '.join(jvm_args)}")
+        return
+
+    server_path = os.path.abspath(args.path)
+    if args.jvm_command == 'compare':
+        summary = core.compare_jvm_profiles(server_path)
+        if args.json:
+            print(json.dumps(summary, ensure_ascii=False, indent=2))
+        else:
+            print("\n".join(core.format_jvm_comparison(summary)))
+        return
+    profile = core.read_server_profile(server_path)
+    print(f"設定: {profile.get('jvm_profile', 'custom')}  (Java {core.server_java_version(profile)})")
+    print(" ".join(core.server_jvm_args(server_path, profile)))
+
+def cmd_capacity(args):
+    plan = core.plan_capacity(running_only=args.running, root=args.scan_path)
+    if args.json:
+        print(json.dumps(plan, ensure_ascii=False, indent=2))
+        return
+    print(f"主機記憶體 {plan['total_mb']} MB (可用 {plan['available_mb']} MB)，保留 {plan['reserved_mb']} MB，"
+          f"CPU {plan['cpu_count']} 執行緒 / {plan['physical_cores']} 核心")
+    for server in plan['servers']:
+        status = "執行中" if server['running'] else "已停止"
+        suggestion = "" if server['suggested_max_ram_mb'] == server['max_ram_mb'] else f"  建議 {server['suggested_max_ram_mb']} MB"
+        print(f"{server['max_ram_mb']:>7} MB  預估 {server['estimated_mb']:>7} MB  {status:<4} {server['path']}{suggestion}")
+    print(f"合計預估 {plan['committed_mb']} MB / 可配置 {plan['budget_mb']} MB")
+    if plan['over_commit_mb']:
+        print(f"超額配置 {plan['over_commit_mb']} MB！")
+    else:
+        print(f"新伺服器建議最大記憶體：{plan['suggested_new_max_ram_mb']} MB")
+
+def cmd_affinity(args):
+    if args.affinity_command == 'set':
+        assignments = {os.path.abspath(args.path): core.parse_cpu_list(args.cpus)}
+    else:
+        server_paths = resolve_servers(args.paths, args.all)
+        if not server_paths:
+            raise Exception("沒有指定任何伺服器！")
+        assignments = core.plan_cpu_affinity(server_paths)
+    for server_path, cpus in assignments.items():
+        core.set_cpu_affinity(server_path, cpus)
+        print(f"CPU {core.format_cpu_list(cpus):<10} {server_path}")
+
+def cmd_world(args):
+    server_path = os.path.abspath(args.path)
+    if args.world_command == 'analyze':
+        report = core.analyze_world(server_path, args.inhabited, print_progress)
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        for line in core.format_world_report(report, args.top):
+            print(line)
+    else:
+        result = core.prune_world(server_path, args.max_inhabited, args.dimensions, args.dry_run, print_progress)
+        if args.dry_run:
+            print(f"將刪除 {result['chunks_removed']} 個區塊 (影響 {result['regions_changed']} 個區域檔)")
+        else:
+            print(f"已刪除 {result['chunks_removed']} 個區塊，移除 {result['regions_deleted']} 個區域檔，"
+                  f"釋放 {result['bytes_freed'] / 1024 / 1024:.1f} MB")
+
+def cmd_cache(args):
+    if args.cache_command == 'prune':
+        max_bytes = None if args.max_mb is None else args.max_mb * 1024 * 1024
+        removed, freed = core.prune_artifact_cache(max_bytes=max_bytes)
+        print(f"已移除 {removed} 個檔案，釋放 {freed / 1024 / 1024:.1f} MB")
+    elif args.cache_command == 'verify':
+        dropped = core.verify_artifact_cache()
+        print(f"{len(dropped)} 個快取檔案已損毀或遺失，下次使用時會重新下載")
+        for key in dropped:
+            print(f"  {key}")
+    entries, total = core.list_artifact_cache()
+    for entry in entries:
+        print(f"{entry['size'] / 1024 / 1024:8.1f} MB  {entry['key']}")
+    print(f"共 {len(entries)} 個檔案，{total / 1024 / 1024:.1f} MB")
+
+def cmd_provision(args):
+    spec = core.load_provision_spec(args.spec)
+    results = core.provision_servers(spec, lambda path, text, value: print_progress(f"{os.path.basename(path)}: {text}", value),
+                                     args.parallel)
+    failed = [result for result in results if not result['ok']]
+    for result in results:
+        print(f"{'成功' if result['ok'] else '失敗'}  {result['path']}  (port {result['port']})")
+    if failed:
+        sys.exit(1)
+
+def cmd_daemon(args):
+    """
+    Supervises servers in the foreground until SIGINT/SIGTERM, for systemd units or containers,
+    and runs the scheduled backups and restarts. With --api the control API runs on the main thread so remote clients can manage them.
+    """
+    server_paths = resolve_servers(args.paths, args.all)
+    if not server_paths and not args.api:
+        raise Exception("沒有可執行的伺服器！")
+    core.start_backup_scheduler()
+    core.start_restart_scheduler()
+    for server_path in server_paths:
+        name = os.path.basename(server_path)
+        core.get_supervisor(server_path).add_listener(lambda line, name=name: print(f"[{name}] {line}", flush=True))
+        try:
+            core.run_server(server_path)
+        except Exception as e:
+            print(f"[{name}] 啟動失敗：{e}", flush=True)
+    try:
+        if args.api:
+            api.run_api_server(args.host, args.port)
+        else:
+            wait_for_shutdown_signal()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("正在關閉所有伺服器...", flush=True)
+        core.stop_all_servers()
+
+# --- Argument Parsing ---
+def build_parser():
+    parser = argparse.ArgumentParser(prog='mcsm', description="Minecraft 伺服器管理工具 (命令列模式)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('install', help="安裝新的伺服器")
+    p.add_argument('core', choices=sorted(core.API_URLS))
+    p.add_argument('version')
+    p.add_argument('path')
+    p.add_argument('--min-ram', type=int, help="最小記憶體 (MB)")
+    p.add_argument('--max-ram', type=int, help="最大記憶體 (MB)")
+    p.add_argument('--prop', action='append', metavar='KEY=VALUE', help="寫入 server.properties 的設定")
+    p.add_argument('--jvm-profile', choices=list(core.JVM_PROFILES), help="JVM 參數設定 (預設為設定中的 default_jvm_profile)")
+    p.add_argument('--jvm-args', help="額外的 JVM 參數，以空白分隔")
+    p.add_argument('--pregen-radius', type=int, help="安裝後預先生成此半徑 (格) 內的世界")
+    p.set_defaults(func=cmd_install)
+
+    p = commands.add_parser('pregen', help="預先生成世界，有玩家在線且 MSPT 過高時自動暫停")
+    p.add_argument('path')
+    p.add_argument('radius', type=int, help="半徑 (格)")
+    p.add_argument('--center', type=int, nargs=2, metavar=('X', 'Z'), help="中心座標，預設為世界重生點")
+    p.add_argument('--method', choices=core.PREGEN_METHODS, help="auto 在有 Chunky 時使用 Chunky，否則使用 forceload")
+    p.add_argument('--dimension', help="例如 minecraft:the_nether (Chunky 使用世界名稱)")
+    p.add_argument('--mspt', type=float, help="暫停門檻 (毫秒)，預設使用設定中的 pregen_mspt_threshold")
+    p.set_defaults(func=cmd_pregen)
+
+    p = commands.add_parser('list', help="列出掃描路徑中的伺服器")
+    p.add_argument('--scan-path')
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser('start', help="在前景啟動伺服器並轉送主控台")
+    p.add_argument('path')
+    p.set_defaults(func=cmd_start)
+
+    p = commands.add_parser('stop', help="停止執行中的伺服器")
+    p.add_argument('path')
+    p.add_argument('--timeout', type=int)
+    p.set_defaults(func=cmd_stop)
+
+    p = commands.add_parser('backup', help="備份伺服器")
+    p.add_argument('paths', nargs='*')
+    p.add_argument('--all', action='store_true', help="備份掃描路徑中的所有伺服器")
+    p.add_argument('--prune', action='store_true', help="備份後依保留原則刪除舊備份")
+    p.set_defaults(func=cmd_backup)
+
+    p = commands.add_parser('backups', help="列出、瀏覽、還原、清理與排程備份")
+    backups_commands = p.add_subparsers(dest='backups_command', required=True)
+    list_ = backups_commands.add_parser('list')
+    list_.add_argument('path')
+    list_.add_argument('--json', action='store_true')
+    prune = backups_commands.add_parser('prune', help="依每小時/每日/每週保留原則刪除舊備份")
+    prune.add_argument('paths', nargs='*')
+    prune.add_argument('--all', action='store_true', help="清理掃描路徑中的所有伺服器")
+    prune.add_argument('--dry-run', action='store_true', help="只列出會被刪除的備份")
+    schedule = backups_commands.add_parser('schedule', help="檢視或設定伺服器的備份排程 (cron 格式)")
+    schedule.add_argument('path')
+    schedule.add_argument('expression', nargs='?', help="例如 \"0 */6 * * *\"、@daily；off 停用")
+    schedule.add_argument('--default', action='store_true', help="改用設定中的預設排程")
+    backups_commands.add_parser('upcoming', help="列出接下來的排程備份")
+    files = backups_commands.add_parser('files', help="瀏覽備份內的檔案")
+    files.add_argument('path')
+    files.add_argument('name', help="備份名稱 (見 backups list)")
+    files.add_argument('prefix', nargs='?', default='', help="要列出的資料夾，例如 world/region")
+    files.add_argument('--json', action='store_true')
+    restore = backups_commands.add_parser('restore', help="還原整個伺服器、單一維度或指定檔案")
+    restore.add_argument('path')
+    restore.add_argument('name', help="備份名稱 (見 backups list)")
+    restore_scope = restore.add_mutually_exclusive_group()
+    restore_scope.add_argument('--dimension', help="overworld、nether、end 或 命名空間:名稱")
+    restore_scope.add_argument('--file', dest='files', action='append', help="要還原的檔案或資料夾，可重複指定")
+    p.set_defaults(func=cmd_backups)
+
+    p = commands.add_parser('restarts', help="檢視或設定排程重新啟動，由 daemon 執行")
+    restarts_commands = p.add_subparsers(dest='restarts_command', required=True)
+    schedule = restarts_commands.add_parser('schedule', help="檢視或設定伺服器的重新啟動排程 (cron 格式)")
+    schedule.add_argument('path')
+    schedule.add_argument('expression', nargs='?', help="例如 \"0 5 * * *\"、@daily；off 停用")
+    schedule.add_argument('--default', action='store_true', help="改用設定中的預設排程")
+    restarts_commands.add_parser('upcoming', help="列出接下來的排程重新啟動")
+    p.set_defaults(func=cmd_restarts)
+
+    p = commands.add_parser('props', help="讀取或修改 server.properties")
+    props_commands = p.add_subparsers(dest='props_command', required=True)
+    get = props_commands.add_parser('get')
+    get.add_argument('path')
+    get.add_argument('keys', nargs='*')
+    set_ = props_commands.add_parser('set', help="一次修改一個或多個伺服器，全部成功才會寫入")
+    set_.add_argument('targets', nargs='+', metavar='PATH|KEY=VALUE')
+    set_.add_argument('--all', action='store_true', help="套用到掃描路徑中的所有伺服器")
+    set_.add_argument('--core', help="只套用到指定核心的伺服器，例如 Paper")
+    set_.add_argument('--version', help="只套用到指定 Minecraft 版本的伺服器")
+    set_.add_argument('--unset', action='append', metavar='KEY', help="移除設定")
+    p.set_defaults(func=cmd_props)
+
+    p = commands.add_parser('jvm', help="檢視或修改 JVM 參數設定，並比較各設定的啟動與 GC 表現")
+    jvm_commands = p.add_subparsers(dest='jvm_command', required=True)
+    show = jvm_commands.add_parser('show')
+    show.add_argument('path')
+    set_ = jvm_commands.add_parser('set', help="修改後會重新產生啟動腳本或 user_jvm_args.txt")
+    set_.add_argument('paths', nargs='*')
+    set_.add_argument('--all', action='store_true', help="套用到掃描路徑中的所有伺服器")
+    set_.add_argument('--profile', choices=list(core.JVM_PROFILES))
+    set_.add_argument('--min-ram', type=int, help="最小記憶體 (MB)")
+    set_.add_argument('--max-ram', type=int, help="最大記憶體 (MB)")
+    set_.add_argument('--extra-args', help="額外的 JVM 參數，以空白分隔；空字串可清除")
+    compare = jvm_commands.add_parser('compare', help="依伺服器日誌比較各設定的啟動時間與 GC 暫停")
+    compare.add_argument('path')
+    compare.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_jvm)
+
+    p = commands.add_parser('capacity', help="比較伺服器記憶體配置與主機容量，並建議最大記憶體")
+    p.add_argument('--running', action='store_true', help="只計算執行中的伺服器")
+    p.add_argument('--scan-path', help="只計算此路徑下的伺服器")
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=cmd_capacity)
+
+    p = commands.add_parser('affinity', help="將伺服器綁定到指定的 CPU")
+    affinity_commands = p.add_subparsers(dest='affinity_command', required=True)
+    set_ = affinity_commands.add_parser('set', help="執行中的伺服器會立即套用")
+    set_.add_argument('path')
+    set_.add_argument('cpus', help="例如 0-3,6；all 表示不綁定")
+    auto = affinity_commands.add_parser('auto', help="將 CPU 平均分配給多個伺服器，互不重疊")
+    auto.add_argument('paths', nargs='*')
+    auto.add_argument('--all', action='store_true', help="分配給掃描路徑中的所有伺服器")
+    p.set_defaults(func=cmd_affinity)
+
+    p = commands.add_parser('world', help="分析世界的區域檔，或刪除玩家從未停留的區塊")
+    world_commands = p.add_subparsers(dest='world_command', required=True)
+    analyze = world_commands.add_parser('analyze', help="每個維度的區域檔、區塊數量與大小")
+    analyze.add_argument('path')
+    analyze.add_argument('--inhabited', action='store_true', help="同時讀取每個區塊的 InhabitedTime (較慢)")
+    analyze.add_argument('--top', type=int, default=10, help="每個維度列出最大的幾個區域檔")
+    analyze.add_argument('--json', action='store_true')
+    prune = world_commands.add_parser('prune', help="刪除 InhabitedTime 不超過門檻的區塊，伺服器必須先停止")
+    prune.add_argument('path')
+    prune.add_argument('--max-inhabited', type=int, help="秒數門檻，預設使用設定中的 world_prune_max_inhabited_seconds")
+    prune.add_argument('--dimension', dest='dimensions', action='append', help="只清理此維度資料夾，例如 world/DIM-1，可重複指定")
+    prune.add_argument('--dry-run', action='store_true', help="只計算會被刪除的區塊")
+    p.set_defaults(func=cmd_world)
+
+    p = commands.add_parser('cache', help="管理下載快取")
+    cache_commands = p.add_subparsers(dest='cache_command', required=True)
+    cache_commands.add_parser('list')
+    prune = cache_commands.add_parser('prune')
+    prune.add_argument('--max-mb', type=int)
+    cache_commands.add_parser('verify', help="重新計算所有快取檔案的 SHA-256，移除損毀的項目")
+    p.set_defaults(func=cmd_cache)
+
+    p = commands.add_parser('provision', help="依照 JSON/TOML 規格批次安裝伺服器")
+    p.add_argument('spec')
+    p.add_argument('--parallel', type=int)
+    p.set_defaults(func=cmd_provision)
+
+    p = commands.add_parser('daemon', help="在背景監管伺服器直到收到 SIGINT/SIGTERM")
+    p.add_argument('paths', nargs='*')
+    p.add_argument('--all', action='store_true', help="啟動掃描路徑中的所有伺服器")
+    p.add_argument('--api', action='store_true', help="同時提供本機 HTTP/JSON 控制 API")
+    p.add_argument('--host', help="API 監聽位址 (預設為設定中的 api_host)")
+    p.add_argument('--port', type=int, help="API 連接埠 (預設為設定中的 api_port)")
+    p.set_defaults(func=cmd_daemon)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except Exception as e:
+        print(f"錯誤：{e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4597 @@
+# Minecraft Server Management Tool v1.0.0-release
+# Core backend: server installation, supervision, backups and configuration.
+# This module must not import any GUI toolkit so it can run on headless hosts (see cli.py).
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import os
+import json
+import threading
+import re
+import subprocess
+import shutil
+import datetime
+import time
+import psutil
+import sys
+import shlex
+import platform
+import ctypes
+import errno
+import select
+import struct
+import zipfile
+import tarfile
+import tempfile
+import zlib
+import mmap
+import hashlib
+import collections
+import contextlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import xml.etree.ElementTree as ET
+
+# ==============================================================================
+# CORE BACKEND MODULE - Server Management & Configuration
+# ==============================================================================
+
+# --- Configuration Management System ---
+APP_DIR = os.path.join(os.getenv('APPDATA') or os.path.join(os.path.expanduser('~'), '.config'), 'MinecraftServerTool')
+JAVA_DIR = os.path.join(APP_DIR, 'java')
+CONFIG_FILE = os.path.join(APP_DIR, 'settings.json')
+CACHE_DIR = os.path.join(APP_DIR, 'cache')
+DEFAULT_SETTINGS = {
+    'scan_path': os.path.join(os.path.expanduser('~'), 'Desktop'),
+    'min_ram_mb': 1024,
+    'max_ram_mb': 2048,
+    # Theme setting removed in v1.0.0
+    'appearance_mode': 'system', 
+    'use_server_gui': False,
+    'auto_download_java': False,
+    'auto_accept_eula': True,
+    'java_executable_path': 'java',
+    'default_server_port': '25565',
+    'default_max_players': '20',
+    'default_difficulty': 'easy',
+    'default_gamemode': 'survival',
+    'default_online_mode': True,
+    'default_pvp': True,
+    # 'full' writes a zip per backup, 'incremental' uses the deduplicating chunk store
+    'backup_mode': 'full',
+    # Full backups: 0 workers means one per CPU core, level is zlib 1-9
+    'backup_workers': 0,
+    'backup_compression_level': 6,
+    # Flush and pause saving on running servers while the files are staged
+    'hot_backup': True,
+    'auto_restart': True,
+    'stop_timeout_seconds': 60,
+    'restart_backoff_max_seconds': 300,
+    'metrics_interval_seconds': 2,
+    'metrics_history_size': 300,
+    # Paper/Purpur only: how often 'tps' and 'mspt' are sent to running servers, 0 disables
+    'tps_poll_interval_seconds': 30,
+    'http_connect_timeout': 10,
+    'http_read_timeout': 60,
+    'http_retries': 3,
+    # Parallel ranged connections used for large downloads
+    'download_connections': 4,
+    # Size limit of the shared jar/installer/JDK cache, least recently used files go first
+    'artifact_cache_max_mb': 4096,
+    # Local control API (api.py); keep the host on loopback unless a token is set
+    'api_enabled': False,
+    'api_host': '127.0.0.1',
+    'api_port': 8765,
+    'api_token': '',
+    # Live updates of the server list from filesystem changes made outside the tool
+    'watch_filesystem': True,
+    'watch_debounce_seconds': 1.0,
+    # Used where inotify is unavailable
+    'watch_poll_interval_seconds': 5,
+    # JVM flag profile for new servers ('auto' picks one from heap size and Java version)
+    'default_jvm_profile': 'auto',
+    # Write logs/gc.log so startup time and GC pauses can be compared between profiles
+    'jvm_gc_logging': True,
+    # Memory over-commit check on install, heap changes and start: 'warn', 'refuse' or 'off'
+    'capacity_policy': 'warn',
+    # Memory left for the OS and other programs when planning server heaps
+    'capacity_reserved_mb': 1024,
+    # Off-heap memory (metaspace, code cache, thread stacks, direct buffers) as a share of the heap
+    'jvm_overhead_percent': 20,
+    # Cron expression (minute hour day month weekday, or @hourly/@daily/@weekly) for scheduled
+    # backups of every registered server; a server's own 'backup_schedule' overrides it, empty disables
+    'backup_schedule': '',
+    # Scheduled backups that may run at the same time across all servers, and jobs allowed to wait
+    'backup_max_concurrent': 2,
+    'backup_queue_size': 100,
+    # Store backups in a folder per server under this directory instead of <server>/backups
+    'backup_target_dir': '',
+    # Grandfather-father-son retention, applied after scheduled backups when backup_prune is on:
+    # the latest N backups plus the newest one of each of the last N hours, days and weeks
+    'backup_prune': False,
+    'backup_keep_last': 3,
+    'backup_keep_hourly': 24,
+    'backup_keep_daily': 7,
+    'backup_keep_weekly': 4,
+    # World pruning deletes chunks players spent at most this long in (InhabitedTime)
+    'world_prune_max_inhabited_seconds': 0,
+    # World pre-generation: 'auto' uses Chunky when it is installed, otherwise 'forceload' batches
+    'pregen_method': 'auto',
+    # Pre-generation pauses while players are online and the average tick takes longer than this (ms)
+    'pregen_mspt_threshold': 45,
+    # Cron expression for scheduled restarts of servers running under this tool; a server's own
+    # 'restart_schedule' overrides it, empty disables
+    'restart_schedule': '',
+    # Seconds before a restart at which online players are warned; an empty server restarts right away
+    'restart_warnings': [300, 60, 30, 10, 5],
+    # Pause after a restarted server is ready before the next server on this host may go down
+    'restart_stagger_seconds': 60,
+    # How long a restart waits for a running backup of the same server before it is skipped
+    'restart_backup_wait_seconds': 1800
+}
+
+def ensure_config_exists():
+    os.makedirs(APP_DIR, exist_ok=True)
+    os.makedirs(JAVA_DIR, exist_ok=True)
+    if not os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(DEFAULT_SETTINGS, f, indent=4)
+
+def load_settings():
+    ensure_config_exists()
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            settings = DEFAULT_SETTINGS.copy()
+            settings.update(json.load(f))
+            return settings
+    except (json.JSONDecodeError, FileNotFoundError):
+        return DEFAULT_SETTINGS
+
+def save_settings(settings):
+    ensure_config_exists()
+    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=4)
+
+# --- API Integration & Java Runtime Management ---
+API_URLS = {
+    "Paper": "https://api.papermc.io/v2/projects/paper",
+    "Purpur": "https://api.purpurmc.org/v2/purpur",
+    "Vanilla": "https://launchermeta.mojang.com/mc/game/version_manifest.json",
+    "Forge": "https://files.minecraftforge.net/net/minecraftforge/forge/maven-metadata.json",
+    "NeoForge": "https://maven.neoforged.net/net/neoforged/neoforge/maven-metadata.xml",
+    "Fabric": "https://meta.fabricmc.net/v2/versions/game"
+}
+
+# --- Network Layer ---
+# Every HTTP request goes through one pooled session, so connections (and TLS
+# sessions) are reused per host, 5xx and connection errors are retried with
+# exponential backoff and each response's latency is recorded per host.
+_http_session = None
+_http_session_lock = threading.Lock()
+HTTP_STATS = collections.defaultdict(lambda: {'requests': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+# Responses arrive on download worker threads
+_http_stats_lock = threading.Lock()
+SLOW_REQUEST_SECONDS = 5
+
+def _record_http_timing(response, *args, **kwargs):
+    host = requests.utils.urlparse(response.url).netloc
+    seconds = response.elapsed.total_seconds()
+    with _http_stats_lock:
+        stats = HTTP_STATS[host]
+        stats['requests'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        if response.status_code >= 400:
+            stats['errors'] += 1
+    if seconds >= SLOW_REQUEST_SECONDS:
+        print(f"連線緩慢：{host} 花了 {seconds:.1f} 秒回應 ({response.url})")
+
+def get_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            settings = load_settings()
+            retry = Retry(
+                total=settings.get('http_retries', 3), backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = 'MinecraftServerTool/1.0.0 (+https://github.com/tntapple219/MinecraftServerManager)'
+            session.hooks['response'].append(_record_http_timing)
+            _http_session = session
+        return _http_session
+
+def http_get(url, **kwargs):
+    """GET through the shared session with the configured (connect, read) timeouts."""
+    if 'timeout' not in kwargs:
+        settings = load_settings()
+        kwargs['timeout'] = (settings.get('http_connect_timeout', 10), settings.get('http_read_timeout', 60))
+    return get_http_session().get(url, **kwargs)
+
+def get_http_stats():
+    """Per-host request count, error count, average and worst latency in seconds."""
+    with _http_stats_lock:
+        return {host: dict(stats, avg_seconds=stats['total_seconds'] / max(stats['requests'], 1))
+                for host, stats in HTTP_STATS.items()}
+
+# --- Metadata Cache ---
+# Version lists and manifests are cached on disk per URL. Fresh entries are served
+# straight from disk, stale ones are served immediately and revalidated in the
+# background with ETag / If-Modified-Since, and the last good copy keeps the tool
+# usable offline.
+METADATA_CACHE_DIR = os.path.join(CACHE_DIR, 'metadata')
+METADATA_TTL_SECONDS = 3600
+_metadata_locks = collections.defaultdict(threading.Lock)
+_metadata_refresh_lock = threading.Lock()
+_metadata_refreshing = set()
+
+def _metadata_cache_paths(url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(METADATA_CACHE_DIR, f"{key}.body"), os.path.join(METADATA_CACHE_DIR, f"{key}.json")
+
+def _load_metadata_entry(url):
+    body_path, meta_path = _metadata_cache_paths(url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        with open(body_path, 'rb') as f:
+            return entry, f.read()
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None, None
+
+def _revalidate_metadata(url, entry, body):
+    """Fetches url, sending the validators of the cached entry. Returns the current body."""
+    headers = {}
+    if entry:
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        response = http_get(url, headers=headers)
+        if response.status_code == 304 and body is not None:
+            new_body = body
+        else:
+            response.raise_for_status()
+            new_body = response.content
+            entry = {'url': url, 'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    except requests.RequestException:
+        if body is not None:
+            print(f"無法更新 {url}，改用快取資料。")
+            return body
+        raise
+
+    entry['fetched_at'] = time.time()
+    os.makedirs(METADATA_CACHE_DIR, exist_ok=True)
+    body_path, meta_path = _metadata_cache_paths(url)
+    if new_body is not body:
+        with open(body_path + '.tmp', 'wb') as f: f.write(new_body)
+        os.replace(body_path + '.tmp', body_path)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f: json.dump(entry, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return new_body
+
+def _refresh_metadata_in_background(url):
+    with _metadata_refresh_lock:
+        if url in _metadata_refreshing: return
+        _metadata_refreshing.add(url)
+    def refresh():
+        try:
+            with _metadata_locks[url]:
+                entry, body = _load_metadata_entry(url)
+                _revalidate_metadata(url, entry, body)
+        except requests.RequestException as e:
+            print(f"背景更新 {url} 失敗：{e}")
+        finally:
+            with _metadata_refresh_lock:
+                _metadata_refreshing.discard(url)
+    threading.Thread(target=refresh, daemon=True).start()
+
+def fetch_metadata(url, ttl=METADATA_TTL_SECONDS, allow_stale=True):
+    """
+    Returns the body of url as bytes, using the on-disk cache.
+    allow_stale=False revalidates stale entries before returning (used at install time).
+    """
+    entry, body = _load_metadata_entry(url)
+    if entry is not None:
+        if time.time() - entry.get('fetched_at', 0) < ttl:
+            return body
+        if allow_stale:
+            _refresh_metadata_in_background(url)
+            return body
+    # Concurrent callers of the same URL wait for one request instead of each sending their own
+    with _metadata_locks[url]:
+        entry, body = _load_metadata_entry(url)
+        if entry is not None and time.time() - entry.get('fetched_at', 0) < ttl:
+            return body
+        return _revalidate_metadata(url, entry, body)
+
+def fetch_metadata_json(url, ttl=METADATA_TTL_SECONDS, allow_stale=True):
+    return json.loads(fetch_metadata(url, ttl, allow_stale))
+
+def prefetch_catalogues():
+    """Warms the cache for every core's version list at once."""
+    with ThreadPoolExecutor(max_workers=len(API_URLS)) as pool:
+        for url, future in [(url, pool.submit(fetch_metadata, url, METADATA_TTL_SECONDS, False)) for url in API_URLS.values()]:
+            try:
+                future.result()
+            except requests.RequestException as e:
+                print(f"預先載入 {url} 失敗：{e}")
+
+def get_versions(core_type, filters={"release"}):
+    try:
+        if core_type in ["Paper", "Purpur"]:
+            versions = fetch_metadata_json(API_URLS[core_type])['versions'][::-1]
+            filtered_versions = []
+            for v in versions:
+                is_snapshot = "pre" in v or "rc" in v or "SNAPSHOT" in v.upper()
+                if "release" in filters and not is_snapshot: filtered_versions.append(v)
+                if "snapshot" in filters and is_snapshot: filtered_versions.append(v)
+            return filtered_versions
+        elif core_type == "Vanilla":
+            return [v['id'] for v in fetch_metadata_json(API_URLS[core_type])['versions'] if v['type'] in filters]
+        elif core_type == "Fabric":
+            versions = fetch_metadata_json(API_URLS[core_type])
+            filtered_versions = []
+            for v in versions:
+                if "release" in filters and v['stable']:
+                    filtered_versions.append(v['version'])
+                if "snapshot" in filters and not v['stable']:
+                    filtered_versions.append(v['version'])
+            return filtered_versions
+        elif core_type == "Forge":
+            # The keys of the JSON are the Minecraft versions, return them in reverse order
+            return sorted(list(fetch_metadata_json(API_URLS[core_type]).keys()), reverse=True)
+        elif core_type == "NeoForge":
+            root = ET.fromstring(fetch_metadata(API_URLS[core_type]))
+            # Find all <version> tags and return their text content in reverse order
+            versions = [v.text for v in root.findall('.//versioning/versions/version')]
+            return sorted(versions, reverse=True)
+    except (requests.RequestException, ET.ParseError, KeyError, json.JSONDecodeError) as e:
+        print(f"｡ﾟ(ﾟ´Д｀)ﾟ｡ 網路錯誤或資料解析失敗：{e}")
+        return []
+    return []
+
+def get_download_info(core_type, mc_version):
+    """
+    Returns {'url', 'checksum', 'build'} for a server core. checksum is an
+    (algorithm, hexdigest) pair published by upstream, or None if there is none.
+    """
+    try:
+        if core_type == "Paper":
+            builds = fetch_metadata_json(f"{API_URLS[core_type]}/versions/{mc_version}/builds", allow_stale=False)
+            latest_build = builds['builds'][-1]['build']
+            application = builds['builds'][-1]['downloads']['application']
+            jar_name = application['name']
+            return {'url': f"{API_URLS[core_type]}/versions/{mc_version}/builds/{latest_build}/downloads/{jar_name}",
+                    'checksum': ('sha256', application['sha256']), 'build': str(latest_build)}
+        elif core_type == "Purpur":
+            # Purpur only publishes an md5 of each build
+            latest = fetch_metadata_json(f"{API_URLS[core_type]}/{mc_version}/latest", allow_stale=False)
+            return {'url': f"{API_URLS[core_type]}/{mc_version}/{latest['build']}/download",
+                    'checksum': ('md5', latest['md5']) if latest.get('md5') else None, 'build': str(latest['build'])}
+        elif core_type == "Vanilla":
+            manifest = fetch_metadata_json(API_URLS['Vanilla'])
+            version_url = next((v['url'] for v in manifest['versions'] if v['id'] == mc_version), None)
+            if version_url:
+                # Version JSON URLs contain their own hash, so the cached copy never goes stale
+                version_data = fetch_metadata_json(version_url, ttl=float('inf'))
+                server = version_data['downloads']['server']
+                return {'url': server['url'], 'checksum': ('sha1', server['sha1']), 'build': None}
+        elif core_type == "Fabric":
+            # Get latest stable loader version
+            loaders = fetch_metadata_json(f"https://meta.fabricmc.net/v2/versions/loader/{mc_version}", allow_stale=False)
+            # The 'stable' key is inside the 'loader' object
+            stable_loaders = [v for v in loaders if v.get('loader', {}).get('stable')]
+            if not stable_loaders:
+                raise Exception(f"找不到適用於 Minecraft {mc_version} 的穩定版 Fabric loader")
+            loader_version = stable_loaders[0]['loader']['version']
+            
+            # Get latest stable installer version
+            installers = fetch_metadata_json("https://meta.fabricmc.net/v2/versions/installer", allow_stale=False)
+            stable_installers = [v for v in installers if v.get('stable')]
+            if not stable_installers:
+                raise Exception("找不到穩定版的 Fabric 安裝程式")
+            installer_version = stable_installers[0]['version']
+            
+            # Fabric generates the launcher jar on demand and publishes no checksum for it
+            return {'url': f"https://meta.fabricmc.net/v2/versions/loader/{mc_version}/{loader_version}/{installer_version}/server/jar",
+                    'checksum': None, 'build': f"{loader_version}-{installer_version}"}
+        elif core_type == "Forge":
+            # Forge downloads are behind an ad-wall, so we can't download directly.
+            # Instead, we'll return a special URL to open in the user's browser.
+            return {'url': f"WEBPAGE::https://files.minecraftforge.net/net/minecraftforge/forge/index_{mc_version}.html",
+                    'checksum': None, 'build': None}
+        elif core_type == "NeoForge":
+            # For NeoForge, the mc_version is the full version string
+            url = f"https://maven.neoforged.net/net/neoforged/neoforge/{mc_version}/neoforge-{mc_version}-installer.jar"
+            # Maven publishes a .sha1 next to every artifact; released artifacts never change
+            try:
+                sha1 = fetch_metadata(url + '.sha1', ttl=float('inf')).decode('ascii').split()[0]
+                checksum = ('sha1', sha1)
+            except (requests.RequestException, UnicodeDecodeError, IndexError):
+                checksum = None
+            return {'url': url, 'checksum': checksum, 'build': None}
+
+    except (requests.RequestException, StopIteration, KeyError, json.JSONDecodeError) as e:
+        print(f"(＃`Д´) 找不到下載連結啦：{e}")
+        return None
+    return None
+
+def get_download_url(core_type, mc_version):
+    info = get_download_info(core_type, mc_version)
+    return info['url'] if info else None
+
+def get_minecraft_version(core_type, version):
+    """
+    The Minecraft version of a core version string. NeoForge numbers its releases
+    after the Minecraft version without the leading '1.' ("21.1.77" is for 1.21.1,
+    "21.0.x" for 1.21); other cores use "<minecraft>-<build>" or the plain version.
+    """
+    version = str(version or '')
+    if core_type == "NeoForge" and not version.startswith('1.'):
+        parts = version.split('-')[0].split('.')
+        if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
+            return f"1.{parts[0]}" + (f".{parts[1]}" if parts[1] != '0' else '')
+    return version.split('-')[0]
+
+def get_required_java_version(mc_version_str):
+    try:
+        major_version = int(mc_version_str.split('.')[1])
+        if major_version >= 21: return 21
+        if major_version >= 17: return 17
+        if major_version >= 16: return 16
+    except (ValueError, IndexError): pass
+    return 8
+
+# --- Download Engine ---
+# Downloads go to .part files that survive interruptions and are resumed with HTTP
+# Range requests. Large files are fetched as several ranged segments in parallel.
+# A file only gets its final name after the upstream checksum has been verified.
+DOWNLOAD_MIN_CHUNK = 64 * 1024
+DOWNLOAD_MAX_CHUNK = 4 * 1024 * 1024
+DOWNLOAD_SEGMENT_THRESHOLD = 16 * 1024 * 1024
+PROGRESS_INTERVAL_SECONDS = 0.2
+
+def _probe_download(url):
+    """Returns (final_url, size or None, supports_ranges) using a HEAD request."""
+    try:
+        settings = load_settings()
+        response = get_http_session().head(url, allow_redirects=True,
+                                           timeout=(settings.get('http_connect_timeout', 10), settings.get('http_read_timeout', 60)))
+        response.raise_for_status()
+        size = int(response.headers.get('content-length', 0)) or None
+        return response.url, size, response.headers.get('accept-ranges', '').lower() == 'bytes'
+    except (requests.RequestException, ValueError):
+        return url, None, False
+
+def _download_segment(url, segment_path, start, end, chunk_size, on_bytes):
+    """Fetches bytes start..end (inclusive, end None = to EOF) into segment_path, resuming if it exists."""
+    existing = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+    if end is not None and existing >= end - start + 1:
+        on_bytes(existing)
+        return
+    headers = {}
+    if existing or start or end is not None:
+        headers['Range'] = f"bytes={start + existing}-{'' if end is None else end}"
+    with http_get(url, stream=True, headers=headers) as response:
+        if response.status_code == 416 and end is None and existing:
+            # Nothing left to fetch: the earlier attempt already got the whole file
+            on_bytes(existing)
+            return
+        response.raise_for_status()
+        if headers and response.status_code != 206:
+            # The server ignored the range: only acceptable for a whole-file download
+            if start or end is not None:
+                raise Exception("伺服器不支援分段下載。")
+            existing = 0
+        on_bytes(existing)
+        with open(segment_path, 'ab' if existing else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                on_bytes(len(chunk))
+
+def download_file(url, target_path, progress_callback, progress_range, label, checksum=None):
+    """
+    Downloads url to target_path. checksum is an optional (algorithm, hexdigest)
+    pair; when it is given, partial downloads left by an earlier attempt are
+    resumed, since any corruption would be caught by the final verification.
+    """
+    settings = load_settings()
+    final_url, total_size, supports_ranges = _probe_download(url)
+    connections = max(1, settings.get('download_connections', 4))
+    if total_size and supports_ranges and connections > 1 and total_size >= DOWNLOAD_SEGMENT_THRESHOLD:
+        segment_size = -(-total_size // connections)
+        segments = [(f"{target_path}.part{i}of{connections}", i * segment_size, min(total_size, (i + 1) * segment_size) - 1)
+                    for i in range(connections)]
+    else:
+        segments = [(target_path + '.part', 0, None)]
+    # Bigger files get bigger reads: about a hundred progress steps, within sane bounds
+    chunk_size = min(DOWNLOAD_MAX_CHUNK, max(DOWNLOAD_MIN_CHUNK, (total_size or 0) // 100))
+
+    if not checksum:
+        for segment_path, _, _ in segments:
+            if os.path.exists(segment_path): os.remove(segment_path)
+
+    start, end = progress_range
+    progress = {'bytes': 0, 'reported_at': 0.0}
+    progress_lock = threading.Lock()
+    def on_bytes(count):
+        with progress_lock:
+            progress['bytes'] += count
+            now = time.monotonic()
+            if total_size and now - progress['reported_at'] >= PROGRESS_INTERVAL_SECONDS:
+                progress['reported_at'] = now
+                done = min(progress['bytes'], total_size)
+                progress_callback(f"{label}... {done/1024/1024:.1f}MB / {total_size/1024/1024:.1f}MB",
+                                  start + (done / total_size) * (end - start))
+
+    if len(segments) == 1:
+        _download_segment(final_url, segments[0][0], 0, None, chunk_size, on_bytes)
+    else:
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            futures = [pool.submit(_download_segment, final_url, path, seg_start, seg_end, chunk_size, on_bytes)
+                       for path, seg_start, seg_end in segments]
+            for future in futures:
+                future.result()
+
+    # Join the segments (if any) and verify before the file gets its real name
+    joined_path = target_path + '.part'
+    if len(segments) > 1:
+        with open(joined_path, 'wb') as out:
+            for segment_path, _, _ in segments:
+                with open(segment_path, 'rb') as f:
+                    shutil.copyfileobj(f, out, DOWNLOAD_MAX_CHUNK)
+        for segment_path, _, _ in segments:
+            os.remove(segment_path)
+
+    if checksum:
+        hasher = hashlib.new(checksum[0])
+        with open(joined_path, 'rb') as f:
+            for block in iter(lambda: f.read(DOWNLOAD_MAX_CHUNK), b''):
+                hasher.update(block)
+        if hasher.hexdigest().lower() != checksum[1].lower():
+            os.remove(joined_path)
+            raise Exception(f"{os.path.basename(target_path)} 檢查碼不符，檔案可能已損毀，請重新下載。")
+    os.replace(joined_path, target_path)
+    progress_callback(f"{label}完成！", end)
+    return target_path
+
+# --- Artifact Cache ---
+# Server jars, installers and JDK archives are kept once per content hash and
+# indexed by (core, version, build, upstream checksum). Repeat installs hardlink
+# or copy from here instead of downloading, which also makes them work offline.
+ARTIFACT_CACHE_DIR = os.path.join(CACHE_DIR, 'artifacts')
+ARTIFACT_INDEX_FILE = os.path.join(ARTIFACT_CACHE_DIR, 'index.json')
+_artifact_lock = threading.Lock()
+_artifact_key_locks = collections.defaultdict(threading.Lock)
+
+def _artifact_object_path(sha256):
+    return os.path.join(ARTIFACT_CACHE_DIR, 'objects', sha256)
+
+def _load_artifact_index():
+    try:
+        with open(ARTIFACT_INDEX_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_artifact_index(index):
+    os.makedirs(ARTIFACT_CACHE_DIR, exist_ok=True)
+    with open(ARTIFACT_INDEX_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=4)
+    os.replace(ARTIFACT_INDEX_FILE + '.tmp', ARTIFACT_INDEX_FILE)
+
+def _file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(DOWNLOAD_MAX_CHUNK), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def make_artifact_key(kind, version, build, checksum, url):
+    # Without an upstream checksum the URL is the only thing that identifies the content
+    identity = f"{checksum[0]}:{checksum[1]}" if checksum else url
+    return f"{kind}/{version}/{build or '-'}/{identity}"
+
+def link_or_copy(source, target):
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def _artifact_stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def _artifact_object_intact(object_path, entry):
+    """
+    Cheap check of a cached object against its index entry: size and mtime, which change
+    when the file is modified through one of its hardlinks. Entries written before mtimes
+    were recorded are hashed once and get one. verify_artifact_cache() re-hashes everything.
+    """
+    try:
+        size, mtime = _artifact_stat(object_path)
+    except FileNotFoundError:
+        return False
+    if entry.get('mtime_ns') is not None:
+        return size == entry['size'] and mtime == entry['mtime_ns']
+    if size != entry['size'] or _file_sha256(object_path) != entry['sha256']:
+        return False
+    entry['mtime_ns'] = mtime
+    return True
+
+def fetch_artifact(key, url, checksum, progress_callback, progress_range, label, target_path=None):
+    """
+    Returns the cached object path for key, downloading it on a miss. With
+    target_path the artifact is also hardlinked (or copied) there.
+    """
+    with _artifact_key_locks[key]:
+        with _artifact_lock:
+            entry = _load_artifact_index().get(key)
+        object_path = _artifact_object_path(entry['sha256']) if entry else None
+        if entry and _artifact_object_intact(object_path, entry):
+            progress_callback(f"{label}：使用本機快取", progress_range[1])
+        else:
+            os.makedirs(os.path.join(ARTIFACT_CACHE_DIR, 'objects'), exist_ok=True)
+            download_path = os.path.join(ARTIFACT_CACHE_DIR, 'objects', f".download-{hashlib.sha256(key.encode('utf-8')).hexdigest()}")
+            download_file(url, download_path, progress_callback, progress_range, label, checksum)
+            sha256 = _file_sha256(download_path)
+            object_path = _artifact_object_path(sha256)
+            os.replace(download_path, object_path)
+            size, mtime = _artifact_stat(object_path)
+            entry = {'sha256': sha256, 'size': size, 'mtime_ns': mtime, 'url': url}
+
+        entry['last_used'] = time.time()
+        with _artifact_lock:
+            index = _load_artifact_index()
+            index[key] = entry
+            _save_artifact_index(index)
+        prune_artifact_cache(keep=key)
+
+        if target_path:
+            link_or_copy(object_path, target_path)
+        return object_path
+
+def list_artifact_cache():
+    """Returns (entries sorted by last use, newest first, total bytes on disk)."""
+    with _artifact_lock:
+        index = _load_artifact_index()
+    entries = [dict(entry, key=key) for key, entry in index.items()]
+    entries.sort(key=lambda entry: entry.get('last_used', 0), reverse=True)
+    total = sum(entry['size'] for entry in {entry['sha256']: entry for entry in entries}.values())
+    return entries, total
+
+def verify_artifact_cache():
+    """
+    Re-hashes every cached object and drops the entries whose object is missing or
+    changed, so they are downloaded again on next use. Returns the dropped keys.
+    """
+    with _artifact_lock:
+        index = _load_artifact_index()
+    hashes = {}
+    for sha256 in {entry['sha256'] for entry in index.values()}:
+        try: hashes[sha256] = _file_sha256(_artifact_object_path(sha256))
+        except FileNotFoundError: hashes[sha256] = None
+    with _artifact_lock:
+        index = _load_artifact_index()
+        dropped = [key for key, entry in index.items() if hashes.get(entry['sha256'], entry['sha256']) != entry['sha256']]
+        for key in dropped:
+            del index[key]
+        for sha256, actual in hashes.items():
+            if actual is not None and actual != sha256:
+                try: os.remove(_artifact_object_path(sha256))
+                except FileNotFoundError: pass
+        if dropped:
+            _save_artifact_index(index)
+    return dropped
+
+def prune_artifact_cache(max_bytes=None, keep=None):
+    """
+    Evicts least recently used artifacts until the cache fits in max_bytes
+    (default: the artifact_cache_max_mb setting). Returns (removed entries, freed bytes).
+    """
+    if max_bytes is None:
+        max_bytes = load_settings().get('artifact_cache_max_mb', 4096) * 1024 * 1024
+    removed, freed = 0, 0
+    with _artifact_lock:
+        index = _load_artifact_index()
+        # Several keys can share one object, so sizes are counted per object
+        objects = {entry['sha256']: entry['size'] for entry in index.values()}
+        total = sum(objects.values())
+        for key in sorted(index, key=lambda k: index[k].get('last_used', 0)):
+            if total <= max_bytes: break
+            if key == keep: continue
+            sha256 = index.pop(key)['sha256']
+            removed += 1
+            if not any(entry['sha256'] == sha256 for entry in index.values()):
+                total -= objects[sha256]
+                freed += objects[sha256]
+                try: os.remove(_artifact_object_path(sha256))
+                except FileNotFoundError: pass
+        if removed:
+            _save_artifact_index(index)
+    return removed, freed
+
+def get_java_package(version):
+    """Returns the Adoptium package info (link, checksum, name, size) of the latest JDK build."""
+    os_name = "windows" if sys.platform == "win32" else "mac" if sys.platform == "darwin" else "linux"
+    machine = platform.machine().lower()
+    arch = "aarch64" if machine in ("arm64", "aarch64") else "x64" if machine.endswith('64') else "x86"
+    api_url = f"https://api.adoptium.net/v3/assets/latest/{version}/hotspot?vendor=eclipse&os={os_name}&architecture={arch}"
+    try:
+        res = http_get(api_url)
+        res.raise_for_status()
+        binary_info = next(pkg for pkg in res.json() if pkg['binary']['image_type'] == 'jdk')
+        return binary_info['binary']['package']
+    except (requests.RequestException, StopIteration, KeyError) as e:
+        print(f"找不到 Java {version} 的下載連結: {e}")
+        return None
+
+def get_java_download_link(version):
+    package = get_java_package(version)
+    return package['link'] if package else None
+
+def _extract_java_archive(archive_path, archive_name, target_dir):
+    if archive_name.endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as zf:
+            zf.extractall(target_dir)
+    else:
+        with tarfile.open(archive_path, 'r:gz') as tf:
+            # The 'data' filter refuses absolute paths and links that escape target_dir
+            if hasattr(tarfile, 'data_filter'):
+                tf.extractall(target_dir, filter='data')
+            else:
+                tf.extractall(target_dir)
+
+_java_install_locks = collections.defaultdict(threading.Lock)
+
+def manage_java_installation(mc_version, progress_callback):
+    java_version = get_required_java_version(mc_version)
+    # Parallel installs needing the same JDK wait for the first one to finish it
+    with _java_install_locks[java_version]:
+        return _install_java(java_version, progress_callback)
+
+def _install_java(java_version, progress_callback):
+    java_install_path = os.path.join(JAVA_DIR, f"jdk-{java_version}")
+    java_exe = os.path.join(java_install_path, 'bin', 'java.exe' if sys.platform == "win32" else "java")
+
+    if os.path.exists(java_exe):
+        progress_callback(f"已找到 Java {java_version}！", 0.1)
+        return java_exe
+
+    progress_callback(f"需要 Java {java_version}，正在尋找下載連結...", 0.02)
+    package = get_java_package(java_version)
+    if not package: raise Exception(f"無法找到 Java {java_version} 的下載點。")
+
+    os.makedirs(JAVA_DIR, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=f".jdk-{java_version}-", dir=JAVA_DIR)
+    try:
+        progress_callback(f"正在下載 Java {java_version}...", 0.05)
+        checksum = ('sha256', package['checksum']) if package.get('checksum') else None
+        key = make_artifact_key('Java', java_version, package['name'], checksum, package['link'])
+        archive_path = fetch_artifact(key, package['link'], checksum, progress_callback, (0.05, 0.3), "下載 Java")
+
+        progress_callback(f"正在解壓縮 Java {java_version}...", 0.35)
+        _extract_java_archive(archive_path, package['name'], staging_dir)
+        extracted_root = os.path.join(staging_dir, os.listdir(staging_dir)[0])
+        # macOS packages keep the JDK home inside a bundle
+        mac_home = os.path.join(extracted_root, 'Contents', 'Home')
+        java_home = mac_home if os.path.isdir(mac_home) else extracted_root
+
+        # Only a fully extracted JDK is ever moved to its final name
+        if os.path.exists(java_install_path):
+            shutil.rmtree(java_install_path)
+        os.replace(java_home, java_install_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    progress_callback(f"Java {java_version} 安裝完成！", 0.4)
+    return java_exe
+
+# --- Server Installation System ---
+def install_server(core_type, mc_version, path, progress_callback, options=None, manual_download_handler=None):
+    """
+    options may override 'min_ram_mb', 'max_ram_mb', 'jvm_profile' and add
+    'jvm_extra_args' and 'properties' for server.properties. manual_download_handler(page_url, path) is asked to get the
+    Forge installer into path; without one an installer must already be there.
+    'pregen_radius' (blocks) starts a background pre-generation job once the server is installed, see PREGEN.
+    """
+    try:
+        progress_callback("準備開始...", 0.0)
+        settings = load_settings()
+        options = options or {}
+        min_ram = options.get('min_ram_mb', settings['min_ram_mb'])
+        max_ram = options.get('max_ram_mb', settings['max_ram_mb'])
+        jvm_profile = options.get('jvm_profile', settings.get('default_jvm_profile', 'auto'))
+        jvm_extra_args = list(options.get('jvm_extra_args', []))
+        # Reject a profile the server's Java cannot run before anything is downloaded
+        resolve_jvm_profile(jvm_profile, max_ram, get_required_java_version(get_minecraft_version(core_type, mc_version)))
+        capacity_warning = check_capacity({path: max_ram})
+        if capacity_warning:
+            progress_callback(f"警告：{capacity_warning}", 0.0)
+        
+        java_exe_path = settings['java_executable_path']
+        if settings['auto_download_java']:
+            java_mc_version = get_minecraft_version(core_type, mc_version)
+            java_exe_path = manage_java_installation(java_mc_version, progress_callback)
+        else:
+            progress_callback("使用系統預設 Java...", 0.4)
+
+        os.makedirs(path, exist_ok=True)
+        
+        progress_callback(f"正在尋找 {core_type} {mc_version}...", 0.42)
+        download_info = get_download_info(core_type, mc_version)
+        if not download_info: raise Exception("找不到下載連結或對應頁面。")
+        url = download_info['url']
+
+        INSTALLER_CORES = ["Forge", "NeoForge", "Fabric"]
+        is_installer_core = core_type in INSTALLER_CORES
+        
+        jar_name = "server.jar" # Default
+        download_target_path = ""
+
+        # --- Download Phase ---
+        if url.startswith("WEBPAGE::"):
+            page_url = url.replace("WEBPAGE::", "")
+            if manual_download_handler and not manual_download_handler(page_url, path):
+                raise Exception("使用者取消了手動下載。")
+            
+            # Scan for the downloaded installer
+            jars_in_dir = [f for f in os.listdir(path) if f.endswith('.jar')]
+            if len(jars_in_dir) == 0:
+                raise Exception(f"在 {path} 中找不到任何手動下載的 .jar 安裝檔。")
+            if len(jars_in_dir) > 1:
+                raise Exception(f"在 {path} 中找到多個 .jar 檔案，無法確定哪一個是安裝檔。")
+            download_target_path = os.path.join(path, jars_in_dir[0])
+            progress_callback("偵測到手動下載的安裝檔！", 0.85)
+
+        else: # Automatic download for other cores
+            download_target_name = "installer.jar" if is_installer_core else "server.jar"
+            download_target_path = os.path.join(path, download_target_name)
+            
+            progress_callback(f"正在下載 {download_target_name}...", 0.45)
+            key = make_artifact_key(core_type, mc_version, download_info['build'], download_info['checksum'], url)
+            fetch_artifact(key, url, download_info['checksum'], progress_callback, (0.45, 0.85), "下載伺服器核心",
+                           target_path=download_target_path)
+            progress_callback("下載完成！", 0.85)
+
+        # --- Installation/Setup Phase ---
+        if is_installer_core:
+            progress_callback(f"正在執行 {core_type} 安裝程式...", 0.86)
+            try:
+                result = subprocess.run(
+                    [java_exe_path, "-jar", download_target_path, "--installServer"],
+                    cwd=path, check=True, capture_output=True, text=True, encoding='utf-8'
+                )
+            except subprocess.CalledProcessError as e:
+                error_message = f"""安裝程式執行失敗！
+返回碼: {e.returncode}
+輸出: {e.stdout}
+錯誤: {e.stderr}"""
+                raise Exception(error_message)
+            except FileNotFoundError:
+                 raise Exception(f"找不到 Java 執行檔 '{java_exe_path}'。請檢查您的 Java 設定或啟用自動下載。")
+
+            # Clean up installer only if it was automatically downloaded
+            if not url.startswith("WEBPAGE::"):
+                os.remove(download_target_path)
+                
+            progress_callback("安裝程式執行完畢，正在設定啟動腳本...", 0.9)
+
+            if core_type in ["Forge", "NeoForge"]:
+                run_bat_file = os.path.join(path, 'run.bat')
+
+                if os.path.exists(run_bat_file):
+                    # Modern Forge/NeoForge scripts read their JVM flags from user_jvm_args.txt
+                    os.rename(run_bat_file, os.path.join(path, 'start.bat'))
+                    if os.path.exists(os.path.join(path, 'run.sh')):
+                        os.rename(os.path.join(path, 'run.sh'), os.path.join(path, 'start.sh'))
+                    
+                    jar_name = "N/A (Installer Core)"
+                else:
+                    # Fallback for older versions that might not create run.bat
+                    raise Exception("安裝後找不到 run.bat。可能是不支援的 Forge/NeoForge 版本。")
+
+            elif core_type == "Fabric":
+                jar_name = "fabric-server-launch.jar"
+        
+        # --- Finalization ---
+        profile = {"core_type": core_type, "version": mc_version, "jar_name": jar_name, "java_executable": java_exe_path,
+                   "min_ram_mb": min_ram, "max_ram_mb": max_ram, "jvm_profile": jvm_profile, "jvm_extra_args": jvm_extra_args}
+        write_launch_scripts(path, profile)
+        
+        progress_callback("啟動腳本建立完成...", 0.92)
+        
+        if settings['auto_accept_eula']:
+            with open(os.path.join(path, 'eula.txt'), 'w', encoding='utf-8') as f: f.write("eula=true")
+            progress_callback("已自動同意 EULA...", 0.95)
+
+        # Create default server.properties if it doesn't exist
+        settings = load_settings()
+        default_properties = {
+            'server-port': settings.get('default_server_port', '25565'),
+            'max-players': settings.get('default_max_players', '20'),
+            'online-mode': str(settings.get('default_online_mode', True)).lower(),
+            'difficulty': settings.get('default_difficulty', 'easy'),
+            'gamemode': settings.get('default_gamemode', 'survival'),
+            'pvp': str(settings.get('default_pvp', True)).lower()
+        }
+        property_overrides = {key: str(value) for key, value in options.get('properties', {}).items()}
+        default_properties.update(property_overrides)
+        
+        properties_path = os.path.join(path, 'server.properties')
+        if not os.path.exists(properties_path):
+            properties = ServerProperties.parse("# Minecraft server properties\n")
+            properties.update(default_properties)
+            properties.save(path)
+        elif property_overrides:
+            write_properties(path, property_overrides)
+        
+        write_server_profile(path, profile)
+        progress_callback("伺服器設定檔建立完成！", 1.0)
+
+        if options.get('pregen_radius'):
+            PREGEN.start(path, options['pregen_radius'])
+            progress_callback(f"已開始預先生成半徑 {options['pregen_radius']} 格的世界...", 1.0)
+        
+        return f"{core_type} {mc_version}"
+    except Exception as e:
+        raise e
+
+# --- Batch Provisioning ---
+# A spec (JSON or TOML) describes many servers; they are installed concurrently
+# with a bounded pool. Identical jars and JDKs are downloaded once thanks to the
+# per-key locks of the artifact cache. Example:
+#   {"max_parallel": 4,
+#    "defaults": {"core": "Paper", "version": "1.21.1", "max_ram_mb": 4096},
+#    "servers": [{"path": "D:/mc/lobby", "port": 25565},
+#                {"path": "D:/mc/game-{n}", "count": 10, "properties": {"view-distance": 8}}]}
+# Options passed through to install_server(); together with PROVISION_SERVER_FIELDS these
+# are the only keys a server entry may have, so a typo fails instead of being ignored
+PROVISION_INSTALL_OPTIONS = ('min_ram_mb', 'max_ram_mb', 'jvm_profile', 'jvm_extra_args', 'pregen_radius')
+PROVISION_SERVER_FIELDS = ('core', 'version', 'path', 'port', 'count', 'properties')
+def load_provision_spec(spec_path):
+    if spec_path.lower().endswith('.toml'):
+        import tomllib
+        with open(spec_path, 'rb') as f:
+            return tomllib.load(f)
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def expand_provision_spec(spec):
+    """Applies defaults and 'count' templates, returning one dict per server."""
+    defaults = spec.get('defaults', {})
+    servers = []
+    allowed = set(PROVISION_SERVER_FIELDS + PROVISION_INSTALL_OPTIONS)
+    for entry in [defaults] + spec.get('servers', []):
+        unknown = set(entry) - allowed
+        if unknown:
+            raise Exception(f"批次設定檔中有未知的欄位：{', '.join(sorted(unknown))} (可用：{', '.join(sorted(allowed))})")
+    for entry in spec.get('servers', []):
+        merged = dict(defaults, **entry)
+        properties = dict(defaults.get('properties', {}), **entry.get('properties', {}))
+        count = int(merged.pop('count', 1))
+        for n in range(1, count + 1):
+            server = dict(merged, properties=dict(properties), path=os.path.normpath(merged.get('path', '').format(n=n)))
+            for field in ('core', 'version', 'path'):
+                if not server.get(field) or server[field] == '.':
+                    raise Exception(f"批次設定檔中有伺服器缺少 '{field}' 欄位。")
+            servers.append(server)
+    paths = [server['path'] for server in servers]
+    duplicates = {path for path in paths if paths.count(path) > 1}
+    if duplicates:
+        raise Exception(f"批次設定檔中有重複的安裝路徑：{', '.join(sorted(duplicates))}")
+    return servers
+
+def assign_ports(servers, reserved_ports=()):
+    """Keeps requested ports where possible and gives colliding or missing ones the next free port."""
+    used = set(reserved_ports)
+    needs_port = []
+    for server in servers:
+        requested = server.get('port') or server['properties'].get('server-port')
+        if requested is not None and int(requested) not in used:
+            server['port'] = int(requested)
+            used.add(server['port'])
+        else:
+            if requested is not None:
+                print(f"連接埠 {requested} 已被使用，將為 {server['path']} 自動分配。")
+            needs_port.append(server)
+    next_port = int(load_settings().get('default_server_port', '25565'))
+    for server in needs_port:
+        while next_port in used: next_port += 1
+        server['port'] = next_port
+        used.add(next_port)
+    for server in servers:
+        server['properties']['server-port'] = str(server['port'])
+    return servers
+
+def get_known_server_ports():
+    ports = set()
+    for server in scan_for_servers(load_settings().get('scan_path', '')):
+        try:
+            port = (read_properties(server['path']) or {}).get('server-port')
+            if port: ports.add(int(port))
+        except (ValueError, OSError):
+            continue
+    return ports
+
+def provision_servers(spec, progress_callback, max_parallel=None):
+    """
+    Installs every server of a spec. progress_callback(server_path, text, value)
+    reports per server. Returns one result dict per server, failures included.
+    """
+    servers = assign_ports(expand_provision_spec(spec), get_known_server_ports())
+    max_parallel = max_parallel or spec.get('max_parallel', 4)
+    # Check the whole batch up front; the installs run in parallel and would not see each other
+    default_max_ram = load_settings()['max_ram_mb']
+    capacity_warning = check_capacity({server['path']: server.get('max_ram_mb', default_max_ram) for server in servers})
+    if capacity_warning:
+        for server in servers:
+            progress_callback(server['path'], f"警告：{capacity_warning}", 0.0)
+
+    def install_one(server):
+        options = {'properties': server['properties']}
+        for key in PROVISION_INSTALL_OPTIONS:
+            if key in server: options[key] = server[key]
+        return install_server(server['core'], server['version'], server['path'],
+                              lambda text, value: progress_callback(server['path'], text, value), options)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        futures = [(server, pool.submit(install_one, server)) for server in servers]
+        for server, future in futures:
+            result = {'path': server['path'], 'core': server['core'], 'version': server['version'], 'port': server['port']}
+            try:
+                result.update(ok=True, result=future.result())
+            except Exception as e:
+                result.update(ok=False, error=str(e))
+                progress_callback(server['path'], f"安裝失敗：{e}", 0)
+            results.append(result)
+    return results
+
+# --- Server Properties Configuration Handler ---
+# server.properties is parsed into an ordered list of entries that keep their original
+# text, so comments, blank lines, unknown keys and untouched values are written back
+# byte for byte. Parsing follows java.util.Properties: '=', ':' or whitespace separate
+# key and value, a trailing backslash continues the line, and \t \n \uXXXX are escapes.
+# Changed values are written with non-ASCII characters as \uXXXX, which every server
+# version reads correctly whatever encoding it expects.
+PROPERTIES_FILE_NAME = 'server.properties'
+PROPERTY_BOOLEANS = {
+    'accepts-transfers', 'allow-flight', 'allow-nether', 'broadcast-console-to-ops', 'broadcast-rcon-to-ops',
+    'enable-command-block', 'enable-jmx-monitoring', 'enable-query', 'enable-rcon', 'enable-status',
+    'enforce-secure-profile', 'enforce-whitelist', 'force-gamemode', 'generate-structures', 'hardcore',
+    'hide-online-players', 'log-ips', 'online-mode', 'prevent-proxy-connections', 'pvp', 'require-resource-pack',
+    'spawn-animals', 'spawn-monsters', 'spawn-npcs', 'sync-chunk-writes', 'use-native-transport', 'white-list'
+}
+# key: (minimum, maximum)
+PROPERTY_INTEGERS = {
+    'server-port': (1, 65535), 'query.port': (1, 65535), 'rcon.port': (1, 65535),
+    'max-players': (0, 2147483647), 'view-distance': (2, 32), 'simulation-distance': (2, 32),
+    'spawn-protection': (0, 2147483647), 'max-world-size': (1, 29999984), 'max-tick-time': (-1, 2147483647),
+    'network-compression-threshold': (-1, 2147483647), 'op-permission-level': (0, 4),
+    'function-permission-level': (1, 4), 'entity-broadcast-range-percentage': (10, 1000),
+    'player-idle-timeout': (0, 2147483647), 'rate-limit': (0, 2147483647),
+    'max-chained-neighbor-updates': (-2147483648, 2147483647), 'pause-when-empty-seconds': (-2147483648, 2147483647)
+}
+# Older versions also accept the numeric ids 0-3
+PROPERTY_CHOICES = {
+    'difficulty': ['peaceful', 'easy', 'normal', 'hard'],
+    'gamemode': ['survival', 'creative', 'adventure', 'spectator']
+}
+
+def validate_property(key, value):
+    """Returns the value as it should be written, or raises for values the server would reject."""
+    if isinstance(value, bool):
+        value = str(value).lower()
+    value = str(value)
+    if key in PROPERTY_BOOLEANS:
+        if value.strip().lower() not in ('true', 'false'):
+            raise Exception(f"{key} 必須是 true 或 false，而不是 '{value}'")
+        return value.strip().lower()
+    if key in PROPERTY_INTEGERS:
+        minimum, maximum = PROPERTY_INTEGERS[key]
+        try:
+            number = int(value.strip())
+        except ValueError:
+            raise Exception(f"{key} 必須是整數，而不是 '{value}'")
+        if not minimum <= number <= maximum:
+            raise Exception(f"{key} 必須介於 {minimum} 到 {maximum} 之間")
+        return str(number)
+    if key in PROPERTY_CHOICES:
+        choices = PROPERTY_CHOICES[key]
+        normalized = value.strip().lower()
+        if normalized not in choices and normalized not in {str(index) for index in range(len(choices))}:
+            raise Exception(f"{key} 必須是 {', '.join(choices)} 其中之一")
+        return normalized
+    return value
+
+PROPERTY_UNICODE_ESCAPE = re.compile(r"[0-9A-Fa-f]{4}")
+
+def _unescape_property(text):
+    result, index = [], 0
+    while index < len(text):
+        char = text[index]
+        index += 1
+        if char != '\\' or index >= len(text):
+            result.append(char)
+            continue
+        char = text[index]
+        index += 1
+        if char == 'u':
+            # Exactly four hex digits, as java.util.Properties requires; int() alone would take "0x41" or "+041"
+            if not PROPERTY_UNICODE_ESCAPE.fullmatch(text, index, index + 4):
+                raise Exception(f"無效的 \\u 跳脫字元：\\u{text[index:index + 4]}")
+            result.append(chr(int(text[index:index + 4], 16)))
+            index += 4
+        else:
+            result.append({'t': '\t', 'n': '\n', 'r': '\r', 'f': '\f'}.get(char, char))
+    # Join \uXXXX surrogate pairs back into single characters; unpaired surrogates are kept as they are
+    return ''.join(result).encode('utf-16', 'surrogatepass').decode('utf-16', 'surrogatepass')
+
+def _escape_property(text, is_key):
+    result = []
+    for index, char in enumerate(text):
+        if char == '\\': result.append('\\\\')
+        elif char == '\t': result.append('\\t')
+        elif char == '\n': result.append('\\n')
+        elif char == '\r': result.append('\\r')
+        elif char == '\f': result.append('\\f')
+        elif char == ' ' and (is_key or index == 0): result.append('\\ ')
+        elif char in '=:#!' and is_key: result.append('\\' + char)
+        elif ord(char) < 0x20 or ord(char) > 0x7e:
+            # Characters outside the BMP become surrogate pairs, as Java stores them
+            data = char.encode('utf-16-be', 'surrogatepass')
+            result.extend(f"\\u{int.from_bytes(data[i:i + 2], 'big'):04x}" for i in range(0, len(data), 2))
+        else: result.append(char)
+    return ''.join(result)
+
+# Only these end a line in java.util.Properties; str.splitlines() would also split on \f, \x85, \u2028 and others
+PROPERTY_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+def _split_physical_lines(text):
+    """Physical lines of a properties file, each with its line terminator."""
+    lines, start = [], 0
+    for match in PROPERTY_LINE_BREAK.finditer(text):
+        lines.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        lines.append(text[start:])
+    return lines
+
+def _split_property_line(logical):
+    """Splits a logical line (continuations already joined) into raw key and raw value."""
+    index, length = 0, len(logical)
+    while index < length:
+        char = logical[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char in '=: \t\f':
+            break
+        index += 1
+    key, rest = logical[:index], logical[index:]
+    rest = rest.lstrip(' \t\f')
+    if rest[:1] in ('=', ':'):
+        rest = rest[1:].lstrip(' \t\f')
+    return key, rest
+
+class ServerProperties:
+    """Ordered, lossless model of a server.properties file."""
+    def __init__(self, newline='\n', encoding='utf-8'):
+        # Each entry is [key or None, value, original text or None]; None keys are comments/blank lines
+        self.entries = []
+        self.index = {}
+        self.newline = newline
+        self.encoding = encoding
+
+    @classmethod
+    def parse(cls, text, encoding='utf-8'):
+        newline = '\r\n' if '\r\n' in text else '\n'
+        properties = cls(newline, encoding)
+        physical = _split_physical_lines(text)
+        position = 0
+        while position < len(physical):
+            start = position
+            line = physical[position].rstrip('\r\n')
+            position += 1
+            stripped = line.lstrip(' \t\f')
+            if not stripped or stripped[0] in '#!':
+                properties.entries.append([None, None, physical[start]])
+                continue
+            logical = stripped
+            # An odd number of trailing backslashes continues the value on the next line
+            while (len(logical) - len(logical.rstrip('\\'))) % 2 == 1 and position < len(physical):
+                logical = logical[:-1] + physical[position].rstrip('\r\n').lstrip(' \t\f')
+                position += 1
+            if (len(logical) - len(logical.rstrip('\\'))) % 2 == 1:
+                logical = logical[:-1]
+            raw_key, raw_value = _split_property_line(logical)
+            key = _unescape_property(raw_key)
+            properties._store(key, _unescape_property(raw_value), ''.join(physical[start:position]))
+        return properties
+
+    @classmethod
+    def load(cls, server_path):
+        with open(os.path.join(server_path, PROPERTIES_FILE_NAME), 'rb') as f:
+            data = f.read()
+        try:
+            return cls.parse(data.decode('utf-8'), 'utf-8')
+        except UnicodeDecodeError:
+            # Files written by older versions are ISO-8859-1
+            return cls.parse(data.decode('latin-1'), 'latin-1')
+
+    def _store(self, key, value, text):
+        if key in self.index:
+            # Later duplicates win, as in java.util.Properties; the earlier line is kept verbatim but no longer tracked
+            self.entries[self.index[key]][0] = None
+        self.index[key] = len(self.entries)
+        self.entries.append([key, value, text])
+
+    def get(self, key, default=None):
+        position = self.index.get(key)
+        return default if position is None else self.entries[position][1]
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def keys(self):
+        return [entry[0] for entry in self.entries if entry[0] is not None]
+
+    def as_dict(self):
+        return {entry[0]: entry[1] for entry in self.entries if entry[0] is not None}
+
+    def set(self, key, value, validate=True):
+        value = validate_property(key, value) if validate else str(value)
+        position = self.index.get(key)
+        if position is None:
+            self.index[key] = len(self.entries)
+            self.entries.append([key, value, None])
+        elif self.entries[position][1] != value:
+            self.entries[position] = [key, value, None]
+
+    def update(self, values, validate=True):
+        for key, value in values.items():
+            self.set(key, value, validate)
+
+    def remove(self, key):
+        position = self.index.pop(key, None)
+        if position is not None:
+            self.entries[position] = [None, None, '']
+
+    def dumps(self):
+        parts = []
+        for key, value, text in self.entries:
+            if text is None:
+                # A line appended after a last line without a line break must start on its own line
+                if parts and not parts[-1].endswith(('\n', '\r')):
+                    parts.append(self.newline)
+                text = f"{_escape_property(key, True)}={_escape_property(value, False)}{self.newline}"
+            if text:
+                parts.append(text)
+        return ''.join(parts)
+
+    def write_temp(self, server_path):
+        """Writes the new content next to server.properties and returns the temp path (see commit())."""
+        target = os.path.join(server_path, PROPERTIES_FILE_NAME)
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = self.dumps().encode(self.encoding, errors='backslashreplace')
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(target):
+            shutil.copymode(target, temp_path)
+        return temp_path
+
+    @staticmethod
+    def commit(server_path, temp_path):
+        os.replace(temp_path, os.path.join(server_path, PROPERTIES_FILE_NAME))
+
+    def save(self, server_path):
+        self.commit(server_path, self.write_temp(server_path))
+
+def read_properties(server_path):
+    if not os.path.exists(os.path.join(server_path, PROPERTIES_FILE_NAME)): return None
+    return ServerProperties.load(server_path).as_dict()
+
+def write_properties(server_path, new_values):
+    properties = ServerProperties.load(server_path)
+    properties.update(new_values)
+    properties.save(server_path)
+
+def apply_properties_batch(server_paths, changes, remove=()):
+    """
+    Applies one change set to many servers as a single operation: every file is parsed,
+    validated and written to a temp file first, and only when all of them succeeded are
+    the temp files renamed over the originals. Raises without touching any server otherwise.
+    Returns the list of server paths whose file actually changed.
+    """
+    changes = {key: validate_property(key, value) for key, value in changes.items()}
+    prepared, errors = [], []
+    try:
+        for server_path in server_paths:
+            try:
+                properties = ServerProperties.load(server_path)
+                before = properties.dumps()
+                properties.update(changes, validate=False)
+                for key in remove: properties.remove(key)
+                if properties.dumps() != before:
+                    prepared.append((server_path, properties.write_temp(server_path)))
+            except Exception as e:
+                errors.append(f"{server_path}: {e}")
+        if errors:
+            raise Exception("以下伺服器無法套用設定，所有變更皆已取消：\n" + "\n".join(errors))
+    except Exception:
+        for _, temp_path in prepared:
+            try: os.remove(temp_path)
+            except OSError: pass
+        raise
+    for server_path, temp_path in prepared:
+        ServerProperties.commit(server_path, temp_path)
+    return [server_path for server_path, _ in prepared]
+
+def select_servers(core_type=None, version=None, root=None):
+    """Registered servers filtered by core and Minecraft version, for batch operations."""
+    return [server['path'] for server in get_known_servers(root)
+            if (core_type is None or server.get('core_type', '').lower() == core_type.lower())
+            and (version is None or server.get('version') == version)]
+
+# --- Server Discovery & Management Module ---
+def scan_for_servers(path, on_found=None):
+    """
+    Returns the profiles of every server under path (with a 'path' key added).
+    Backed by the server registry, so repeated scans only list directories that changed.
+    on_found(profile) is called as each server is confirmed, for streaming results to a UI.
+    """
+    if not os.path.isdir(path): return []
+    return REGISTRY.rescan(path, on_found)
+
+# --- Server Registry ---
+# Persistent index of known servers and of the scanned directory tree. Adding or removing
+# an entry changes a directory's mtime, so a rescan stats every directory but only lists
+# the ones whose mtime moved; unchanged directories reuse their cached subdirectory names.
+REGISTRY_FILE = os.path.join(APP_DIR, 'server_registry.json')
+PROFILE_FILE_NAME = 'installer_profile.json'
+
+class ServerRegistry:
+    def __init__(self, registry_file):
+        self.registry_file = registry_file
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+        self.servers = {}
+        self.dirs = {}
+        self.loaded = False
+
+    def _ensure_loaded(self):
+        with self.lock:
+            if self.loaded: return
+            self.loaded = True
+            try:
+                with open(self.registry_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.servers = data.get('servers', {})
+                self.dirs = data.get('dirs', {})
+            except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+                self.servers, self.dirs = {}, {}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({'servers': self.servers, 'dirs': self.dirs})
+        os.makedirs(os.path.dirname(self.registry_file), exist_ok=True)
+        temp_path = f"{self.registry_file}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.registry_file)
+
+    def _read_profile(self, server_dir):
+        """Returns the cached profile, re-reading installer_profile.json only when it changed."""
+        profile_path = os.path.join(server_dir, PROFILE_FILE_NAME)
+        try:
+            mtime = os.stat(profile_path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.servers.get(server_dir)
+        if cached and cached['mtime'] == mtime:
+            return dict(cached['profile'], path=server_dir)
+        try:
+            with open(profile_path, 'r') as f:
+                profile = json.load(f)
+            if not isinstance(profile, dict): return None
+        except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        profile.pop('path', None)
+        with self.lock:
+            self.servers[server_dir] = {'profile': profile, 'mtime': mtime}
+        return dict(profile, path=server_dir)
+
+    @staticmethod
+    def _list_directory(directory, mtime):
+        subdirs, is_server = [], False
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name == PROFILE_FILE_NAME:
+                    is_server = True
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+        return {'mtime': mtime, 'subdirs': sorted(subdirs), 'server': is_server}
+
+    def rescan(self, root, on_found=None):
+        self._ensure_loaded()
+        root = os.path.normpath(os.path.abspath(root))
+        found, seen = [], set()
+        with self.scan_lock:
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                    entry = self.dirs.get(directory)
+                    if entry is None or entry['mtime'] != mtime:
+                        entry = self._list_directory(directory, mtime)
+                        with self.lock: self.dirs[directory] = entry
+                except OSError:
+                    continue
+                seen.add(directory)
+                if entry['server']:
+                    profile = self._read_profile(directory)
+                    if profile is not None:
+                        found.append(profile)
+                        if on_found: on_found(profile)
+                        # Worlds and libraries below a server never hold other servers
+                        continue
+                stack.extend(os.path.join(directory, name) for name in reversed(entry['subdirs']))
+
+            prefix = root.rstrip(os.sep) + os.sep
+            found_paths = {profile['path'] for profile in found}
+            with self.lock:
+                for directory in [d for d in self.dirs if (d == root or d.startswith(prefix)) and d not in seen]:
+                    del self.dirs[directory]
+                for server_dir in [d for d in self.servers if (d == root or d.startswith(prefix)) and d not in found_paths]:
+                    del self.servers[server_dir]
+            self.save()
+        return found
+
+    def known_servers(self, root=None):
+        """Registered servers (optionally only those under root) without touching the disk."""
+        self._ensure_loaded()
+        with self.lock:
+            items = list(self.servers.items())
+        if root is not None:
+            root = os.path.normpath(os.path.abspath(root))
+            prefix = root.rstrip(os.sep) + os.sep
+            items = [(d, entry) for d, entry in items if d == root or d.startswith(prefix)]
+        return [dict(entry['profile'], path=d) for d, entry in sorted(items)]
+
+    def tree_dirs(self, root):
+        """Directories under root known from the last rescan (server directories included)."""
+        self._ensure_loaded()
+        root = os.path.normpath(os.path.abspath(root))
+        prefix = root.rstrip(os.sep) + os.sep
+        with self.lock:
+            return [d for d in self.dirs if d == root or d.startswith(prefix)]
+
+    def register(self, server_dir):
+        self._ensure_loaded()
+        server_dir = os.path.normpath(os.path.abspath(server_dir))
+        profile = self._read_profile(server_dir)
+        if profile is not None:
+            self.save()
+        return profile
+
+    def unregister(self, server_dir):
+        self._ensure_loaded()
+        server_dir = os.path.normpath(os.path.abspath(server_dir))
+        with self.lock:
+            removed = self.servers.pop(server_dir, None)
+        if removed is not None:
+            self.save()
+
+REGISTRY = ServerRegistry(REGISTRY_FILE)
+
+def register_server(server_path):
+    return REGISTRY.register(server_path)
+
+def unregister_server(server_path):
+    REGISTRY.unregister(server_path)
+
+def get_known_servers(root=None):
+    return REGISTRY.known_servers(root)
+
+# --- Filesystem Watcher ---
+# Pushes changes made outside the tool (a server copied in or deleted, server.properties
+# edited by hand) to a callback. Linux uses inotify through libc; other systems poll the
+# watched directories and key files against a stat cache. Raw notifications are coalesced:
+# nothing is reported until the tree has been quiet for the debounce period (or five times
+# that has passed), then each server gets at most one event for the whole burst.
+WATCHED_SERVER_FILES = ('server.properties', PROFILE_FILE_NAME)
+
+class _PollingBackend:
+    def __init__(self, interval):
+        self.interval = interval
+        self.stats = {}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def update(self, dirs, files):
+        paths = set(dirs) | set(files)
+        for path in [path for path in self.stats if path not in paths]:
+            del self.stats[path]
+        for path in paths:
+            if path not in self.stats:
+                self.stats[path] = self._stat(path)
+
+    def read(self, timeout, stop_event):
+        stop_event.wait(max(timeout, self.interval))
+        changed = []
+        for path, previous in list(self.stats.items()):
+            current = self._stat(path)
+            if current != previous:
+                self.stats[path] = current
+                changed.append(path)
+        return changed
+
+    def close(self):
+        self.stats.clear()
+
+class _InotifyBackend:
+    IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x8, 0x40, 0x80
+    IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_MOVE_SELF = 0x100, 0x200, 0x400, 0x800
+    IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR = 0x4000, 0x8000, 0x1000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}
+        self.watches = {}
+
+    def update(self, dirs, files):
+        # Files are covered by the watch on their directory
+        wanted = set(dirs) | {os.path.dirname(path) for path in files}
+        for path in [path for path in self.watches if path not in wanted]:
+            self.libc.inotify_rm_watch(self.fd, self.watches.pop(path))
+        for path in wanted - set(self.watches):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, "inotify watch limit reached")
+                continue
+            self.watches[path] = wd
+            self.paths[wd] = path
+
+    def read(self, timeout, stop_event):
+        readable, _, _ = select.select([self.fd], [], [], min(timeout, 1.0))
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        changed, offset = [], 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped, so report every watched directory
+                changed.extend(self.watches)
+                continue
+            directory = self.paths.get(wd)
+            if mask & self.IN_IGNORED:
+                if self.watches.get(directory) == wd: del self.watches[directory]
+                self.paths.pop(wd, None)
+                continue
+            if directory is not None:
+                changed.append(os.path.join(directory, os.fsdecode(name)) if name else directory)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class ServerWatcher:
+    """
+    Watches the scan root and every registered server on a background thread and calls
+    callback(events) with lists of {'type': 'added'|'removed'|'modified', 'path': ...,
+    'files': [...]} where files names the top-level entries of the server that changed.
+    """
+    def __init__(self, root, callback):
+        settings = load_settings()
+        self.root = os.path.normpath(os.path.abspath(root))
+        self.callback = callback
+        self.debounce = settings.get('watch_debounce_seconds', 1.0)
+        self.poll_interval = settings.get('watch_poll_interval_seconds', 5)
+        self.stop_event = threading.Event()
+        self.servers = {}
+        self.backend = None
+        self.thread = None
+
+    def start(self):
+        self.servers = {server['path']: server for server in get_known_servers()}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _create_backend(self):
+        if sys.platform.startswith('linux'):
+            try:
+                return _InotifyBackend()
+            except (OSError, AttributeError) as e:
+                print(f"無法使用 inotify，改用輪詢：{e}")
+        return _PollingBackend(self.poll_interval)
+
+    def _refresh_watches(self):
+        dirs = set(REGISTRY.tree_dirs(self.root)) | set(self.servers)
+        files = [os.path.join(server, name) for server in self.servers for name in WATCHED_SERVER_FILES]
+        try:
+            self.backend.update(dirs, files)
+        except OSError as e:
+            print(f"檔案監看數量超過系統上限，改用輪詢：{e}")
+            self.backend.close()
+            self.backend = _PollingBackend(self.poll_interval)
+            self.backend.update(dirs, files)
+
+    def _run(self):
+        self.backend = self._create_backend()
+        self._refresh_watches()
+        pending, first_change, last_change = set(), 0.0, 0.0
+        try:
+            while not self.stop_event.is_set():
+                changed = self.backend.read(self.debounce / 2 if pending else 1.0, self.stop_event)
+                now = time.monotonic()
+                if changed:
+                    if not pending: first_change = now
+                    pending.update(changed)
+                    last_change = now
+                if pending and (now - last_change >= self.debounce or now - first_change >= self.debounce * 5):
+                    batch, pending = pending, set()
+                    try:
+                        events = self._process(batch)
+                    except Exception as e:
+                        print(f"處理檔案變更失敗：{e}")
+                        continue
+                    if events and not self.stop_event.is_set():
+                        self.callback(events)
+        finally:
+            self.backend.close()
+
+    def _server_for(self, path):
+        while True:
+            if path in self.servers: return path
+            parent = os.path.dirname(path)
+            if path == self.root or parent == path: return None
+            path = parent
+
+    def _process(self, changed_paths):
+        rescan, modified = False, collections.defaultdict(set)
+        for path in changed_paths:
+            server = self._server_for(path)
+            if server is None or path == server:
+                # Something appeared or vanished in the tree, or a server directory itself moved
+                rescan = True
+                if server is None: continue
+            name = os.path.relpath(path, server).split(os.sep)[0]
+            names = modified[server]
+            if name != os.curdir: names.add(name)
+            if name == PROFILE_FILE_NAME: rescan = True
+
+        events = []
+        if rescan:
+            before = self.servers
+            after = {server['path']: server for server in scan_for_servers(self.root)} if os.path.isdir(self.root) else {}
+            # Servers registered outside the scan root are kept while their profile exists
+            for path, server in before.items():
+                if path not in after and not self._under_root(path) and os.path.exists(os.path.join(path, PROFILE_FILE_NAME)):
+                    after[path] = server
+            for path in before.keys() - after.keys():
+                unregister_server(path)
+                events.append({'type': 'removed', 'path': path, 'files': []})
+            for path in after.keys() - before.keys():
+                events.append({'type': 'added', 'path': path, 'files': [], 'server': after[path]})
+            for path in before.keys() & after.keys():
+                if before[path] != after[path]: modified[path].add(PROFILE_FILE_NAME)
+            self.servers = after
+            self._refresh_watches()
+        for path, names in modified.items():
+            if path in self.servers:
+                events.append({'type': 'modified', 'path': path, 'files': sorted(names), 'server': self.servers[path]})
+        return events
+
+    def _under_root(self, path):
+        return path == self.root or path.startswith(self.root.rstrip(os.sep) + os.sep)
+
+def read_server_profile(server_path):
+    with open(os.path.join(server_path, 'installer_profile.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_server_profile(server_path, profile):
+    profile_path = os.path.join(server_path, 'installer_profile.json')
+    with open(profile_path + '.tmp', 'w', encoding='utf-8') as f: json.dump(profile, f, indent=4)
+    os.replace(profile_path + '.tmp', profile_path)
+    # Keeps the registry (and the capacity plan built from it) in step with the new heap and flags
+    register_server(server_path)
+
+def _find_forge_args_file(server_path):
+    args_name = 'win_args.txt' if sys.platform == "win32" else 'unix_args.txt'
+    for root, dirs, files in os.walk(os.path.join(server_path, 'libraries')):
+        if args_name in files:
+            return os.path.join(root, args_name)
+    return None
+
+def _script_launch_command(server_path):
+    if sys.platform == "win32":
+        if os.path.exists(os.path.join(server_path, 'start.bat')):
+            return ['cmd', '/c', 'start.bat']
+    elif os.path.exists(os.path.join(server_path, 'start.sh')):
+        return ['sh', 'start.sh']
+    raise FileNotFoundError("找不到 start.bat / start.sh 啟動檔！")
+
+# --- JVM Flag Profiles ---
+# Tuned flag sets chosen from the heap size and the Java version a server needs.
+# The choice ('auto' or a profile name) and any extra flags are kept in the
+# installer profile; start.bat/start.sh or user_jvm_args.txt are regenerated from
+# them whenever the profile or the memory settings change.
+JVM_PROFILES = {
+    'auto': "自動選擇",
+    'aikar': "G1 (Aikar's flags)",
+    'zgc': "ZGC",
+    'shenandoah': "Shenandoah",
+    'custom': "自訂 (僅記憶體與額外參數)",
+}
+# Lowest Java version (as returned by get_required_java_version) each collector runs on
+JVM_PROFILE_MIN_JAVA = {'zgc': 16, 'shenandoah': 16}
+# 'auto' switches to ZGC from this heap size on Java 21, where it is generational
+ZGC_AUTO_MIN_HEAP_MB = 16384
+# Aikar's guide uses a larger young generation and region size above 12 GB
+AIKAR_LARGE_HEAP_MB = 12288
+GC_LOG_FILE = 'logs/gc.log'
+
+def _aikar_flags(max_ram_mb):
+    large = max_ram_mb >= AIKAR_LARGE_HEAP_MB
+    return ["-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200",
+            "-XX:+UnlockExperimentalVMOptions", "-XX:+DisableExplicitGC", "-XX:+AlwaysPreTouch",
+            f"-XX:G1NewSizePercent={40 if large else 30}", f"-XX:G1MaxNewSizePercent={50 if large else 40}",
+            f"-XX:G1HeapRegionSize={'16M' if large else '8M'}", f"-XX:G1ReservePercent={15 if large else 20}",
+            "-XX:G1HeapWastePercent=5", "-XX:G1MixedGCCountTarget=4",
+            f"-XX:InitiatingHeapOccupancyPercent={20 if large else 15}", "-XX:G1MixedGCLiveThresholdPercent=90",
+            "-XX:G1RSetUpdatingPauseTimePercent=5", "-XX:SurvivorRatio=32", "-XX:+PerfDisableSharedMem",
+            "-XX:MaxTenuringThreshold=1", "-Dusing.aikars.flags=https://mcflags.emc.gs", "-Daikars.new.flags=true"]
+
+def _zgc_flags(java_version):
+    flags = ["-XX:+UseZGC"]
+    if java_version >= 21: flags.append("-XX:+ZGenerational")
+    return flags + ["-XX:+AlwaysPreTouch", "-XX:+DisableExplicitGC", "-XX:+PerfDisableSharedMem"]
+
+def _shenandoah_flags():
+    return ["-XX:+UseShenandoahGC", "-XX:+AlwaysPreTouch", "-XX:+DisableExplicitGC",
+            "-XX:+ParallelRefProcEnabled", "-XX:+PerfDisableSharedMem"]
+
+def recommend_jvm_profile(max_ram_mb, java_version):
+    if java_version >= 21 and max_ram_mb >= ZGC_AUTO_MIN_HEAP_MB:
+        return 'zgc'
+    return 'aikar'
+
+def resolve_jvm_profile(profile_name, max_ram_mb, java_version):
+    """Turns 'auto' into a concrete profile and checks the profile can run on java_version."""
+    if profile_name not in JVM_PROFILES:
+        raise Exception(f"未知的 JVM 參數設定：{profile_name}")
+    if profile_name == 'auto':
+        return recommend_jvm_profile(max_ram_mb, java_version)
+    min_java = JVM_PROFILE_MIN_JAVA.get(profile_name, 8)
+    if java_version < min_java:
+        raise Exception(f"{JVM_PROFILES[profile_name]} 需要 Java {min_java} 以上，此伺服器使用 Java {java_version}。")
+    return profile_name
+
+def gc_logging_flags(java_version):
+    if java_version >= 9:
+        # With rotation the JVM moves the previous log aside at startup, so gc.log only holds the current run
+        return [f"-Xlog:gc*:file={GC_LOG_FILE}:time,uptime,level,tags:filecount=5,filesize=10M"]
+    return [f"-Xloggc:{GC_LOG_FILE}", "-XX:+PrintGCDetails"]
+
+def build_jvm_args(min_ram_mb, max_ram_mb, java_version, profile_name='auto', extra_args=(), gc_logging=True):
+    resolved = resolve_jvm_profile(profile_name, max_ram_mb, java_version)
+    args = [f"-Xms{min_ram_mb}M", f"-Xmx{max_ram_mb}M"]
+    if resolved == 'aikar': args += _aikar_flags(max_ram_mb)
+    elif resolved == 'zgc': args += _zgc_flags(java_version)
+    elif resolved == 'shenandoah': args += _shenandoah_flags()
+    if gc_logging: args += gc_logging_flags(java_version)
+    return args + list(extra_args)
+
+def server_java_version(profile):
+    return get_required_java_version(get_minecraft_version(profile.get('core_type'), profile.get('version')))
+
+def server_jvm_args(server_path, profile=None):
+    """Returns the JVM arguments of a server from its installer profile and the settings."""
+    settings = load_settings()
+    profile = profile or read_server_profile(server_path)
+    # Servers installed before profiles existed keep their plain memory flags
+    return build_jvm_args(profile.get('min_ram_mb', settings['min_ram_mb']), profile.get('max_ram_mb', settings['max_ram_mb']),
+                          server_java_version(profile), profile.get('jvm_profile', 'custom'),
+                          profile.get('jvm_extra_args', ()), settings.get('jvm_gc_logging', True))
+
+def write_launch_scripts(server_path, profile):
+    """
+    Regenerates start.bat/start.sh from the profile, or user_jvm_args.txt for
+    Forge/NeoForge whose installer-made scripts read their JVM flags from it.
+    """
+    settings = load_settings()
+    jvm_args = server_jvm_args(server_path, profile)
+    # -Xlog does not create missing directories
+    os.makedirs(os.path.join(server_path, 'logs'), exist_ok=True)
+
+    if profile.get('core_type') in ["Forge", "NeoForge"]:
+        with open(os.path.join(server_path, 'user_jvm_args.txt'), 'w', encoding='utf-8') as f:
+            f.write("# Generated by Minecraft Server Tool\n")
+            f.writelines((f'"{arg}"' if ' ' in arg else arg) + "\n" for arg in jvm_args)
+        return jvm_args
+
+    java_exe_path = profile.get('java_executable') or settings['java_executable_path']
+    jar_name = profile.get('jar_name', 'server.jar')
+    gui_flag = "" if settings['use_server_gui'] else "nogui"
+    bat_args = " ".join(f'"{arg}"' if re.search(r'[\s*]', arg) else arg for arg in jvm_args)
+    bat_content = f'''
+@echo off
+if not exist logs mkdir logs
+"{java_exe_path}" {bat_args} -jar "{jar_name}" {gui_flag}
+pause
+'''.strip()
+    with open(os.path.join(server_path, 'start.bat'), 'w', encoding='utf-8') as f: f.write(bat_content)
+
+    sh_content = f'''#!/bin/sh
+cd "$(dirname "$0")"
+mkdir -p logs
+exec "{java_exe_path}" {" ".join(shlex.quote(arg) for arg in jvm_args)} -jar "{jar_name}" {gui_flag}
+'''
+    sh_path = os.path.join(server_path, 'start.sh')
+    with open(sh_path, 'w', encoding='utf-8', newline='\n') as f: f.write(sh_content)
+    os.chmod(sh_path, 0o755)
+    return jvm_args
+
+def update_jvm_settings(server_path, jvm_profile=None, min_ram_mb=None, max_ram_mb=None, extra_args=None):
+    """
+    Changes the JVM profile, memory or extra flags of a server (None keeps a value)
+    and regenerates its launch files. Returns the new JVM arguments.
+    """
+    settings = load_settings()
+    profile = read_server_profile(server_path)
+    if jvm_profile is not None: profile['jvm_profile'] = jvm_profile
+    if min_ram_mb is not None: profile['min_ram_mb'] = int(min_ram_mb)
+    if max_ram_mb is not None: profile['max_ram_mb'] = int(max_ram_mb)
+    if extra_args is not None: profile['jvm_extra_args'] = list(extra_args)
+    if profile.get('min_ram_mb', settings['min_ram_mb']) > profile.get('max_ram_mb', settings['max_ram_mb']):
+        raise Exception("最小記憶體不能大於最大記憶體！")
+    # Validates the profile against the server's Java version before anything is written
+    server_jvm_args(server_path, profile)
+    if max_ram_mb is not None:
+        capacity_warning = check_capacity({server_path: profile['max_ram_mb']})
+        if capacity_warning:
+            print(f"警告：{capacity_warning}")
+    write_server_profile(server_path, profile)
+    return write_launch_scripts(server_path, profile)
+
+# --- JVM Run History ---
+# When a supervised server exits, its startup time (logs/latest.log) and GC pauses
+# (logs/gc.log) are stored with the profile it ran with, so profiles can be compared
+# on the server's real workload.
+JVM_RUNS_FILE_NAME = 'jvm_runs.json'
+JVM_RUNS_KEPT = 100
+# Unified logging (Java 9+): "... Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms"
+GC_PAUSE_UNIFIED = re.compile(r"\bPause\b.*?(\d+(?:[.,]\d+)?)ms\s*$")
+# Java 8: "[GC pause (G1 Evacuation Pause) (young), 0.0034567 secs]"
+GC_PAUSE_LEGACY = re.compile(r"\[(?:GC|Full GC)\b.*?, (\d+\.\d+) secs\]")
+
+def parse_gc_log(log_path):
+    """Returns pause statistics of a GC log, or None if there is no log."""
+    pauses = []
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if 'Pause' in line:
+                    match = GC_PAUSE_UNIFIED.search(line)
+                    if match:
+                        pauses.append(float(match.group(1).replace(',', '.')))
+                        continue
+                if 'secs]' in line and 'concurrent' not in line:
+                    match = GC_PAUSE_LEGACY.search(line)
+                    if match: pauses.append(float(match.group(1)) * 1000)
+    except FileNotFoundError:
+        return None
+    pauses.sort()
+    return {
+        'gc_pauses': len(pauses),
+        'gc_pause_total_ms': round(sum(pauses), 3),
+        'gc_pause_max_ms': pauses[-1] if pauses else 0.0,
+        'gc_pause_p99_ms': pauses[min(len(pauses) - 1, int(len(pauses) * 0.99))] if pauses else 0.0
+    }
+
+def read_startup_seconds(log_path):
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if 'Done (' in line:
+                    match = ConsoleParser.DONE.search(line)
+                    if match: return float(match.group(1).replace(',', '.'))
+    except FileNotFoundError:
+        pass
+    return None
+
+def load_jvm_runs(server_path):
+    try:
+        with open(os.path.join(server_path, JVM_RUNS_FILE_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def record_jvm_run(server_path, started_at, uptime_seconds):
+    """
+    Stores the startup time and GC pauses of a run that began at started_at (epoch
+    seconds). Logs older than the run are ignored, so a run without GC logging does
+    not pick up the gc.log of an earlier one.
+    """
+    try:
+        profile = read_server_profile(server_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    java_version = server_java_version(profile)
+    max_ram = profile.get('max_ram_mb', load_settings()['max_ram_mb'])
+    try:
+        profile_name = resolve_jvm_profile(profile.get('jvm_profile', 'custom'), max_ram, java_version)
+    except Exception:
+        profile_name = profile.get('jvm_profile', 'custom')
+
+    def current(relative_path):
+        file_path = os.path.join(server_path, relative_path)
+        try:
+            return file_path if os.path.getmtime(file_path) >= started_at - 2 else None
+        except OSError:
+            return None
+
+    run = {'time': datetime.datetime.fromtimestamp(started_at).isoformat(timespec='seconds'),
+           'profile': profile_name, 'extra_args': profile.get('jvm_extra_args', []),
+           'java_version': java_version, 'max_ram_mb': max_ram, 'uptime_seconds': round(uptime_seconds, 1),
+           'startup_seconds': None, 'gc_pauses': None}
+    latest_log = current(os.path.join('logs', 'latest.log'))
+    if latest_log: run['startup_seconds'] = read_startup_seconds(latest_log)
+    gc_log = current(GC_LOG_FILE)
+    if gc_log: run.update(parse_gc_log(gc_log) or {})
+
+    runs = (load_jvm_runs(server_path) + [run])[-JVM_RUNS_KEPT:]
+    runs_path = os.path.join(server_path, JVM_RUNS_FILE_NAME)
+    with open(runs_path + '.tmp', 'w', encoding='utf-8') as f: json.dump(runs, f, indent=2)
+    os.replace(runs_path + '.tmp', runs_path)
+    return run
+
+def compare_jvm_profiles(server_path):
+    """Summarizes the recorded runs of a server per profile, lowest average GC pause first."""
+    groups = collections.defaultdict(list)
+    for run in load_jvm_runs(server_path):
+        groups[run['profile']].append(run)
+    summary = []
+    for name, runs in groups.items():
+        startups = [run['startup_seconds'] for run in runs if run.get('startup_seconds') is not None]
+        gc_runs = [run for run in runs if run.get('gc_pauses') is not None]
+        pauses = sum(run['gc_pauses'] for run in gc_runs)
+        pause_ms = sum(run['gc_pause_total_ms'] for run in gc_runs)
+        uptime = sum(run['uptime_seconds'] for run in gc_runs)
+        summary.append({
+            'profile': name,
+            'runs': len(runs),
+            'startup_avg_seconds': round(sum(startups) / len(startups), 2) if startups else None,
+            'gc_pause_avg_ms': round(pause_ms / pauses, 2) if pauses else None,
+            'gc_pause_p99_ms': max((run['gc_pause_p99_ms'] for run in gc_runs), default=None),
+            'gc_pause_max_ms': max((run['gc_pause_max_ms'] for run in gc_runs), default=None),
+            'gc_pauses_per_minute': round(pauses / uptime * 60, 2) if uptime else None,
+            # Share of wall time spent paused
+            'gc_time_percent': round(pause_ms / (uptime * 1000) * 100, 3) if uptime else None
+        })
+    summary.sort(key=lambda item: (item['gc_pause_avg_ms'] is None, item['gc_pause_avg_ms'] or 0))
+    return summary
+
+def format_jvm_comparison(summary):
+    """Renders compare_jvm_profiles() output as text lines for the CLI and GUI."""
+    if not summary:
+        return ["尚無執行紀錄。由本工具啟動並關閉伺服器後會自動記錄。"]
+    def value(number, unit=''):
+        return '-' if number is None else f"{number:g}{unit}"
+    lines = [f"{'設定':<12}{'次數':>6}{'啟動':>10}{'平均暫停':>12}{'P99':>10}{'最長':>10}{'次/分':>8}{'暫停占比':>10}"]
+    for item in summary:
+        lines.append(f"{item['profile']:<12}{item['runs']:>6}{value(item['startup_avg_seconds'], 's'):>10}"
+                     f"{value(item['gc_pause_avg_ms'], 'ms'):>12}{value(item['gc_pause_p99_ms'], 'ms'):>10}"
+                     f"{value(item['gc_pause_max_ms'], 'ms'):>10}{value(item['gc_pauses_per_minute']):>8}"
+                     f"{value(item['gc_time_percent'], '%'):>10}")
+    return lines
+
+def build_launch_command(server_path):
+    """Builds the Java command line for a server from its installer profile and settings."""
+    settings = load_settings()
+    try:
+        profile = read_server_profile(server_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return _script_launch_command(server_path)
+
+    java_exe = profile.get('java_executable') or settings['java_executable_path']
+    gui_flag = [] if settings['use_server_gui'] else ['nogui']
+    # The GC log goes to logs/, which -Xlog does not create
+    os.makedirs(os.path.join(server_path, 'logs'), exist_ok=True)
+
+    if profile.get('core_type') in ["Forge", "NeoForge"]:
+        # Modern Forge/NeoForge start through an @args file generated by the installer
+        args_file = _find_forge_args_file(server_path)
+        if not args_file:
+            return _script_launch_command(server_path)
+        command = [java_exe]
+        if os.path.exists(os.path.join(server_path, 'user_jvm_args.txt')):
+            command.append('@user_jvm_args.txt')
+        return command + ['@' + os.path.relpath(args_file, server_path)] + gui_flag
+
+    jar_name = profile.get('jar_name', 'server.jar')
+    if not os.path.exists(os.path.join(server_path, jar_name)):
+        return _script_launch_command(server_path)
+    return [java_exe] + server_jvm_args(server_path, profile) + ["-jar", jar_name] + gui_flag
+
+# --- Console Output Parser ---
+class ConsoleParser:
+    """
+    Turns server console lines into game metrics as they arrive: lag warnings,
+    Paper/Purpur 'tps' and 'mspt' replies, joins/leaves, startup time and crashes.
+    Each line is checked with cheap substring tests before any regex runs.
+    """
+    GAME_FIELDS = ('tps_1m', 'mspt_avg', 'ticks_behind', 'players')
+    HISTORY_SIZE = 720
+
+    FORMATTING = re.compile(r'\x1b\[[0-9;]*m|§.')
+    LAG = re.compile(r"Running (\d+)ms or (\d+) ticks behind")
+    TPS = re.compile(r"TPS from last 1m, 5m, 15m: \*?([\d.]+), \*?([\d.]+), \*?([\d.]+)")
+    MSPT = re.compile(r"([\d.]+)/([\d.]+)/([\d.]+), ([\d.]+)/([\d.]+)/([\d.]+), ([\d.]+)/([\d.]+)/([\d.]+)")
+    JOIN = re.compile(r"\]: (\w{1,16}) joined the game")
+    LEAVE = re.compile(r"\]: (\w{1,16}) left the game")
+    DONE = re.compile(r"Done \(([\d.,]+)s\)!")
+    CRASH_SAVED = re.compile(r"This crash report has been saved to: (.+)")
+
+    def __init__(self):
+        self.history = MetricRing(self.HISTORY_SIZE, self.GAME_FIELDS)
+        self.crashes = []
+        self.lag_warnings = 0
+        self.reset_session()
+
+    def reset_session(self):
+        self.players = set()
+        self.tps = None
+        self.mspt = None
+        self.ticks_behind = 0
+        self.startup_seconds = None
+        self.ready = False
+        self._expect_mspt = False
+
+    def _record(self):
+        self.history.append(time.time(), {
+            'tps_1m': self.tps[0] if self.tps else 0.0,
+            'mspt_avg': self.mspt[0] if self.mspt else 0.0,
+            'ticks_behind': self.ticks_behind,
+            'players': len(self.players)
+        })
+
+    def feed(self, line):
+        if '\x1b' in line or '§' in line:
+            line = self.FORMATTING.sub('', line)
+
+        # The 'mspt' reply puts its numbers on the line after the header
+        if self._expect_mspt:
+            self._expect_mspt = False
+            match = self.MSPT.search(line)
+            if match:
+                # (avg, min, max) of the last 5 seconds
+                self.mspt = tuple(float(v) for v in match.groups()[:3])
+                self.ticks_behind = 0
+                self._record()
+                return
+
+        if 'ticks behind' in line:
+            match = self.LAG.search(line)
+            if match:
+                self.lag_warnings += 1
+                self.ticks_behind = int(match.group(2))
+                self._record()
+        elif 'TPS from last' in line:
+            match = self.TPS.search(line)
+            if match:
+                self.tps = tuple(float(v) for v in match.groups())
+                self._record()
+        elif 'Server tick times' in line:
+            self._expect_mspt = True
+        elif 'joined the game' in line:
+            match = self.JOIN.search(line)
+            if match:
+                self.players.add(match.group(1))
+                self._record()
+        elif 'left the game' in line:
+            match = self.LEAVE.search(line)
+            if match:
+                self.players.discard(match.group(1))
+                self._record()
+        elif 'Done (' in line:
+            match = self.DONE.search(line)
+            if match:
+                self.startup_seconds = float(match.group(1).replace(',', '.'))
+                self.ready = True
+        elif 'Crash Report' in line or 'crash report' in line or 'Exception in server tick loop' in line:
+            match = self.CRASH_SAVED.search(line)
+            self.crashes.append((time.time(), match.group(1).strip() if match else line.strip()))
+
+# --- Server Process Supervisor ---
+# Console commands that shut a server down ('end' on BungeeCord/Velocity proxies)
+SHUTDOWN_COMMANDS = {'stop', 'end'}
+
+class ServerSupervisor:
+    """
+    Owns the process of one server: launches Java directly with piped stdin/stdout,
+    stops it gracefully and restarts it with exponential backoff after a crash.
+    """
+    CONSOLE_HISTORY = 1000
+    RESTART_BACKOFF_BASE = 5
+    STABLE_RUNTIME = 300
+
+    def __init__(self, server_path):
+        self.server_path = os.path.normpath(server_path)
+        self.process = None
+        self.console = collections.deque(maxlen=self.CONSOLE_HISTORY)
+        # Total lines emitted; lets readers ask for "everything after line N" of the bounded console
+        self.console_seq = 0
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.crash_count = 0
+        self.started_at = None
+        self.started_wall = None
+        self.last_exit_code = None
+        self.watch_thread = None
+        self.core_type = None
+        self.parser = ConsoleParser()
+        self.add_listener(self.parser.feed)
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Starts the server. Returns a memory over-commit warning, if any."""
+        with self.lock:
+            if self.is_running():
+                raise Exception(f"伺服器 {os.path.basename(self.server_path)} 已經在執行中！")
+            warning = None
+            try:
+                max_ram = read_server_profile(self.server_path).get('max_ram_mb')
+            except (FileNotFoundError, json.JSONDecodeError):
+                max_ram = None
+            if max_ram:
+                warning = check_capacity({self.server_path: max_ram}, running_only=True)
+            self.stop_event.clear()
+            self.crash_count = 0
+            self._launch()
+            if warning:
+                self._emit(f"[Manager] 警告：{warning}")
+            return warning
+
+    def _launch(self):
+        command = build_launch_command(self.server_path)
+        try:
+            profile = read_server_profile(self.server_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            profile = {}
+        self.core_type = profile.get('core_type')
+        cpus = profile.get('cpu_affinity')
+        self.parser.reset_session()
+        creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        try:
+            self.process = subprocess.Popen(
+                command, cwd=self.server_path, creationflags=creationflags,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, encoding='utf-8', errors='replace', bufsize=1
+            )
+        except FileNotFoundError:
+            raise Exception(f"找不到 Java 執行檔 '{command[0]}'。請檢查您的 Java 設定或啟用自動下載。")
+        self.started_at = time.monotonic()
+        self.started_wall = time.time()
+        self._emit(f"[Manager] 啟動伺服器 (PID {self.process.pid})")
+        # Pinned right after the exec rather than in a preexec_fn, which can deadlock the child of a threaded
+        # process; threads the JVM starts later inherit the CPU set of the thread that creates them
+        if cpus:
+            try: apply_cpu_affinity(self.process.pid, cpus)
+            except Exception as e: self._emit(f"[Manager] 無法設定 CPU 綁定：{e}")
+        threading.Thread(target=self._pump_output, args=(self.process,), daemon=True).start()
+        self.watch_thread = threading.Thread(target=self._watch, args=(self.process,), daemon=True)
+        self.watch_thread.start()
+
+    def _emit(self, line):
+        self.console.append(line)
+        self.console_seq += 1
+        for listener in list(self.listeners):
+            try: listener(line)
+            except Exception as e: print(f"主控台監聽器錯誤：{e}")
+
+    def _pump_output(self, process):
+        for line in process.stdout:
+            self._emit(line.rstrip('\r\n'))
+
+    def _watch(self, process):
+        exit_code = process.wait()
+        self.last_exit_code = exit_code
+        self._emit(f"[Manager] 伺服器已結束 (代碼 {exit_code})")
+        try:
+            record_jvm_run(self.server_path, self.started_wall, time.monotonic() - self.started_at)
+        except Exception as e:
+            print(f"無法記錄 JVM 執行統計：{e}")
+        if self.stop_event.is_set() or not load_settings().get('auto_restart', True):
+            return
+
+        if time.monotonic() - self.started_at >= self.STABLE_RUNTIME:
+            self.crash_count = 0
+        self.crash_count += 1
+        delay = min(self.RESTART_BACKOFF_BASE * 2 ** (self.crash_count - 1),
+                    load_settings().get('restart_backoff_max_seconds', 300))
+        self._emit(f"[Manager] 伺服器異常結束，{delay} 秒後重新啟動 (第 {self.crash_count} 次)...")
+        # Waiting on the stop event lets stop() cancel a pending restart
+        if self.stop_event.wait(delay):
+            return
+        with self.lock:
+            if not self.is_running() and not self.stop_event.is_set():
+                try: self._launch()
+                except Exception as e: self._emit(f"[Manager] 重新啟動失敗：{e}")
+
+    def console_since(self, seq):
+        """Returns (lines emitted after seq that are still buffered, current seq)."""
+        lines, current = list(self.console), self.console_seq
+        missed = min(max(0, current - seq), len(lines))
+        return lines[len(lines) - missed:], current
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def send_command(self, command):
+        if not self.is_running():
+            raise Exception(f"伺服器 {os.path.basename(self.server_path)} 沒有在執行中！")
+        # A stop typed into the console (GUI, CLI, API) is a requested shutdown, not a crash to recover from
+        if command.strip().lstrip('/') in SHUTDOWN_COMMANDS:
+            self.stop_event.set()
+        try:
+            self.process.stdin.write(f"{command}\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise Exception(f"無法傳送指令到伺服器：{e}")
+
+    def send_command_and_wait(self, command, pattern, timeout):
+        """Sends a command and waits for a console line matching pattern. Returns the match or None."""
+        regex = re.compile(pattern)
+        matched = []
+        event = threading.Event()
+        def listener(line):
+            match = regex.search(line)
+            if match and not event.is_set():
+                matched.append(match); event.set()
+        self.add_listener(listener)
+        try:
+            self.send_command(command)
+            event.wait(timeout)
+        finally:
+            self.remove_listener(listener)
+        return matched[0] if matched else None
+
+    def stop(self, timeout=None):
+        """Sends 'stop' and waits; kills the process tree if it doesn't exit in time."""
+        self.stop_event.set()
+        if not self.is_running():
+            self._join_watcher()
+            return self.last_exit_code
+        if timeout is None:
+            timeout = load_settings().get('stop_timeout_seconds', 60)
+        try:
+            self.send_command("stop")
+            # Nothing is sent after 'stop'; the EOF also ends the 'pause' of a start.bat run through cmd /c
+            try: self.process.stdin.close()
+            except OSError: pass
+            exit_code = self.process.wait(timeout)
+        except Exception:
+            # Timed out, or stdin is already gone
+            self._emit("[Manager] 伺服器沒有在時限內關閉，強制結束中...")
+            self._kill_tree()
+            exit_code = self.process.wait()
+        self._join_watcher()
+        return exit_code
+
+    def _join_watcher(self):
+        # The watcher must see stop_event before a following start() clears it, or it takes the exit for a crash
+        watcher = self.watch_thread
+        if watcher and watcher is not threading.current_thread():
+            watcher.join()
+
+    def _kill_tree(self):
+        try:
+            parent = psutil.Process(self.process.pid)
+            for child in parent.children(recursive=True):
+                child.kill()
+            parent.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+# Supervisors of servers started by this tool, keyed by normalized server path
+SUPERVISORS = {}
+
+def get_supervisor(server_path):
+    key = os.path.normpath(server_path)
+    if key not in SUPERVISORS:
+        SUPERVISORS[key] = ServerSupervisor(key)
+    return SUPERVISORS[key]
+
+def run_server(server_path):
+    """Starts a supervised server. Returns a memory over-commit warning, if any."""
+    warning = get_supervisor(server_path).start()
+    METRICS.ensure_started()
+    return warning
+
+def stop_server(server_path, timeout=None):
+    return get_supervisor(server_path).stop(timeout)
+
+def stop_all_servers():
+    for supervisor in list(SUPERVISORS.values()):
+        if supervisor.is_running():
+            supervisor.stop()
+
+def is_server_running(server_path):
+    supervisor = SUPERVISORS.get(os.path.normpath(server_path))
+    return supervisor is not None and supervisor.is_running()
+
+def send_server_command(server_path, command):
+    get_supervisor(server_path).send_command(command)
+
+def find_server_processes(server_paths):
+    """
+    Finds server processes started outside this process (another tool instance, a
+    start script) by their cwd, in one pass over the process table. Returns {path: process}.
+    """
+    targets = {os.path.normcase(os.path.realpath(path)): path for path in server_paths}
+    found = {}
+    if not targets:
+        return found
+    for proc in psutil.process_iter(['name', 'cwd', 'cmdline']):
+        try:
+            cwd = proc.info['cwd']
+            path = targets.get(os.path.normcase(os.path.realpath(cwd))) if cwd else None
+            if path is None or path in found:
+                continue
+            # A jar or Forge @args file on the command line tells the server apart from shells in the same directory
+            cmdline = proc.info['cmdline'] or []
+            if 'java' in (proc.info['name'] or '').lower() or any(arg.endswith('.jar') or arg.startswith('@') for arg in cmdline):
+                found[path] = proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return found
+
+def find_server_process(server_path):
+    return find_server_processes([server_path]).get(server_path)
+
+# Capacity checks ask which servers run on every start and heap change; one scan serves them all for a few seconds
+RUNNING_SCAN_TTL_SECONDS = 5
+_running_scan = {'time': float('-inf'), 'paths': frozenset(), 'found': frozenset()}
+_running_scan_lock = threading.Lock()
+
+def find_running_servers(server_paths, max_age=RUNNING_SCAN_TTL_SECONDS):
+    """
+    The subset of server_paths that is running, here or in another process. The process
+    table scan is reused for max_age seconds when it covered these servers; servers
+    supervised here are always checked live.
+    """
+    paths = frozenset(server_paths)
+    with _running_scan_lock:
+        if not (paths <= _running_scan['paths'] and time.monotonic() - _running_scan['time'] < max_age):
+            _running_scan.update(time=time.monotonic(), paths=paths, found=frozenset(find_server_processes(list(paths))))
+        found = _running_scan['found']
+    return {path for path in paths if path in found or is_server_running(path)}
+
+def ensure_server_stopped(server_path, message):
+    """Raises message if the server runs here or in another process (the CLI, a start script, another tool instance)."""
+    if is_server_running(server_path) or find_server_process(server_path):
+        raise Exception(message)
+
+def terminate_server_process(proc, timeout=None):
+    """
+    Stops a server this process does not supervise: SIGTERM, which runs the server's
+    shutdown hook and saves the world, then a kill if it doesn't exit in time. POSIX only:
+    on Windows terminate() is TerminateProcess, a hard kill without saving, so it refuses.
+    """
+    if sys.platform == "win32":
+        raise Exception("Windows 無法正常關閉不是由此程式啟動的伺服器 (強制結束會遺失未存檔的世界)，"
+                        "請在啟動它的視窗或程式中輸入 stop。")
+    if timeout is None:
+        timeout = load_settings().get('stop_timeout_seconds', 60)
+    proc.terminate()
+    try:
+        return proc.wait(timeout)
+    except psutil.TimeoutExpired:
+        for child in proc.children(recursive=True):
+            child.kill()
+        proc.kill()
+        return proc.wait()
+
+def get_backup_dir(server_path):
+    """<server>/backups, or the server's own folder under backup_target_dir when one is set."""
+    target_dir = load_settings().get('backup_target_dir')
+    if not target_dir:
+        return os.path.join(server_path, 'backups')
+    server_path = os.path.normpath(os.path.abspath(server_path))
+    # The path hash keeps servers with the same folder name apart
+    digest = hashlib.sha1(os.path.normcase(server_path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(target_dir, f"{os.path.basename(server_path)}-{digest}")
+
+_active_backups = set()
+_active_backups_lock = threading.Lock()
+
+@contextlib.contextmanager
+def backup_guard(server_path):
+    """Marks a server as being backed up or pruned; a second backup of it fails instead of racing."""
+    key = os.path.normpath(os.path.abspath(server_path))
+    with _active_backups_lock:
+        if key in _active_backups:
+            raise Exception(f"伺服器 {os.path.basename(key)} 已有備份正在進行中！")
+        _active_backups.add(key)
+    try:
+        yield
+    finally:
+        with _active_backups_lock:
+            _active_backups.discard(key)
+
+def is_backup_running(server_path):
+    with _active_backups_lock:
+        return os.path.normpath(os.path.abspath(server_path)) in _active_backups
+
+def create_backup(server_path, progress_callback, source_path=None):
+    """
+    Creates a zip archive of a Minecraft server directory.
+    This function intelligently excludes the 'backups' directory itself.
+    source_path lets the archive be built from a staged copy of the server.
+    """
+    settings = load_settings()
+    if source_path is None:
+        with backup_guard(server_path):
+            if settings.get('hot_backup', True) and is_server_running(server_path):
+                return create_hot_backup(server_path, progress_callback)
+            return create_backup(server_path, progress_callback, source_path=server_path)
+    if settings.get('backup_mode') == 'incremental':
+        return create_incremental_backup(server_path, progress_callback, source_path)
+
+    try:
+        progress_callback("初始化打包過程...", 0.1)
+
+        # Define the target directory for storing backups.
+        backup_dir = get_backup_dir(server_path)
+        os.makedirs(backup_dir, exist_ok=True)
+
+        # Generate a timestamped, unique filename for the new archive.
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        backup_filename = f"backup-{timestamp}"
+        backup_zip_path = os.path.join(backup_dir, f"{backup_filename}.zip")
+
+        progress_callback("掃描和打包檔案中...", 0.3)
+
+        file_list = []
+        # Walk through the entire directory tree of the server.
+        for root, dirs, files in os.walk(source_path):
+
+            # Exclude backup directory
+            if 'backups' in dirs:
+                dirs.remove('backups')
+
+            for file in files:
+                file_path = os.path.join(root, file)
+                file_list.append((file_path, os.path.relpath(file_path, source_path)))
+
+        write_backup_archive(backup_zip_path, file_list, progress_callback)
+
+        progress_callback("備份完成!", 1.0)
+        return f"{backup_filename}.zip"
+
+    except Exception as e:
+        raise e
+
+# --- Resource Telemetry ---
+class MetricRing:
+    """Fixed-size history of samples, one preallocated array per metric."""
+    FIELDS = ('cpu_percent', 'rss_mb', 'threads', 'open_files', 'read_kbps', 'write_kbps')
+
+    def __init__(self, capacity, fields=None):
+        self.capacity = capacity
+        self.fields = fields or self.FIELDS
+        self.times = array('d', bytes(8 * capacity))
+        self.values = {field: array('d', bytes(8 * capacity)) for field in self.fields}
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp, sample):
+        self.times[self.head] = timestamp
+        for field in self.fields:
+            self.values[field][self.head] = sample.get(field, 0.0)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def series(self, field):
+        """Returns the stored values of one metric, oldest first."""
+        return self._ordered(self.values[field])
+
+    def timestamps(self):
+        return self._ordered(self.times)
+
+    def _ordered(self, values):
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            return values[start:start + self.count].tolist()
+        return (values[start:] + values[:self.head]).tolist()
+
+    def latest(self):
+        if not self.count: return None
+        index = (self.head - 1) % self.capacity
+        return {field: self.values[field][index] for field in self.fields}
+
+class MetricsCollector:
+    """
+    Samples every supervised server from one background thread. Each tick builds a
+    single parent->children map of the host's processes, so child JVMs started by
+    a start script are counted without scanning the process table per server.
+    """
+    def __init__(self):
+        self.histories = {}
+        self.processes = {}
+        self.io_totals = {}
+        self.thread = None
+        self.lock = threading.Lock()
+        self.last_game_poll = 0.0
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def history(self, server_path):
+        return self.histories.get(os.path.normpath(server_path))
+
+    def _run(self):
+        while True:
+            settings = load_settings()
+            started = time.monotonic()
+            try:
+                self.sample_all(settings.get('metrics_history_size', 300))
+                self.poll_game_stats(settings.get('tps_poll_interval_seconds', 30))
+            except Exception as e:
+                print(f"資源監控取樣失敗：{e}")
+            interval = settings.get('metrics_interval_seconds', 2)
+            time.sleep(max(0.1, interval - (time.monotonic() - started)))
+
+    def _process(self, pid):
+        # Reusing Process objects keeps cpu_percent() measuring since the previous tick
+        process = self.processes.get(pid)
+        if process is None:
+            process = self.processes[pid] = psutil.Process(pid)
+        return process
+
+    def sample_all(self, history_size):
+        running = {path: sup.process.pid for path, sup in list(SUPERVISORS.items()) if sup.is_running()}
+        if not running:
+            return
+        children_of = collections.defaultdict(list)
+        for proc in psutil.process_iter(['ppid']):
+            children_of[proc.info['ppid']].append(proc.pid)
+
+        now = time.time()
+        seen_pids = set()
+        for path, root_pid in running.items():
+            pids, stack = [], [root_pid]
+            while stack:
+                pid = stack.pop()
+                pids.append(pid)
+                stack.extend(children_of.get(pid, ()))
+            seen_pids.update(pids)
+
+            sample = {'cpu_percent': 0.0, 'rss_mb': 0.0, 'threads': 0, 'open_files': 0}
+            read_bytes, write_bytes = 0, 0
+            for pid in pids:
+                try:
+                    process = self._process(pid)
+                    with process.oneshot():
+                        sample['cpu_percent'] += process.cpu_percent(None)
+                        sample['rss_mb'] += process.memory_info().rss / 1024 / 1024
+                        sample['threads'] += process.num_threads()
+                        try:
+                            sample['open_files'] += len(process.open_files())
+                            io_counters = process.io_counters()
+                            read_bytes += io_counters.read_bytes
+                            write_bytes += io_counters.write_bytes
+                        except (psutil.AccessDenied, AttributeError):
+                            pass
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+
+            previous = self.io_totals.get(path)
+            if previous:
+                elapsed = max(now - previous[0], 1e-6)
+                sample['read_kbps'] = max(0, read_bytes - previous[1]) / 1024 / elapsed
+                sample['write_kbps'] = max(0, write_bytes - previous[2]) / 1024 / elapsed
+            self.io_totals[path] = (now, read_bytes, write_bytes)
+
+            history = self.histories.get(path)
+            if history is None or history.capacity != history_size:
+                history = self.histories[path] = MetricRing(history_size)
+            history.append(now, sample)
+
+        for pid in list(self.processes):
+            if pid not in seen_pids:
+                del self.processes[pid]
+
+    def poll_game_stats(self, poll_interval):
+        """Asks Paper/Purpur servers for tps/mspt; the replies are picked up by ConsoleParser."""
+        if not poll_interval or time.monotonic() - self.last_game_poll < poll_interval:
+            return
+        self.last_game_poll = time.monotonic()
+        for supervisor in list(SUPERVISORS.values()):
+            if supervisor.is_running() and supervisor.parser.ready and supervisor.core_type in ["Paper", "Purpur"]:
+                try:
+                    supervisor.send_command("tps")
+                    supervisor.send_command("mspt")
+                except Exception:
+                    continue
+
+METRICS = MetricsCollector()
+
+def get_server_metrics(server_path):
+    return METRICS.history(server_path)
+
+# --- Host Capacity Planning ---
+# Configured heaps plus an off-heap estimate are compared with physical memory minus
+# a reserve. Installs, provisioning and heap changes are checked against every
+# registered server, starts against the servers that are running. Servers can also
+# be pinned to CPU sets so busy ones do not compete for the same cores.
+JVM_OVERHEAD_BASE_MB = 256
+HEAP_STEP_MB = 256
+
+def estimate_server_memory_mb(max_ram_mb, overhead_percent):
+    return int(max_ram_mb + JVM_OVERHEAD_BASE_MB + max_ram_mb * overhead_percent / 100)
+
+def heap_for_memory_mb(memory_mb, overhead_percent):
+    """Largest heap, in HEAP_STEP_MB steps, whose estimate fits in memory_mb."""
+    heap = (memory_mb - JVM_OVERHEAD_BASE_MB) / (1 + overhead_percent / 100)
+    return max(0, int(heap // HEAP_STEP_MB * HEAP_STEP_MB))
+
+def host_capacity():
+    memory = psutil.virtual_memory()
+    cpu_count = psutil.cpu_count() or 1
+    return {'total_mb': memory.total // 1024**2, 'available_mb': memory.available // 1024**2,
+            'cpu_count': cpu_count, 'physical_cores': psutil.cpu_count(logical=False) or cpu_count}
+
+def plan_capacity(changes=None, running_only=False, root=None, detect_running=True):
+    """
+    Memory plan for the registered servers, or only the running ones. changes maps
+    server paths to a planned max_ram_mb for servers being installed, resized or
+    started; they are always included. detect_running=False skips the process scan
+    (servers are then reported as not running), for plans of all registered servers.
+    """
+    settings = load_settings()
+    overhead = settings.get('jvm_overhead_percent', 20)
+    heaps = {server['path']: server.get('max_ram_mb', settings['max_ram_mb']) for server in get_known_servers(root)}
+    running = find_running_servers(heaps) if detect_running or running_only else set()
+    changes = {os.path.normpath(os.path.abspath(path)): max_ram for path, max_ram in (changes or {}).items()}
+    heaps.update(changes)
+
+    servers = [{'path': path, 'max_ram_mb': max_ram, 'estimated_mb': estimate_server_memory_mb(max_ram, overhead),
+                'running': path in running}
+               for path, max_ram in sorted(heaps.items()) if not running_only or path in running or path in changes]
+    plan = host_capacity()
+    plan['reserved_mb'] = settings.get('capacity_reserved_mb', 1024)
+    plan['budget_mb'] = max(0, plan['total_mb'] - plan['reserved_mb'])
+    plan['committed_mb'] = sum(server['estimated_mb'] for server in servers)
+    plan['over_commit_mb'] = max(0, plan['committed_mb'] - plan['budget_mb'])
+    plan['running_only'] = running_only
+    plan['servers'] = servers
+    # Heap one more server could get without over-committing
+    plan['suggested_new_max_ram_mb'] = heap_for_memory_mb(plan['budget_mb'] - plan['committed_mb'], overhead)
+
+    # Over-committed: scale every heap by the same factor so the estimates fit
+    total_heap = sum(server['max_ram_mb'] for server in servers)
+    factor = 1.0
+    if plan['over_commit_mb'] and total_heap:
+        factor = max(0, plan['budget_mb'] - len(servers) * JVM_OVERHEAD_BASE_MB) / (total_heap * (1 + overhead / 100))
+    for server in servers:
+        server['suggested_max_ram_mb'] = server['max_ram_mb'] if factor >= 1 else \
+            max(HEAP_STEP_MB, int(server['max_ram_mb'] * factor // HEAP_STEP_MB * HEAP_STEP_MB))
+    return plan
+
+def check_capacity(changes, running_only=False):
+    """
+    Applies capacity_policy to a planned change. Returns a warning text, or None when
+    everything fits or the check is off; raises under the 'refuse' policy.
+    """
+    settings = load_settings()
+    policy = settings.get('capacity_policy', 'warn')
+    if policy == 'off':
+        return None
+    # Only a running-only check needs to know what runs; installs and heap edits (per keystroke) skip the scan
+    plan = plan_capacity(changes, running_only, detect_running=running_only)
+    if not plan['over_commit_mb']:
+        return None
+    scope = "執行中的伺服器" if running_only else "所有已登錄的伺服器"
+    message = (f"{scope}預估需要 {plan['committed_mb']} MB 記憶體，超過可用的 {plan['budget_mb']} MB "
+               f"(主機 {plan['total_mb']} MB，保留 {plan['reserved_mb']} MB)。")
+    changed_paths = {os.path.normpath(os.path.abspath(path)) for path in changes}
+    changed = [server for server in plan['servers'] if server['path'] in changed_paths]
+    # Prefer the heap that fits next to the other servers as they are; scale everything only if none does
+    others_mb = plan['committed_mb'] - sum(server['estimated_mb'] for server in changed)
+    room = heap_for_memory_mb((plan['budget_mb'] - others_mb) / max(1, len(changed)), settings.get('jvm_overhead_percent', 20))
+    suggestions = [f"{os.path.basename(server['path'])} {room if room >= HEAP_STEP_MB else server['suggested_max_ram_mb']} MB"
+                   for server in changed]
+    if suggestions:
+        message += "建議最大記憶體：" + "、".join(suggestions)
+    if policy == 'refuse':
+        raise Exception(message)
+    return message
+
+def parse_cpu_list(text):
+    """'0-3,6' -> [0, 1, 2, 3, 6]; '' or 'all' -> [] (no pinning)."""
+    text = str(text).strip().lower()
+    if text in ('', 'all'):
+        return []
+    cpus = set()
+    try:
+        for part in text.split(','):
+            first, _, last = part.strip().partition('-')
+            cpus.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise Exception(f"CPU 清單格式錯誤：{text} (例如 0-3,6)")
+    return sorted(cpus)
+
+def format_cpu_list(cpus):
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges) or "all"
+
+def apply_cpu_affinity(pid, cpus):
+    """Pins a running process and its children; an empty list unpins."""
+    cpus = cpus or list(range(psutil.cpu_count() or 1))
+    proc = psutil.Process(pid)
+    for target in [proc] + proc.children(recursive=True):
+        if hasattr(os, 'sched_setaffinity'):
+            # Linux affinity is per thread, so move the threads the JVM has already started too
+            for thread in target.threads():
+                os.sched_setaffinity(thread.id, cpus)
+        elif hasattr(target, 'cpu_affinity'):
+            target.cpu_affinity(cpus)
+        else:
+            raise Exception("此作業系統不支援 CPU 綁定。")
+
+def set_cpu_affinity(server_path, cpus):
+    """Stores the CPU set of a server (empty = all CPUs) and applies it at once if it is running."""
+    cpu_count = psutil.cpu_count() or 1
+    cpus = sorted(set(cpus))
+    if any(cpu < 0 or cpu >= cpu_count for cpu in cpus):
+        raise Exception(f"CPU 編號超出範圍 (0-{cpu_count - 1})：{format_cpu_list(cpus)}")
+    profile = read_server_profile(server_path)
+    if cpus: profile['cpu_affinity'] = cpus
+    else: profile.pop('cpu_affinity', None)
+    write_server_profile(server_path, profile)
+    supervisor = SUPERVISORS.get(os.path.normpath(server_path))
+    proc = supervisor.process if supervisor and supervisor.is_running() else find_server_process(server_path)
+    if proc is not None:
+        apply_cpu_affinity(proc.pid, cpus)
+
+def plan_cpu_affinity(server_paths):
+    """
+    Splits the logical CPUs into contiguous blocks, one per server. Larger heaps are
+    served first and get the leftover cores; with more servers than CPUs, CPUs are
+    shared round-robin.
+    """
+    def heap(path):
+        try: return read_server_profile(path).get('max_ram_mb', 0)
+        except (FileNotFoundError, json.JSONDecodeError): return 0
+    ordered = sorted(server_paths, key=heap, reverse=True)
+    cpu_count = psutil.cpu_count() or 1
+    if len(ordered) >= cpu_count:
+        return {path: [index % cpu_count] for index, path in enumerate(ordered)}
+    size, extra = divmod(cpu_count, len(ordered)) if ordered else (0, 0)
+    plan, start = {}, 0
+    for index, path in enumerate(ordered):
+        count = size + (1 if index < extra else 0)
+        plan[path] = list(range(start, start + count))
+        start += count
+    return plan
+
+# --- Hot Backup Coordination ---
+# A running server is told to flush and stop saving, its files are cloned into a
+# staging directory, saving is turned back on right away and the slow compression
+# runs on the staged copy. Hardlinks are not used for staging because Minecraft
+# rewrites region files in place, which would change the staged copy as well.
+FICLONE = 0x40049409
+STAGING_DIR_NAME = '.staging'
+
+def _clone_file(src, dst):
+    """Copy-on-write clone where the filesystem supports it, plain copy otherwise."""
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+def stage_server_files(server_path, staging_path):
+    for root, dirs, files in os.walk(server_path):
+        if 'backups' in dirs:
+            dirs.remove('backups')
+        target_root = os.path.join(staging_path, os.path.relpath(root, server_path))
+        os.makedirs(target_root, exist_ok=True)
+        for file in files:
+            # session.lock is held open by the running server and is useless in a backup
+            if file == 'session.lock': continue
+            try:
+                _clone_file(os.path.join(root, file), os.path.join(target_root, file))
+            except FileNotFoundError:
+                continue
+            except PermissionError as e:
+                print(f"略過無法讀取的檔案：{e}")
+
+def _wait_for_save_flush(server_path, timeout=30, quiet_period=1.0):
+    """Waits until no file in the server directory has changed for quiet_period seconds."""
+    def signature():
+        newest, total = 0, 0
+        for root, dirs, files in os.walk(server_path):
+            if 'backups' in dirs:
+                dirs.remove('backups')
+            for file in files:
+                try:
+                    stat = os.stat(os.path.join(root, file))
+                except FileNotFoundError:
+                    continue
+                newest, total = max(newest, stat.st_mtime_ns), total + stat.st_size
+        return newest, total
+
+    deadline = time.monotonic() + timeout
+    previous = signature()
+    while time.monotonic() < deadline:
+        time.sleep(quiet_period)
+        current = signature()
+        if current == previous:
+            return True
+        previous = current
+    return False
+
+def create_hot_backup(server_path, progress_callback):
+    staging_path = os.path.join(server_path, 'backups', STAGING_DIR_NAME)
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
+
+    progress_callback("暫停自動存檔並寫入世界資料...", 0.05)
+    supervisor = get_supervisor(server_path)
+    supervisor.send_command("save-off")
+    try:
+        # Vanilla and every fork print "Saved the game" once save-all flush completes
+        if not supervisor.send_command_and_wait("save-all flush", r"Saved the game", timeout=60):
+            if not _wait_for_save_flush(server_path):
+                print("等待伺服器存檔逾時，仍繼續備份。")
+        progress_callback("正在建立快照...", 0.15)
+        stage_server_files(server_path, staging_path)
+    finally:
+        if is_server_running(server_path):
+            send_server_command(server_path, "save-on")
+
+    try:
+        return create_backup(server_path, progress_callback, source_path=staging_path)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+# --- Parallel Archive Writer ---
+# Files are split into blocks that are read and deflated on a thread pool (zlib
+# releases the GIL), while a single writer streams the results into the zip in
+# order. Each block is a raw deflate stream ended with a sync flush, so the
+# blocks can simply be concatenated and closed with one empty final block.
+BACKUP_BLOCK_SIZE = 4 * 1024 * 1024
+BACKUP_STORED_EXTENSIONS = {'.mca', '.mcc', '.jar', '.zip', '.png', '.jpg', '.gz', '.xz', '.7z', '.dat_old'}
+DEFLATE_FINAL_BLOCK = b'\x03\x00'
+# zipfile has no public API for writing already-deflated data, so the writer drives the
+# ZipFile attributes write() itself uses. They are guarded to the CPython versions this
+# was checked on; anywhere else backups fall back to ZipFile.write(), one file at a time.
+RAW_ZIP_PYTHON_VERSIONS = ((3, 8), (3, 13))
+RAW_ZIP_ATTRIBUTES = ('fp', 'start_dir', 'filelist', 'NameToInfo', '_writecheck', '_didModify')
+
+def _supports_raw_zip_writes(zipf):
+    low, high = RAW_ZIP_PYTHON_VERSIONS
+    return (sys.implementation.name == 'cpython' and low <= sys.version_info[:2] <= high
+            and all(hasattr(zipf, name) for name in RAW_ZIP_ATTRIBUTES))
+
+def _backup_compress_type(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    return zipfile.ZIP_STORED if ext in BACKUP_STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def _read_backup_block(file_path, offset, length, compress_type, level):
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return data, compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return data, data
+
+def _iter_backup_jobs(file_list):
+    for file_path, archive_name in file_list:
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            continue
+        yield ('begin', file_path, archive_name)
+        for offset in range(0, size, BACKUP_BLOCK_SIZE):
+            yield ('block', file_path, offset, min(BACKUP_BLOCK_SIZE, size - offset))
+        yield ('end', file_path, size)
+
+def write_backup_archive(zip_path, file_list, progress_callback, progress_range=(0.3, 1.0)):
+    """
+    Writes (file_path, archive_name) pairs into a zip using every configured worker.
+    Already-compressed content is stored as-is instead of being deflated again.
+    """
+    settings = load_settings()
+    workers = settings.get('backup_workers') or os.cpu_count() or 1
+    level = settings.get('backup_compression_level', 6)
+    start, end = progress_range
+
+    bytes_total = 0
+    for file_path, _ in file_list:
+        try: bytes_total += os.path.getsize(file_path)
+        except FileNotFoundError: pass
+    progress = {'done': 0, 'percent': -1}
+
+    def report(size):
+        progress['done'] += size
+        percent = progress['done'] * 100 // max(bytes_total, 1)
+        if percent != progress['percent']:
+            progress['percent'] = percent
+            progress_callback(f"打包中... {progress['done']/1024/1024:.1f}MB / {bytes_total/1024/1024:.1f}MB",
+                              start + (end - start) * min(percent, 100) / 100)
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        if not _supports_raw_zip_writes(zipf):
+            for file_path, archive_name in file_list:
+                try:
+                    size = os.path.getsize(file_path)
+                    zipf.write(file_path, archive_name, compress_type=_backup_compress_type(file_path), compresslevel=level)
+                except FileNotFoundError:
+                    continue
+                report(size)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            _write_raw_members(zipf, pool, workers, level, file_list, report)
+
+def _write_raw_members(zipf, pool, workers, level, file_list, report):
+    """Streams blocks deflated on the pool into zipf in order (see RAW_ZIP_ATTRIBUTES)."""
+    member = {}
+
+    def write_job(job, compress_type, future):
+        if job[0] == 'begin':
+            zinfo = zipfile.ZipInfo.from_file(job[1], job[2])
+            zinfo.compress_type = compress_type
+            zinfo.compress_size, zinfo.CRC = 0, 0
+            # Same rule zipfile uses: compressed size can be a bit larger than the input
+            zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+            zipf.fp.seek(zipf.start_dir)
+            zinfo.header_offset = zipf.fp.tell()
+            zipf._writecheck(zinfo)
+            zipf._didModify = True
+            zipf.fp.write(zinfo.FileHeader(zip64))
+            member.update(zinfo=zinfo, zip64=zip64, crc=0, file_size=0, compress_size=0)
+        elif job[0] == 'block':
+            data, payload = future.result()
+            zipf.fp.write(payload)
+            member['crc'] = zlib.crc32(data, member['crc'])
+            member['file_size'] += len(data)
+            member['compress_size'] += len(payload)
+            report(len(data))
+        else:
+            zinfo = member['zinfo']
+            if compress_type == zipfile.ZIP_DEFLATED:
+                zipf.fp.write(DEFLATE_FINAL_BLOCK)
+                member['compress_size'] += len(DEFLATE_FINAL_BLOCK)
+            zinfo.CRC, zinfo.file_size, zinfo.compress_size = member['crc'], member['file_size'], member['compress_size']
+            # Seek back and rewrite the local header with the real CRC and sizes
+            zipf.start_dir = zipf.fp.tell()
+            zipf.fp.seek(zinfo.header_offset)
+            zipf.fp.write(zinfo.FileHeader(member['zip64']))
+            zipf.fp.seek(zipf.start_dir)
+            zipf.filelist.append(zinfo)
+            zipf.NameToInfo[zinfo.filename] = zinfo
+
+    # Keep a bounded number of blocks in flight so memory stays flat on huge worlds
+    window = collections.deque()
+    compress_type = zipfile.ZIP_DEFLATED
+    for job in _iter_backup_jobs(file_list):
+        future = None
+        if job[0] == 'begin':
+            compress_type = _backup_compress_type(job[1])
+        elif job[0] == 'block':
+            future = pool.submit(_read_backup_block, *job[1:], compress_type, level)
+        window.append((job, compress_type, future))
+        if len(window) >= workers * 4:
+            write_job(*window.popleft())
+    while window:
+        write_job(*window.popleft())
+
+# --- Incremental Backup Engine ---
+# Snapshots are stored as a content-addressed chunk store plus one small JSON
+# manifest per snapshot, so only files that changed since the last snapshot are
+# read and only chunks that were never seen before are written to disk.
+BACKUP_CHUNK_SIZE = 4 * 1024 * 1024
+INCREMENTAL_DIR_NAME = 'incremental'
+
+def get_incremental_store(server_path):
+    return os.path.join(get_backup_dir(server_path), INCREMENTAL_DIR_NAME)
+
+def _chunk_object_path(store_dir, digest):
+    return os.path.join(store_dir, 'objects', digest[:2], digest)
+
+def _write_chunk_object(store_dir, digest, data):
+    """Stores a chunk if it is not in the store yet. Returns the bytes written."""
+    object_path = _chunk_object_path(store_dir, digest)
+    if os.path.exists(object_path):
+        return 0
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    # One byte header: 'Z' for zlib data, 'R' for raw data that didn't compress
+    compressed = zlib.compress(data, 6)
+    payload = b'Z' + compressed if len(compressed) < len(data) else b'R' + data
+    temp_path = object_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(temp_path, object_path)
+    return len(payload)
+
+def _read_chunk_object(store_dir, digest):
+    with open(_chunk_object_path(store_dir, digest), 'rb') as f:
+        payload = f.read()
+    data = zlib.decompress(payload[1:]) if payload[:1] == b'Z' else payload[1:]
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise Exception(f"備份資料區塊 {digest} 已損毀！")
+    return data
+
+def list_incremental_backups(server_path):
+    snapshot_dir = os.path.join(get_incremental_store(server_path), 'snapshots')
+    if not os.path.isdir(snapshot_dir): return []
+    return sorted(f[:-len('.json')] for f in os.listdir(snapshot_dir) if f.endswith('.json'))
+
+def load_snapshot_manifest(server_path, snapshot_name):
+    manifest_path = os.path.join(get_incremental_store(server_path), 'snapshots', f"{snapshot_name}.json")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def create_incremental_backup(server_path, progress_callback, source_path=None):
+    """
+    Creates a deduplicated snapshot of a server directory.
+    Files whose size and mtime match the previous snapshot are not read again,
+    everything else is hashed in fixed-size chunks and only new chunks are stored.
+    """
+    source_path = source_path or server_path
+    progress_callback("初始化增量備份...", 0.05)
+    store_dir = get_incremental_store(server_path)
+    os.makedirs(os.path.join(store_dir, 'snapshots'), exist_ok=True)
+
+    previous_files = {}
+    snapshots = list_incremental_backups(server_path)
+    if snapshots:
+        try:
+            previous_files = load_snapshot_manifest(server_path, snapshots[-1]).get('files', {})
+        except (json.JSONDecodeError, OSError):
+            previous_files = {}
+
+    progress_callback("掃描檔案中...", 0.1)
+    file_list = []
+    for root, dirs, files in os.walk(source_path):
+        if 'backups' in dirs:
+            dirs.remove('backups')
+        for file in files:
+            file_path = os.path.join(root, file)
+            file_list.append((file_path, os.path.relpath(file_path, source_path).replace(os.sep, '/')))
+
+    manifest_files = {}
+    bytes_total, bytes_read, bytes_written = 0, 0, 0
+    last_percent = -1
+    for index, (file_path, archive_name) in enumerate(file_list):
+        try:
+            stat = os.stat(file_path)
+            previous = previous_files.get(archive_name)
+            if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                manifest_files[archive_name] = previous
+            else:
+                chunks = []
+                with open(file_path, 'rb') as f:
+                    while True:
+                        data = f.read(BACKUP_CHUNK_SIZE)
+                        if not data: break
+                        digest = hashlib.sha256(data).hexdigest()
+                        bytes_written += _write_chunk_object(store_dir, digest, data)
+                        bytes_read += len(data)
+                        chunks.append(digest)
+                manifest_files[archive_name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunks': chunks}
+            bytes_total += stat.st_size
+        except FileNotFoundError:
+            # The file was removed by the running server while we were scanning
+            continue
+
+        percent = int(index * 100 / len(file_list))
+        if percent != last_percent:
+            last_percent = percent
+            progress_callback(f"增量備份中... {index + 1}/{len(file_list)}", 0.1 + percent / 100 * 0.85)
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    snapshot_name = f"snapshot-{timestamp}"
+    manifest = {
+        'format': 1,
+        'created': timestamp,
+        'chunk_size': BACKUP_CHUNK_SIZE,
+        'total_bytes': bytes_total,
+        'files': manifest_files
+    }
+    manifest_path = os.path.join(store_dir, 'snapshots', f"{snapshot_name}.json")
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    progress_callback(f"備份完成! 讀取 {bytes_read/1024/1024:.1f}MB，新增 {bytes_written/1024/1024:.1f}MB", 1.0)
+    return snapshot_name
+
+def restore_incremental_backup(server_path, snapshot_name, target_path, progress_callback):
+    """Rebuilds the full directory tree of a snapshot into target_path."""
+    if os.path.isdir(target_path) and os.listdir(target_path):
+        raise Exception(f"還原目標資料夾 {target_path} 不是空的！")
+    manifest_files = load_snapshot_manifest(server_path, snapshot_name)['files']
+
+    progress_callback(f"正在還原 {snapshot_name}...", 0.0)
+    _extract_members(server_path, snapshot_name, list(manifest_files), target_path, progress_callback, (0.0, 1.0))
+
+    progress_callback("還原完成!", 1.0)
+    return target_path
+
+# --- Backup Scheduling and Retention ---
+# A scheduler thread checks every registered server's cron schedule once a minute
+# and hands due servers to a bounded queue, which runs at most backup_max_concurrent
+# backups at a time across all servers. Retention keeps the latest few backups plus
+# the newest one per hour, day and ISO week (grandfather-father-son).
+BACKUP_NAME_PATTERN = re.compile(r"^(?:backup|snapshot)-(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})(?:\.zip)?$")
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week) with *,
+    lists, ranges and steps, or @hourly/@daily/@weekly/@monthly. As in cron, when
+    both day fields are restricted a day matching either of them is due.
+    """
+    ALIASES = {'@hourly': '0 * * * *', '@daily': '0 0 * * *', '@midnight': '0 0 * * *',
+               '@weekly': '0 0 * * 0', '@monthly': '0 0 1 * *'}
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        fields = self.ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise Exception(f"排程格式錯誤：{expression} (需要 5 個欄位：分 時 日 月 星期)")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES))
+        # Both 0 and 7 mean Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        self.either_day = fields[2] != '*' and fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(text, low, high):
+        values = set()
+        try:
+            for part in text.split(','):
+                spec, has_step, step = part.partition('/')
+                step = int(step) if has_step else 1
+                if spec == '*':
+                    first, last = low, high
+                elif '-' in spec:
+                    first, last = (int(value) for value in spec.split('-', 1))
+                else:
+                    # "5/15" means every 15 starting at 5
+                    first = int(spec)
+                    last = high if has_step else first
+                if first < low or last > high or first > last or step < 1:
+                    raise ValueError
+                values.update(range(first, last + 1, step))
+        except ValueError:
+            raise Exception(f"排程欄位錯誤：{text} (允許 {low}-{high})")
+        return values
+
+    def day_matches(self, moment):
+        in_month = moment.day in self.days
+        # cron counts weekdays from Sunday, Python from Monday
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        return in_month or in_week if self.either_day else in_month and in_week
+
+    def matches(self, moment):
+        return (moment.minute in self.minutes and moment.hour in self.hours and moment.month in self.months
+                and self.day_matches(moment))
+
+    def next_after(self, moment):
+        """First due minute after moment, skipping whole months, days and hours that cannot match."""
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        # Long enough for a February 29th schedule
+        limit = candidate + datetime.timedelta(days=366 * 8)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + datetime.timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+        return None
+
+def get_server_schedule(server_info, key):
+    """
+    A schedule expression of a server (a registry entry or installer profile):
+    its own `key` ('backup_schedule', 'restart_schedule'), or the settings default
+    of the same name. '' or 'off' means none.
+    """
+    expression = server_info.get(key)
+    if expression is None:
+        expression = load_settings().get(key, '')
+    return '' if expression in (None, 'off') else expression.strip()
+
+def set_server_schedule(server_path, key, expression):
+    """Sets a server's own schedule; None falls back to the default, 'off' disables it."""
+    if expression not in (None, '', 'off'):
+        CronSchedule(expression)
+    profile = read_server_profile(server_path)
+    if expression is None: profile.pop(key, None)
+    else: profile[key] = expression or 'off'
+    write_server_profile(server_path, profile)
+
+def get_backup_schedule(server_info):
+    return get_server_schedule(server_info, 'backup_schedule')
+
+def set_backup_schedule(server_path, expression):
+    set_server_schedule(server_path, 'backup_schedule', expression)
+
+def list_backups(server_path):
+    """Full and incremental backups of a server, newest first."""
+    backups = []
+    backup_dir = get_backup_dir(server_path)
+    try:
+        names = [name for name in os.listdir(backup_dir) if name.endswith('.zip')]
+    except FileNotFoundError:
+        names = []
+    for name in names + list_incremental_backups(server_path):
+        match = BACKUP_NAME_PATTERN.match(name)
+        if not match:
+            continue
+        full = name.endswith('.zip')
+        backups.append({'name': name, 'kind': 'full' if full else 'incremental',
+                        'created': f"{match.group(1)}T{match.group(2)}:{match.group(3)}:{match.group(4)}",
+                        'size': os.path.getsize(os.path.join(backup_dir, name)) if full else None})
+    backups.sort(key=lambda backup: backup['created'], reverse=True)
+    return backups
+
+def select_backups_to_keep(backups, keep_last=0, hourly=0, daily=0, weekly=0):
+    """
+    Grandfather-father-son selection over backups sorted newest first: the newest
+    keep_last, plus the newest backup of each of the latest `hourly` hours, `daily`
+    days and `weekly` ISO weeks that have any backup. Returns the names to keep.
+    """
+    keep = {backup['name'] for backup in backups[:keep_last]}
+    buckets = ((hourly, lambda moment: (moment.date(), moment.hour)),
+               (daily, lambda moment: moment.date()),
+               (weekly, lambda moment: tuple(moment.isocalendar())[:2]))
+    for count, bucket in buckets:
+        seen = set()
+        for backup in backups:
+            if len(seen) >= count:
+                break
+            key = bucket(datetime.datetime.fromisoformat(backup['created']))
+            if key not in seen:
+                seen.add(key)
+                keep.add(backup['name'])
+    return keep
+
+def get_backup_retention(server_path):
+    """Retention counts from the settings, overridden by the server's own 'backup_retention'."""
+    settings = load_settings()
+    retention = {key: settings.get(f'backup_keep_{key}', 0) for key in ('last', 'hourly', 'daily', 'weekly')}
+    try:
+        retention.update(read_server_profile(server_path).get('backup_retention', {}))
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return retention
+
+def _collect_incremental_garbage(server_path):
+    """Deletes chunk objects no snapshot refers to any more. Returns the bytes freed."""
+    referenced = set()
+    for snapshot_name in list_incremental_backups(server_path):
+        for entry in load_snapshot_manifest(server_path, snapshot_name)['files'].values():
+            referenced.update(entry['chunks'])
+    freed = 0
+    for root, dirs, files in os.walk(os.path.join(get_incremental_store(server_path), 'objects')):
+        for file in files:
+            if file not in referenced:
+                file_path = os.path.join(root, file)
+                freed += os.path.getsize(file_path)
+                os.remove(file_path)
+    return freed
+
+def prune_backups(server_path, dry_run=False):
+    """
+    Deletes the backups the retention policy does not keep and returns their names.
+    Does nothing when every retention count is 0, so an empty policy never wipes backups.
+    """
+    retention = get_backup_retention(server_path)
+    if not any(retention.values()):
+        return []
+    with backup_guard(server_path):
+        backups = list_backups(server_path)
+        keep = select_backups_to_keep(backups, retention['last'], retention['hourly'], retention['daily'], retention['weekly'])
+        removed = [backup for backup in backups if backup['name'] not in keep]
+        if dry_run:
+            return [backup['name'] for backup in removed]
+        for backup in removed:
+            if backup['kind'] == 'full':
+                os.remove(os.path.join(get_backup_dir(server_path), backup['name']))
+                forget_backup_index(server_path, backup['name'])
+            else:
+                os.remove(os.path.join(get_incremental_store(server_path), 'snapshots', f"{backup['name']}.json"))
+        if any(backup['kind'] == 'incremental' for backup in removed):
+            _collect_incremental_garbage(server_path)
+        return [backup['name'] for backup in removed]
+
+class BackupQueue:
+    """
+    Bounded FIFO of backup jobs. At most backup_max_concurrent run at once, so many
+    servers due in the same minute are backed up a few at a time. A server is only
+    queued once; recent results are kept for status displays.
+    """
+    HISTORY_SIZE = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.running = {}
+        self.history = collections.deque(maxlen=self.HISTORY_SIZE)
+
+    def submit(self, server_path, reason='manual'):
+        """Queues a backup. Returns False if the server is already queued or the queue is full."""
+        server_path = os.path.normpath(os.path.abspath(server_path))
+        with self.lock:
+            if server_path in self.running or any(job['path'] == server_path for job in self.pending):
+                return False
+            if len(self.pending) >= load_settings().get('backup_queue_size', 100):
+                print(f"備份佇列已滿，略過 {server_path}")
+                return False
+            self.pending.append({'path': server_path, 'reason': reason, 'queued': time.time()})
+        self._dispatch()
+        return True
+
+    def _dispatch(self):
+        limit = max(1, load_settings().get('backup_max_concurrent', 2))
+        with self.lock:
+            while self.pending and len(self.running) < limit:
+                job = self.pending.popleft()
+                self.running[job['path']] = job
+                threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def _run_job(self, job):
+        job['started'] = time.time()
+        try:
+            job['result'] = create_backup(job['path'], lambda text, value: None)
+            if load_settings().get('backup_prune', False):
+                job['pruned'] = prune_backups(job['path'])
+            job['ok'] = True
+        except Exception as e:
+            job.update(ok=False, error=str(e))
+            print(f"備份失敗 {job['path']}：{e}")
+        job['finished'] = time.time()
+        with self.lock:
+            self.running.pop(job['path'], None)
+            self.history.append(job)
+        self._dispatch()
+
+    def status(self):
+        with self.lock:
+            return {'running': [dict(job) for job in self.running.values()],
+                    'queued': [dict(job) for job in self.pending],
+                    'history': [dict(job) for job in self.history]}
+
+BACKUP_QUEUE = BackupQueue()
+
+class CronScheduler:
+    """
+    Hands registered servers whose schedule (get_schedule(server_info)) matches the
+    current minute to submit(path, 'scheduled'). Minutes missed while the host was
+    asleep are caught up once, up to CATCH_UP_MINUTES back.
+    """
+    CATCH_UP_MINUTES = 60
+
+    def __init__(self, get_schedule, submit, label):
+        self.get_schedule = get_schedule
+        self.submit = submit
+        self.label = label
+        self.thread = None
+        self.stop_event = threading.Event()
+        self._parsed = {}
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def schedule_for(self, server_info):
+        expression = self.get_schedule(server_info)
+        if not expression:
+            return None
+        if expression not in self._parsed:
+            try:
+                self._parsed[expression] = CronSchedule(expression)
+            except Exception as e:
+                print(f"略過無效的{self.label}排程 {server_info.get('path')}：{e}")
+                self._parsed[expression] = None
+        return self._parsed[expression]
+
+    def due_servers(self, moments):
+        due = []
+        for server in get_known_servers():
+            schedule = self.schedule_for(server)
+            if schedule and any(schedule.matches(moment) for moment in moments):
+                due.append(server['path'])
+        return due
+
+    def upcoming(self, now=None):
+        """(next run, server path) of every scheduled server, soonest first."""
+        now = now or datetime.datetime.now()
+        runs = []
+        for server in get_known_servers():
+            schedule = self.schedule_for(server)
+            next_run = schedule.next_after(now) if schedule else None
+            if next_run:
+                runs.append((next_run, server['path']))
+        return sorted(runs)
+
+    def _run(self):
+        last = datetime.datetime.now().replace(second=0, microsecond=0)
+        while True:
+            now = datetime.datetime.now()
+            if self.stop_event.wait(60 - now.second - now.microsecond / 1e6 + 0.1):
+                return
+            current = datetime.datetime.now().replace(second=0, microsecond=0)
+            missed = min(int((current - last).total_seconds() // 60), self.CATCH_UP_MINUTES)
+            moments = [current - datetime.timedelta(minutes=offset) for offset in range(missed)]
+            last = current
+            try:
+                for server_path in self.due_servers(moments):
+                    self.submit(server_path, 'scheduled')
+            except Exception as e:
+                print(f"{self.label}排程錯誤：{e}")
+
+BACKUP_SCHEDULER = CronScheduler(get_backup_schedule, BACKUP_QUEUE.submit, "備份")
+
+def start_backup_scheduler():
+    BACKUP_SCHEDULER.start()
+
+# --- Backup Restore ---
+# A restore only reads the members it needs. Each zip's central directory is indexed
+# once and cached beside the archive (keyed by its size and mtime), and incremental
+# snapshots already carry a manifest, so browsing a large backup is instant. Members
+# are extracted in parallel into a staging folder inside the server, and only then
+# swapped in with renames, so a failed restore never leaves a half-written world.
+BACKUP_INDEX_DIR_NAME = '.index'
+RESTORE_STAGING_NAME = '.restore-staging'
+RESTORE_OLD_NAME = '.restore-old'
+RESTORE_COPY_BUFFER = 1024 * 1024
+DIMENSIONS = ('overworld', 'nether', 'end')
+
+_backup_index_cache = {}
+_backup_index_lock = threading.Lock()
+
+def _backup_index_path(server_path, backup_name):
+    return os.path.join(get_backup_dir(server_path), BACKUP_INDEX_DIR_NAME, f"{backup_name}.json")
+
+def _read_zip_index(zip_path):
+    with zipfile.ZipFile(zip_path) as zipf:
+        return {info.filename: {'size': info.file_size, 'mtime': time.mktime(info.date_time + (0, 0, -1))}
+                for info in zipf.infolist() if not info.is_dir()}
+
+def load_backup_index(server_path, backup_name):
+    """Maps every file in a backup to its size and mtime (seconds)."""
+    if not BACKUP_NAME_PATTERN.match(backup_name):
+        raise Exception(f"找不到備份 {backup_name}！")
+    if not backup_name.endswith('.zip'):
+        try:
+            files = load_snapshot_manifest(server_path, backup_name)['files']
+        except FileNotFoundError:
+            raise Exception(f"找不到備份 {backup_name}！")
+        return {name: {'size': entry['size'], 'mtime': entry['mtime_ns'] / 1e9} for name, entry in files.items()}
+
+    zip_path = os.path.join(get_backup_dir(server_path), backup_name)
+    try:
+        stat = os.stat(zip_path)
+    except FileNotFoundError:
+        raise Exception(f"找不到備份 {backup_name}！")
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _backup_index_lock:
+        cached = _backup_index_cache.get(zip_path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+    index_path = _backup_index_path(server_path, backup_name)
+    entries = None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        if (stored['size'], stored['mtime_ns']) == key:
+            entries = stored['entries']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        pass
+    if entries is None:
+        entries = _read_zip_index(zip_path)
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'entries': entries}, f)
+            os.replace(index_path + '.tmp', index_path)
+        except OSError as e:
+            # A read-only backup drive still restores, it just isn't cached on disk
+            print(f"無法寫入備份索引 {index_path}: {e}")
+    with _backup_index_lock:
+        _backup_index_cache[zip_path] = (key, entries)
+    return entries
+
+def forget_backup_index(server_path, backup_name):
+    with _backup_index_lock:
+        _backup_index_cache.pop(os.path.join(get_backup_dir(server_path), backup_name), None)
+    try:
+        os.remove(_backup_index_path(server_path, backup_name))
+    except FileNotFoundError:
+        pass
+
+def browse_backup(server_path, backup_name, prefix=''):
+    """
+    Lists the direct children of a folder inside a backup, folders first. Folders
+    report the total size and number of files below them.
+    """
+    prefix = _normalize_member_path(prefix)
+    base = f"{prefix}/" if prefix else ''
+    children = {}
+    for name, entry in load_backup_index(server_path, backup_name).items():
+        if not name.startswith(base):
+            continue
+        head, sep, _ = name[len(base):].partition('/')
+        child = children.setdefault(head, {'name': base + head, 'type': 'dir' if sep else 'file', 'size': 0, 'files': 0})
+        child['size'] += entry['size']
+        child['files'] += 1
+        if not sep:
+            child['mtime'] = entry['mtime']
+    if prefix and not children:
+        raise Exception(f"備份 {backup_name} 中沒有 {prefix}！")
+    return sorted(children.values(), key=lambda child: (child['type'] != 'dir', child['name']))
+
+def get_level_name(server_path):
+    return (read_properties(server_path) or {}).get('level-name') or 'world'
+
+def dimension_roots(level_name, dimension):
+    """Folders holding one dimension, in both the vanilla and the Bukkit world layout."""
+    if dimension == 'overworld':
+        return [f"{level_name}/{folder}" for folder in ('region', 'entities', 'poi')]
+    if dimension == 'nether':
+        return [f"{level_name}/DIM-1", f"{level_name}_nether"]
+    if dimension == 'end':
+        return [f"{level_name}/DIM1", f"{level_name}_the_end"]
+    if ':' in dimension:
+        namespace, path = dimension.split(':', 1)
+        return [f"{level_name}/dimensions/{namespace}/{path}"]
+    raise Exception(f"未知的維度：{dimension} (可用：{', '.join(DIMENSIONS)} 或 命名空間:名稱)")
+
+def _normalize_member_path(path):
+    parts = [part for part in path.replace('\\', '/').split('/') if part not in ('', '.')]
+    if '..' in parts:
+        raise Exception(f"無效的路徑：{path}")
+    return '/'.join(parts)
+
+def _is_under(name, root):
+    return name == root or name.startswith(root + '/')
+
+def resolve_restore_roots(server_path, entries, dimension=None, paths=None):
+    """
+    Top-level paths a restore replaces: None for the whole server, the folders of a
+    dimension that exist in the backup, or the given files and folders.
+    """
+    if dimension:
+        roots = dimension_roots(get_level_name(server_path), dimension)
+        roots = [root for root in roots if any(_is_under(name, root) for name in entries)]
+        if not roots:
+            raise Exception(f"備份中沒有 {dimension} 維度的資料！")
+        return roots
+    if not paths:
+        return None
+    roots = []
+    for path in paths:
+        root = _normalize_member_path(path)
+        if not root or not any(_is_under(name, root) for name in entries):
+            raise Exception(f"備份中沒有 {path}！")
+        roots.append(root)
+    # Drop paths already covered by a parent folder in the same request
+    return [root for root in roots if not any(other != root and _is_under(root, other) for other in roots)]
+
+def _extract_members(server_path, backup_name, members, target_dir, progress_callback, progress_range=(0.05, 0.95)):
+    """Writes the given backup members below target_dir, largest first, on every configured worker."""
+    entries = load_backup_index(server_path, backup_name)
+    workers = load_settings().get('backup_workers') or os.cpu_count() or 1
+    start, end = progress_range
+    target_root = os.path.abspath(target_dir)
+    local = threading.local()
+    handles, handles_lock = [], threading.Lock()
+    zip_path = os.path.join(get_backup_dir(server_path), backup_name)
+    if backup_name.endswith('.zip'):
+        manifest = None
+    else:
+        store_dir = get_incremental_store(server_path)
+        manifest = load_snapshot_manifest(server_path, backup_name)['files']
+
+    def extract(name):
+        file_path = os.path.abspath(os.path.join(target_root, *name.split('/')))
+        if not file_path.startswith(target_root + os.sep):
+            raise Exception(f"備份中的路徑不安全：{name}")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as dst:
+            if manifest is None:
+                # zipfile handles are not safe to share between threads, so each worker opens its own
+                if not hasattr(local, 'zipf'):
+                    local.zipf = zipfile.ZipFile(zip_path)
+                    with handles_lock: handles.append(local.zipf)
+                with local.zipf.open(name) as src:
+                    shutil.copyfileobj(src, dst, RESTORE_COPY_BUFFER)
+            else:
+                for digest in manifest[name]['chunks']:
+                    dst.write(_read_chunk_object(store_dir, digest))
+        mtime = entries[name]['mtime']
+        os.utime(file_path, (mtime, mtime))
+        return entries[name]['size']
+
+    members = sorted(members, key=lambda name: entries[name]['size'], reverse=True)
+    bytes_total = sum(entries[name]['size'] for name in members)
+    bytes_done, last_percent = 0, -1
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(extract, name) for name in members]
+            try:
+                for index, future in enumerate(as_completed(futures)):
+                    bytes_done += future.result()
+                    percent = bytes_done * 100 // max(bytes_total, 1)
+                    if percent != last_percent:
+                        last_percent = percent
+                        progress_callback(f"解壓縮中... {index + 1}/{len(members)} ({bytes_done/1024/1024:.1f}MB)",
+                                          start + (end - start) * percent / 100)
+            except BaseException:
+                for future in futures: future.cancel()
+                raise
+    finally:
+        for handle in handles: handle.close()
+
+def _remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+def _swap_in_restored(server_path, staging_dir, roots):
+    """
+    Replaces each root with its staged copy. Current versions are moved aside first
+    and moved back if any rename fails, then deleted once every root is in place.
+    """
+    old_dir = os.path.join(server_path, RESTORE_OLD_NAME)
+    moved, placed = [], []
+    try:
+        for root in roots:
+            target = os.path.join(server_path, *root.split('/'))
+            staged = os.path.join(staging_dir, *root.split('/'))
+            if os.path.lexists(target):
+                aside = os.path.join(old_dir, *root.split('/'))
+                os.makedirs(os.path.dirname(aside), exist_ok=True)
+                os.replace(target, aside)
+                moved.append((aside, target))
+            if os.path.lexists(staged):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(staged, target)
+                placed.append((target, staged))
+    except OSError:
+        for target, staged in reversed(placed):
+            os.replace(target, staged)
+        for aside, target in reversed(moved):
+            os.replace(aside, target)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def restore_backup(server_path, backup_name, progress_callback, dimension=None, paths=None):
+    """
+    Restores a whole backup, one dimension, or selected files and folders into a
+    stopped server. Returns the number of files restored.
+    """
+    ensure_server_stopped(server_path, "請先停止伺服器再還原備份！")
+    if os.path.exists(os.path.join(server_path, RESTORE_OLD_NAME)):
+        raise Exception(f"上一次還原沒有完成，請先檢查 {RESTORE_OLD_NAME} 資料夾中的檔案！")
+    with backup_guard(server_path):
+        progress_callback("讀取備份索引...", 0.0)
+        entries = load_backup_index(server_path, backup_name)
+        roots = resolve_restore_roots(server_path, entries, dimension, paths)
+        if roots is None:
+            members = list(entries)
+            # A full restore also removes what was added since the backup, except the backups themselves
+            skip = {'backups', RESTORE_STAGING_NAME, RESTORE_OLD_NAME}
+            roots = sorted({name.split('/', 1)[0] for name in members} |
+                           {name for name in os.listdir(server_path) if name not in skip})
+        else:
+            members = [name for name in entries if any(_is_under(name, root) for root in roots)]
+
+        staging_dir = os.path.join(server_path, RESTORE_STAGING_NAME)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        try:
+            _extract_members(server_path, backup_name, members, staging_dir, progress_callback)
+            progress_callback("替換檔案中...", 0.97)
+            # Extraction can take a while; never swap folders out from under a server started meanwhile
+            ensure_server_stopped(server_path, "伺服器在還原期間啟動了，已取消還原！")
+            _swap_in_restored(server_path, staging_dir, roots)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    progress_callback(f"還原完成! 共 {len(members)} 個檔案", 1.0)
+    return len(members)
+
+# --- World Analysis (Anvil Region Files) ---
+# A region file starts with two 4 KiB tables of 1024 big-endian entries: chunk
+# locations (3-byte sector offset, 1-byte sector count) and last-save timestamps.
+# Chunk counts, sizes and ages come from those tables alone; InhabitedTime needs
+# the chunk itself, so it is only read on request and the decompression stops as
+# soon as the tag is found. Region files are memory-mapped and scanned in parallel.
+REGION_SECTOR_SIZE = 4096
+REGION_HEADER_SIZE = 2 * REGION_SECTOR_SIZE
+REGION_FILE_PATTERN = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mca$")
+# Chunk folders that share the region grid; pruning removes a chunk from all of them
+REGION_FOLDERS = ('region', 'entities', 'poi')
+INHABITED_TIME_TAG = b'\x04\x00\x0dInhabitedTime'
+CHUNK_DECOMPRESSORS = {1: 31, 2: 15}  # compression type -> zlib wbits (gzip, zlib)
+CHUNK_EXTERNAL_FLAG = 0x80
+TICKS_PER_SECOND = 20
+
+def find_dimension_folders(server_path):
+    """Maps a label such as 'world', 'world/DIM-1' or 'world_nether/DIM-1' to each folder holding a region/ directory."""
+    level_name = get_level_name(server_path)
+    folders = {}
+    for world in (level_name, f"{level_name}_nether", f"{level_name}_the_end"):
+        world_path = os.path.join(server_path, world)
+        for root, dirs, files in os.walk(world_path):
+            if 'region' in dirs:
+                folders[os.path.relpath(root, server_path).replace(os.sep, '/')] = root
+            # Nothing below these holds further dimensions
+            for skip in REGION_FOLDERS + ('playerdata', 'data', 'datapacks', 'stats', 'advancements'):
+                if skip in dirs: dirs.remove(skip)
+    return folders
+
+def _read_region_tables(mm):
+    return struct.unpack_from('>1024I', mm, 0), struct.unpack_from('>1024I', mm, REGION_SECTOR_SIZE)
+
+def _read_inhabited_time(mm, location, region_dir, chunk_x, chunk_z):
+    """InhabitedTime of one chunk in ticks, or None if the chunk can't be read (e.g. LZ4-compressed)."""
+    offset = (location >> 8) * REGION_SECTOR_SIZE
+    if offset + 5 > len(mm):
+        return None
+    length, compression = struct.unpack_from('>IB', mm, offset)
+    if compression & CHUNK_EXTERNAL_FLAG:
+        try:
+            with open(os.path.join(region_dir, f"c.{chunk_x}.{chunk_z}.mcc"), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+    else:
+        data = mm[offset + 5:offset + 4 + length]
+    compression &= ~CHUNK_EXTERNAL_FLAG
+    if compression == 3:
+        index = data.find(INHABITED_TIME_TAG)
+        return struct.unpack_from('>q', data, index + len(INHABITED_TIME_TAG))[0] if index >= 0 else None
+    if compression not in CHUNK_DECOMPRESSORS:
+        return None
+    decompressor = zlib.decompressobj(CHUNK_DECOMPRESSORS[compression])
+    tail_size = len(INHABITED_TIME_TAG) + 8
+    buffer = b''
+    try:
+        for start in range(0, len(data), 16384):
+            buffer += decompressor.decompress(data[start:start + 16384])
+            index = buffer.find(INHABITED_TIME_TAG)
+            if index >= 0 and index + tail_size <= len(buffer):
+                return struct.unpack_from('>q', buffer, index + len(INHABITED_TIME_TAG))[0]
+            buffer = buffer[-tail_size:]
+        buffer += decompressor.flush()
+    except zlib.error:
+        return None
+    index = buffer.find(INHABITED_TIME_TAG)
+    return struct.unpack_from('>q', buffer, index + len(INHABITED_TIME_TAG))[0] if index >= 0 and index + tail_size <= len(buffer) else None
+
+def analyze_region(region_path, inhabited=False):
+    """
+    Statistics of one region file from its header tables: chunk count, allocated
+    and wasted bytes, oldest/newest chunk save. With inhabited=True also the
+    InhabitedTime of every chunk (ticks, None where unreadable).
+    """
+    region_x, region_z = (int(value) for value in REGION_FILE_PATTERN.match(os.path.basename(region_path)).groups())
+    stats = {'file': os.path.basename(region_path), 'x': region_x, 'z': region_z, 'size': os.path.getsize(region_path),
+             'chunks': 0, 'allocated': 0, 'wasted': 0, 'oldest': None, 'newest': None, 'error': None}
+    if stats['size'] < REGION_HEADER_SIZE:
+        # The server creates the file before writing its header; an empty one holds no chunks
+        if stats['size']: stats['error'] = "檔案標頭不完整"
+        return stats
+    with open(region_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        locations, timestamps = _read_region_tables(mm)
+        stats['chunks'] = 1024 - locations.count(0)
+        stats['allocated'] = sum(mm[3:REGION_SECTOR_SIZE:4]) * REGION_SECTOR_SIZE
+        stats['wasted'] = max(0, stats['size'] - REGION_HEADER_SIZE - stats['allocated'])
+        saved = set(timestamps)
+        saved.discard(0)
+        if saved:
+            stats['oldest'], stats['newest'] = min(saved), max(saved)
+        if inhabited:
+            region_dir = os.path.dirname(region_path)
+            stats['inhabited'] = {
+                index: _read_inhabited_time(mm, location, region_dir, region_x * 32 + index % 32, region_z * 32 + index // 32)
+                for index, location in enumerate(locations) if location}
+    return stats
+
+REGION_SCAN_BATCH = 256
+
+def _scan_region_batch(paths, worker):
+    results = []
+    for path in paths:
+        try:
+            results.append(worker(path))
+        except (OSError, ValueError, struct.error) as e:
+            results.append({'file': os.path.basename(path), 'error': str(e)})
+    return results
+
+def _scan_regions(region_paths, worker, progress_callback, progress_range):
+    """
+    Runs worker(path) on every region file on all configured workers, in batches so
+    a world of tens of thousands of regions doesn't pay for a future per file.
+    Results come back in input order.
+    """
+    workers = load_settings().get('backup_workers') or os.cpu_count() or 1
+    start, end = progress_range
+    batches = [region_paths[i:i + REGION_SCAN_BATCH] for i in range(0, len(region_paths), REGION_SCAN_BATCH)]
+    results, done = [None] * len(batches), 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_scan_region_batch, batch, worker): index for index, batch in enumerate(batches)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done += len(results[futures[future]])
+            if progress_callback:
+                progress_callback(f"掃描區域檔... {done}/{len(region_paths)}", start + (end - start) * done / len(region_paths))
+    return [result for batch in results for result in batch]
+
+def _list_region_files(region_dir):
+    try:
+        return sorted(os.path.join(region_dir, name) for name in os.listdir(region_dir) if REGION_FILE_PATTERN.match(name))
+    except FileNotFoundError:
+        return []
+
+def analyze_world(server_path, inhabited=False, progress_callback=None):
+    """
+    Per-dimension region statistics of a server's world. With inhabited=True each
+    region also gets an InhabitedTime summary in seconds, which reads every chunk.
+    """
+    folders = find_dimension_folders(server_path)
+    if not folders:
+        raise Exception(f"找不到世界資料夾 {get_level_name(server_path)}！")
+    region_paths = {label: _list_region_files(os.path.join(folder, 'region')) for label, folder in folders.items()}
+    all_paths = [path for paths in region_paths.values() for path in paths]
+    results = dict(zip(all_paths, _scan_regions(all_paths, lambda path: analyze_region(path, inhabited), progress_callback, (0.0, 1.0))))
+
+    report = {'path': server_path, 'dimensions': []}
+    for label, paths in region_paths.items():
+        regions = [results[path] for path in paths]
+        for region in regions:
+            times = [ticks for ticks in region.pop('inhabited', {}).values() if ticks is not None] if inhabited else None
+            if times is not None:
+                region['inhabited_max'] = max(times) / TICKS_PER_SECOND if times else 0
+                region['inhabited_total'] = sum(times) / TICKS_PER_SECOND
+                region['never_visited'] = sum(1 for ticks in times if ticks == 0)
+        summary = {key: sum(region.get(key, 0) for region in regions) for key in ('chunks', 'size', 'allocated', 'wasted')}
+        summary['regions'] = len(regions)
+        summary['errors'] = sum(1 for region in regions if region.get('error'))
+        if inhabited:
+            summary['never_visited'] = sum(region.get('never_visited', 0) for region in regions)
+        saved = [region['newest'] for region in regions if region.get('newest')]
+        summary['newest'] = max(saved) if saved else None
+        report['dimensions'].append({'name': label, 'summary': summary, 'regions': regions})
+    return report
+
+def format_world_report(report, top=10):
+    """Text summary of analyze_world: one block per dimension with its largest regions."""
+    lines = []
+    for dimension in report['dimensions']:
+        summary = dimension['summary']
+        lines.append(f"[{dimension['name']}] {summary['regions']} 個區域檔，{summary['chunks']} 個區塊，"
+                     f"{summary['size'] / 1024 / 1024:.1f} MB (浪費空間 {summary['wasted'] / 1024 / 1024:.1f} MB)")
+        if 'never_visited' in summary:
+            lines.append(f"  從未有玩家停留的區塊：{summary['never_visited']}")
+        if summary['errors']:
+            lines.append(f"  讀取失敗的區域檔：{summary['errors']}")
+        regions = sorted((region for region in dimension['regions'] if 'size' in region), key=lambda region: region['size'], reverse=True)
+        for region in regions[:top]:
+            newest = datetime.datetime.fromtimestamp(region['newest']).strftime('%Y-%m-%d') if region['newest'] else '-'
+            line = f"  {region['file']:<16} {region['chunks']:>5} 區塊 {region['size'] / 1024 / 1024:8.1f} MB  最後儲存 {newest}"
+            if 'inhabited_max' in region:
+                line += f"  最長停留 {region['inhabited_max'] / 60:.0f} 分鐘"
+            lines.append(line)
+    return lines
+
+def _rewrite_region(region_path, remove):
+    """
+    Drops the chunk indexes in `remove` from a region file and packs the remaining
+    chunks behind the header, replacing the file atomically. A region left with no
+    chunks is deleted. Returns the bytes freed.
+    """
+    size = os.path.getsize(region_path)
+    with open(region_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        locations, timestamps = _read_region_tables(mm)
+        keep = [index for index, location in enumerate(locations) if location and index not in remove]
+        if not keep:
+            new_size = 0
+        else:
+            new_locations, new_timestamps = [0] * 1024, [0] * 1024
+            temp_path = region_path + '.tmp'
+            with open(temp_path, 'wb') as out:
+                out.write(bytes(REGION_HEADER_SIZE))
+                sector = 2
+                for index in sorted(keep, key=lambda index: locations[index] >> 8):
+                    offset = (locations[index] >> 8) * REGION_SECTOR_SIZE
+                    # The one-byte sector count saturates on huge chunks, so trust the length field
+                    length = struct.unpack_from('>I', mm, offset)[0] + 4
+                    count = max(locations[index] & 0xFF, -(-length // REGION_SECTOR_SIZE))
+                    out.write(mm[offset:offset + count * REGION_SECTOR_SIZE].ljust(count * REGION_SECTOR_SIZE, b'\0'))
+                    new_locations[index] = (sector << 8) | min(count, 255)
+                    new_timestamps[index] = timestamps[index]
+                    sector += count
+                new_size = out.tell()
+                out.seek(0)
+                out.write(struct.pack('>1024I', *new_locations) + struct.pack('>1024I', *new_timestamps))
+    if keep:
+        os.replace(temp_path, region_path)
+    else:
+        os.remove(region_path)
+    return size - new_size
+
+def prune_world(server_path, max_inhabited_seconds=None, dimensions=None, dry_run=False, progress_callback=None):
+    """
+    Deletes chunks whose InhabitedTime is at most max_inhabited_seconds, i.e. chunks
+    players never spent time in; the server regenerates them when someone gets there.
+    The matching chunks in entities/ and poi/ go too. Chunks that can't be read are kept.
+    """
+    ensure_server_stopped(server_path, "請先停止伺服器再清理世界！")
+    if max_inhabited_seconds is None:
+        max_inhabited_seconds = load_settings().get('world_prune_max_inhabited_seconds', 0)
+    max_ticks = max_inhabited_seconds * TICKS_PER_SECOND
+    folders = find_dimension_folders(server_path)
+    if dimensions:
+        unknown = set(dimensions) - set(folders)
+        if unknown:
+            raise Exception(f"找不到維度資料夾：{', '.join(sorted(unknown))} (可用：{', '.join(folders)})")
+        folders = {label: folders[label] for label in dimensions}
+
+    with backup_guard(server_path):
+        region_paths = [path for folder in folders.values() for path in _list_region_files(os.path.join(folder, 'region'))]
+        scanned = _scan_regions(region_paths, lambda path: analyze_region(path, inhabited=True), progress_callback, (0.0, 0.7))
+        result = {'chunks_removed': 0, 'regions_changed': 0, 'regions_deleted': 0, 'bytes_freed': 0, 'dry_run': dry_run}
+        plans = []
+        for region_path, region in zip(region_paths, scanned):
+            remove = {index for index, ticks in region.get('inhabited', {}).items() if ticks is not None and ticks <= max_ticks}
+            if not remove:
+                continue
+            result['chunks_removed'] += len(remove)
+            result['regions_changed'] += 1
+            if len(remove) == region['chunks']:
+                result['regions_deleted'] += 1
+            plans.append((region_path, region, remove))
+        if dry_run:
+            return result
+
+        # The scan can take minutes; region files must not be rewritten under a server started meanwhile
+        ensure_server_stopped(server_path, "伺服器在掃描期間啟動了，已取消清理世界！")
+        for index, (region_path, region, remove) in enumerate(plans):
+            dimension_dir = os.path.dirname(os.path.dirname(region_path))
+            for folder in REGION_FOLDERS:
+                path = os.path.join(dimension_dir, folder, region['file'])
+                if os.path.exists(path) and os.path.getsize(path) >= REGION_HEADER_SIZE:
+                    result['bytes_freed'] += _rewrite_region(path, remove)
+            for chunk in remove:
+                external = os.path.join(os.path.dirname(region_path), f"c.{region['x'] * 32 + chunk % 32}.{region['z'] * 32 + chunk // 32}.mcc")
+                if os.path.exists(external):
+                    result['bytes_freed'] += os.path.getsize(external)
+                    os.remove(external)
+            if progress_callback:
+                progress_callback(f"清理區域檔... {index + 1}/{len(plans)}", 0.7 + 0.3 * (index + 1) / len(plans))
+    return result
+
+# --- World Pre-generation ---
+# Generates the chunks around spawn before players explore them. With the Chunky
+# plugin/mod installed the server is driven through Chunky's commands and its
+# progress lines; otherwise the area is force-loaded one square batch at a time and
+# each batch is released once it reports loaded. While players are online and the
+# server ticks slower than the MSPT threshold, generation pauses until it recovers.
+PREGEN_METHODS = ('auto', 'chunky', 'forceload')
+PREGEN_BATCH_CHUNKS = 16  # forceload accepts at most 256 chunks per command
+PREGEN_READY_TIMEOUT = 600
+PREGEN_BATCH_TIMEOUT = 120
+PREGEN_UNTESTED_BATCH_SECONDS = 10
+PREGEN_CHECK_INTERVAL = 5
+# Resume once MSPT is back below this share of the threshold, so it doesn't flap
+PREGEN_RESUME_FACTOR = 0.8
+PREGEN_RATE_WINDOW = 60
+CHUNKY_PROGRESS = re.compile(r"Task running for (\S+)\. Processed: (\d+) chunks \(([\d.,]+)%\)")
+CHUNKY_FINISHED = re.compile(r"Task finished for (\S+)\.")
+TICK_QUERY = re.compile(r"Average time per tick: ([\d.]+)ms")
+FORCELOAD_REPLY = re.compile(r"Marked|No chunks were marked|Unknown or incomplete command|Incorrect argument|Too many chunks")
+LOADED_TEST = re.compile(r"Test (passed|failed)|Unknown or incomplete command|Incorrect argument")
+
+def has_chunky(server_path):
+    for folder in ('plugins', 'mods'):
+        try:
+            names = os.listdir(os.path.join(server_path, folder))
+        except FileNotFoundError:
+            continue
+        if any(name.lower().startswith('chunky') and name.lower().endswith('.jar') for name in names):
+            return True
+    return False
+
+def read_world_spawn(server_path):
+    """Spawn block (x, z) from level.dat, or (0, 0) if it can't be read."""
+    try:
+        with open(os.path.join(server_path, get_level_name(server_path), 'level.dat'), 'rb') as f:
+            data = zlib.decompress(f.read(), 31)
+    except (OSError, zlib.error):
+        return 0, 0
+    spawn = []
+    for name in (b'SpawnX', b'SpawnZ'):
+        tag = b'\x03' + struct.pack('>H', len(name)) + name
+        index = data.find(tag)
+        if index < 0:
+            return 0, 0
+        spawn.append(struct.unpack_from('>i', data, index + len(tag))[0])
+    return tuple(spawn)
+
+class PregenJob:
+    """
+    Pre-generates a square of `radius` blocks around `center` (spawn by default) on
+    one server, starting the server first and stopping it afterwards if it wasn't
+    running. Progress, rate and ETA are read from status() by any thread.
+    """
+    def __init__(self, server_path, radius, center=None, method=None, dimension=None, mspt_threshold=None):
+        settings = load_settings()
+        if not isinstance(radius, int) or radius <= 0:
+            raise Exception("預先生成半徑必須是大於 0 的整數 (格)！")
+        method = method or settings.get('pregen_method', 'auto')
+        if method not in PREGEN_METHODS:
+            raise Exception(f"未知的預先生成方式：{method} (可用：{', '.join(PREGEN_METHODS)})")
+        if method == 'chunky' and not has_chunky(server_path):
+            raise Exception("找不到 Chunky，請先將它放入 plugins 或 mods 資料夾！")
+        self.server_path = os.path.normpath(os.path.abspath(server_path))
+        self.radius = radius
+        self.center = tuple(center) if center else None
+        self.method = method
+        self.dimension = dimension
+        self.mspt_threshold = mspt_threshold or settings.get('pregen_mspt_threshold', 45)
+        span = 2 * -(-radius // 16) + 1
+        self.total = span * span
+        self.done = 0
+        self.rate = 0.0
+        self.eta = None
+        self.mspt = None
+        self.state = 'pending'
+        self.pause_reason = None
+        self.user_paused = False
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.started_server = False
+        self.cancel_event = threading.Event()
+        self.finished_event = threading.Event()
+        self._samples = collections.deque()
+        self._lag_warnings = 0
+
+    def is_active(self):
+        return not self.finished_event.is_set()
+
+    def run(self):
+        self.started = time.time()
+        supervisor = get_supervisor(self.server_path)
+        try:
+            if not supervisor.is_running():
+                if find_server_process(self.server_path):
+                    raise Exception("伺服器由其他程式啟動，無法透過主控台預先生成！")
+                self.state = 'starting'
+                run_server(self.server_path)
+                self.started_server = True
+            self._wait_until_ready(supervisor)
+            if self.cancel_event.is_set():
+                # Cancelled while the server was starting: nothing has been sent to it yet
+                self.state = 'cancelled'
+                supervisor._emit("[Manager] 預先生成已取消")
+                return
+            if self.method == 'auto':
+                self.method = 'chunky' if has_chunky(self.server_path) else 'forceload'
+            self._lag_warnings = supervisor.parser.lag_warnings
+            self.state = 'running'
+            supervisor._emit(f"[Manager] 開始預先生成半徑 {self.radius} 格的世界 ({self.method})")
+            if self.method == 'chunky':
+                self._run_chunky(supervisor)
+            else:
+                self._run_forceload(supervisor)
+            self.state = 'cancelled' if self.cancel_event.is_set() else 'done'
+            supervisor._emit(f"[Manager] 預先生成{'已取消' if self.cancel_event.is_set() else '完成'}：{self.done} 個區塊")
+        except Exception as e:
+            self.state, self.error = 'failed', str(e)
+            if supervisor.is_running():
+                supervisor._emit(f"[Manager] 預先生成失敗：{e}")
+        finally:
+            self.finished = time.time()
+            self.rate, self.eta, self.pause_reason = 0.0, None, None
+            if self.started_server and supervisor.is_running():
+                try: supervisor.stop()
+                except Exception as e: print(f"無法停止伺服器 {self.server_path}：{e}")
+            self.finished_event.set()
+
+    def _wait_until_ready(self, supervisor):
+        deadline = time.monotonic() + PREGEN_READY_TIMEOUT
+        while not supervisor.parser.ready:
+            if not supervisor.is_running():
+                raise Exception("伺服器在啟動時結束了，請查看主控台 (是否已同意 EULA？)")
+            if time.monotonic() > deadline:
+                raise Exception("等待伺服器啟動逾時！")
+            if self.cancel_event.wait(1):
+                return
+
+    def _measure_mspt(self, supervisor):
+        """Average tick time in ms from 'mspt' (Paper/Purpur) or 'tick query' (1.20.3+), None if neither answers."""
+        if supervisor.core_type in ("Paper", "Purpur"):
+            match = supervisor.send_command_and_wait("mspt", ConsoleParser.MSPT.pattern, 5)
+        else:
+            match = supervisor.send_command_and_wait("tick query", TICK_QUERY.pattern, 5)
+        return float(match.group(1)) if match else None
+
+    def _overloaded(self, supervisor):
+        """True while players are online and the server ticks slower than the threshold."""
+        parser = supervisor.parser
+        lagging = parser.lag_warnings > self._lag_warnings
+        self._lag_warnings = parser.lag_warnings
+        if not parser.players:
+            self.mspt = None
+            return False
+        self.mspt = self._measure_mspt(supervisor)
+        if self.mspt is None:
+            # No tick time command on this server; fall back on "Can't keep up!" warnings
+            return lagging
+        limit = self.mspt_threshold * (PREGEN_RESUME_FACTOR if self.pause_reason == 'mspt' else 1)
+        return self.mspt > limit
+
+    def _throttle(self, supervisor, pause, resume):
+        """Blocks while paused by the user or by load; pause()/resume() stop and continue the driver."""
+        paused = False
+        while not self.cancel_event.is_set():
+            if not supervisor.is_running():
+                raise Exception("伺服器在預先生成時停止了！")
+            self.pause_reason = 'user' if self.user_paused else ('mspt' if self._overloaded(supervisor) else None)
+            if self.pause_reason is None:
+                if paused:
+                    resume()
+                    self.state = 'running'
+                return
+            if not paused:
+                pause()
+                paused = True
+                self.state = 'paused'
+                self._samples.clear()
+                self.rate, self.eta = 0.0, None
+            # A manual pause needs no tick time queries, so answer a resume quickly
+            self.cancel_event.wait(1 if self.pause_reason == 'user' else PREGEN_CHECK_INTERVAL)
+
+    def _record_progress(self, done):
+        self.done = done
+        now = time.monotonic()
+        self._samples.append((now, done))
+        while now - self._samples[0][0] > PREGEN_RATE_WINDOW:
+            self._samples.popleft()
+        first_time, first_done = self._samples[0]
+        if now > first_time:
+            self.rate = (done - first_done) / (now - first_time)
+        self.eta = max(0, self.total - done) / self.rate if self.rate > 0 else None
+
+    def _run_chunky(self, supervisor):
+        progress = {}
+        def listener(line):
+            match = CHUNKY_PROGRESS.search(line)
+            if match:
+                progress['done'], progress['percent'] = int(match.group(2)), float(match.group(3).replace(',', '.'))
+            elif CHUNKY_FINISHED.search(line):
+                progress['finished'] = True
+        supervisor.add_listener(listener)
+        try:
+            if self.dimension:
+                supervisor.send_command(f"chunky world {self.dimension}")
+            supervisor.send_command(f"chunky center {self.center[0]} {self.center[1]}" if self.center else "chunky spawn")
+            supervisor.send_command("chunky shape square")
+            supervisor.send_command(f"chunky radius {self.radius}")
+            reply = supervisor.send_command_and_wait("chunky start", r"Task started|confirm", 10)
+            # A task left over from an earlier run has to be confirmed before it is replaced
+            if reply and reply.group(0) == 'confirm':
+                supervisor.send_command("chunky confirm")
+            last_check = 0
+            while not progress.get('finished'):
+                if self.user_paused or time.monotonic() - last_check >= PREGEN_CHECK_INTERVAL:
+                    last_check = time.monotonic()
+                    self._throttle(supervisor, lambda: supervisor.send_command("chunky pause"),
+                                   lambda: supervisor.send_command("chunky continue"))
+                if self.cancel_event.is_set():
+                    supervisor.send_command("chunky cancel")
+                    supervisor.send_command("chunky confirm")
+                    return
+                if progress.get('percent'):
+                    self.total = max(self.total, round(progress['done'] * 100 / progress['percent']))
+                if 'done' in progress and progress['done'] != self.done:
+                    self._record_progress(progress['done'])
+                if not supervisor.is_running():
+                    raise Exception("伺服器在預先生成時停止了！")
+                self.cancel_event.wait(1)
+            self._record_progress(self.total)
+        finally:
+            supervisor.remove_listener(listener)
+
+    def _forceload_batches(self, center_x, center_z):
+        """Squares of at most 16x16 chunks covering the area, nearest to the center first."""
+        chunk_x, chunk_z, reach = center_x // 16, center_z // 16, -(-self.radius // 16)
+        batches = []
+        for x1 in range(chunk_x - reach, chunk_x + reach + 1, PREGEN_BATCH_CHUNKS):
+            for z1 in range(chunk_z - reach, chunk_z + reach + 1, PREGEN_BATCH_CHUNKS):
+                batches.append((x1, z1, min(x1 + PREGEN_BATCH_CHUNKS - 1, chunk_x + reach), min(z1 + PREGEN_BATCH_CHUNKS - 1, chunk_z + reach)))
+        batches.sort(key=lambda batch: max(abs(batch[0] + batch[2] - 2 * chunk_x), abs(batch[1] + batch[3] - 2 * chunk_z)))
+        return batches
+
+    def _wait_for_batch(self, supervisor, batch, in_dimension):
+        """Waits until the corners and center of a batch are loaded. Returns False if 'execute if loaded' is unsupported."""
+        x1, z1, x2, z2 = batch
+        deadline = time.monotonic() + PREGEN_BATCH_TIMEOUT
+        for chunk_x, chunk_z in ((x1, z1), (x2, z2), (x1, z2), (x2, z1), ((x1 + x2) // 2, (z1 + z2) // 2)):
+            while time.monotonic() < deadline and not self.cancel_event.is_set():
+                match = supervisor.send_command_and_wait(f"execute {in_dimension}if loaded {chunk_x * 16} 0 {chunk_z * 16}", LOADED_TEST.pattern, 10)
+                if match is None or match.group(1) is None:
+                    return False
+                if match.group(1) == 'passed':
+                    break
+                self.cancel_event.wait(0.5)
+        return True
+
+    def _run_forceload(self, supervisor):
+        if self.center:
+            center_x, center_z = self.center
+        else:
+            supervisor.send_command_and_wait("save-all", r"Saved the game", 30)
+            center_x, center_z = read_world_spawn(self.server_path)
+        batches = self._forceload_batches(center_x, center_z)
+        in_dimension = f"in {self.dimension} " if self.dimension else ""
+        prefix = f"execute {in_dimension}run " if self.dimension else ""
+        load_test = True
+        for batch in batches:
+            self._throttle(supervisor, lambda: None, lambda: None)
+            if self.cancel_event.is_set():
+                break
+            x1, z1, x2, z2 = batch
+            area = f"{x1 * 16} {z1 * 16} {x2 * 16} {z2 * 16}"
+            reply = supervisor.send_command_and_wait(f"{prefix}forceload add {area}", FORCELOAD_REPLY.pattern, 10)
+            if reply and reply.group(0) in ("Unknown or incomplete command", "Incorrect argument", "Too many chunks"):
+                raise Exception("這個伺服器版本不支援 forceload 指令 (需要 1.14.4 以上)，請改用 Chunky！")
+            try:
+                if load_test:
+                    load_test = self._wait_for_batch(supervisor, batch, in_dimension)
+                if not load_test:
+                    # Before 1.19 there is no way to ask whether a chunk is loaded, so give each batch a fixed time
+                    self.cancel_event.wait(PREGEN_UNTESTED_BATCH_SECONDS)
+            finally:
+                supervisor.send_command(f"{prefix}forceload remove {area}")
+            self._record_progress(self.done + (x2 - x1 + 1) * (z2 - z1 + 1))
+        supervisor.send_command("save-all")
+
+    def status(self):
+        history = get_server_metrics(self.server_path)
+        latest = history.latest() if history and is_server_running(self.server_path) else None
+        try:
+            max_ram = read_server_profile(self.server_path).get('max_ram_mb')
+        except (FileNotFoundError, json.JSONDecodeError):
+            max_ram = None
+        supervisor = SUPERVISORS.get(self.server_path)
+        return {'path': self.server_path, 'state': self.state, 'method': self.method, 'radius': self.radius,
+                'center': self.center, 'dimension': self.dimension, 'done': self.done, 'total': self.total,
+                'percent': round(min(100.0, self.done * 100 / self.total), 2), 'chunks_per_second': round(self.rate, 1),
+                'eta_seconds': round(self.eta) if self.eta is not None else None,
+                'mspt': self.mspt, 'mspt_threshold': self.mspt_threshold, 'pause_reason': self.pause_reason,
+                'players': len(supervisor.parser.players) if supervisor else 0,
+                'memory_mb': round(latest['rss_mb']) if latest else None, 'max_ram_mb': max_ram,
+                'started': self.started, 'finished': self.finished, 'error': self.error}
+
+def format_pregen_status(status):
+    """One line summary of a PregenJob status for consoles and the server list."""
+    states = {'pending': "等待中", 'starting': "啟動伺服器中", 'running': "生成中", 'paused': "已暫停",
+              'done': "完成", 'cancelled': "已取消", 'failed': "失敗"}
+    text = f"預先生成 {states.get(status['state'], status['state'])} {status['percent']:.1f}% ({status['done']}/{status['total']})"
+    if status['state'] == 'running':
+        text += f" {status['chunks_per_second']:.1f} 區塊/秒"
+        if status['eta_seconds'] is not None:
+            text += f" 剩餘 {datetime.timedelta(seconds=status['eta_seconds'])}"
+    elif status['state'] == 'paused':
+        text += " (手動)" if status['pause_reason'] == 'user' else f" (MSPT {status['mspt'] or '?'} > {status['mspt_threshold']}，有玩家在線)"
+    elif status['state'] == 'failed':
+        text += f"：{status['error']}"
+    if status['memory_mb'] is not None:
+        text += f" | RAM {status['memory_mb']}MB" + (f"/{status['max_ram_mb']}MB" if status['max_ram_mb'] else "")
+    return text
+
+class PregenManager:
+    """The pre-generation job of each server; one active job per server at a time."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def start(self, server_path, radius, **options):
+        job = PregenJob(server_path, radius, **options)
+        with self.lock:
+            current = self.jobs.get(job.server_path)
+            if current and current.is_active():
+                raise Exception(f"伺服器 {os.path.basename(job.server_path)} 已經在預先生成中！")
+            self.jobs[job.server_path] = job
+        threading.Thread(target=job.run, daemon=True).start()
+        return job
+
+    def get(self, server_path):
+        return self.jobs.get(os.path.normpath(os.path.abspath(server_path)))
+
+    def _active(self, server_path):
+        job = self.get(server_path)
+        if job is None or not job.is_active():
+            raise Exception(f"伺服器 {os.path.basename(server_path)} 沒有進行中的預先生成！")
+        return job
+
+    def pause(self, server_path):
+        self._active(server_path).user_paused = True
+
+    def resume(self, server_path):
+        self._active(server_path).user_paused = False
+
+    def cancel(self, server_path):
+        self._active(server_path).cancel_event.set()
+
+    def status(self):
+        return [job.status() for job in list(self.jobs.values())]
+
+PREGEN = PregenManager()
+
+# --- Scheduled Restarts ---
+# A restart warns online players on a countdown (and goes ahead early once everyone
+# has left), then flushes the world with save-all, stops the server and starts it again.
+# Only one server per host is down or warming up at a time: the next one waits until
+# the previous one is ready plus restart_stagger_seconds, so world loading doesn't pile
+# up on the CPU and disk. A restart waits for a backup of the same server to finish.
+RESTART_SAVE_TIMEOUT = 60
+RESTART_READY_TIMEOUT = 600
+RESTART_POLL_SECONDS = 5
+RESTART_STATE_LABELS = {'pending': "準備中", 'deferred': "等待備份完成", 'countdown': "倒數中", 'waiting': "排隊中",
+                        'stopping': "停止中", 'starting': "啟動中", 'done': "完成", 'failed': "失敗", 'cancelled': "已取消"}
+
+def get_restart_schedule(server_info):
+    return get_server_schedule(server_info, 'restart_schedule')
+
+def set_restart_schedule(server_path, expression):
+    set_server_schedule(server_path, 'restart_schedule', expression)
+
+def format_countdown(seconds):
+    return f"{seconds // 60} 分鐘" if seconds >= 60 and seconds % 60 == 0 else f"{seconds} 秒"
+
+class RestartCancelled(Exception):
+    pass
+
+class RestartManager:
+    """
+    Runs restarts of supervised servers. Countdowns of several servers run side by
+    side; the stop-start-warmup part holds a host-wide slot. One restart per server
+    at a time; recent results are kept for status displays.
+    """
+    HISTORY_SIZE = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slot = threading.Lock()
+        self.active = {}
+        self.cancel_events = {}
+        self.history = collections.deque(maxlen=self.HISTORY_SIZE)
+
+    def submit(self, server_path, reason='manual', countdown=True):
+        """Starts a restart. Returns False if the server isn't running under this tool or is already restarting."""
+        server_path = os.path.normpath(os.path.abspath(server_path))
+        if not is_server_running(server_path):
+            if reason == 'scheduled':
+                print(f"伺服器沒有在執行中，略過排程重新啟動 {server_path}")
+            return False
+        with self.lock:
+            if server_path in self.active:
+                return False
+            job = {'path': server_path, 'reason': reason, 'state': 'pending', 'requested': time.time(), 'deferred_seconds': 0}
+            self.active[server_path] = job
+            self.cancel_events[server_path] = threading.Event()
+        threading.Thread(target=self._run_job, args=(job, self.cancel_events[server_path], countdown), daemon=True).start()
+        return True
+
+    def cancel(self, server_path):
+        """Cancels a restart that hasn't stopped the server yet."""
+        server_path = os.path.normpath(os.path.abspath(server_path))
+        with self.lock:
+            job = self.active.get(server_path)
+            if job is None or job['state'] not in ('pending', 'deferred', 'countdown', 'waiting'):
+                raise Exception(f"伺服器 {os.path.basename(server_path)} 沒有可取消的重新啟動！")
+            self.cancel_events[server_path].set()
+
+    def _run_job(self, job, cancel, countdown):
+        supervisor = get_supervisor(job['path'])
+        has_slot = False
+        try:
+            self._wait_for_backup(job, cancel)
+            if countdown and supervisor.parser.players:
+                job['state'] = 'countdown'
+                self._countdown(supervisor, cancel)
+            job['state'] = 'waiting'
+            # Polling instead of blocking keeps a queued restart cancellable
+            while not self.slot.acquire(timeout=RESTART_POLL_SECONDS):
+                if cancel.is_set(): raise RestartCancelled()
+            has_slot = True
+            # A scheduled backup may have started during the countdown
+            self._wait_for_backup(job, cancel)
+            if cancel.is_set(): raise RestartCancelled()
+            if not supervisor.is_running():
+                raise Exception("伺服器在重新啟動前已經停止")
+            self._restart(supervisor, job)
+        except RestartCancelled:
+            job.update(state='cancelled', ok=False)
+            if supervisor.is_running() and supervisor.parser.players:
+                try: supervisor.send_command("say 伺服器重新啟動已取消")
+                except Exception: pass
+        except Exception as e:
+            job.update(state='failed', ok=False, error=str(e))
+            print(f"重新啟動失敗 {job['path']}：{e}")
+        job['finished'] = time.time()
+        with self.lock:
+            self.active.pop(job['path'], None)
+            self.cancel_events.pop(job['path'], None)
+            self.history.append(job)
+        if has_slot:
+            # Keep the slot through the stagger gap so the next server's warmup doesn't overlap this one's
+            if job.get('ok'):
+                time.sleep(max(0, load_settings().get('restart_stagger_seconds', 60)))
+            self.slot.release()
+
+    def _wait_for_backup(self, job, cancel):
+        deadline = time.monotonic() + load_settings().get('restart_backup_wait_seconds', 1800)
+        while is_backup_running(job['path']):
+            if job['state'] != 'deferred':
+                job['state'] = 'deferred'
+                get_supervisor(job['path'])._emit("[Manager] 備份進行中，重新啟動延後到備份完成後")
+            if time.monotonic() >= deadline:
+                raise Exception("備份執行太久，略過這次重新啟動")
+            if cancel.wait(RESTART_POLL_SECONDS): raise RestartCancelled()
+            job['deferred_seconds'] += RESTART_POLL_SECONDS
+
+    def _drain(self, supervisor, cancel, until):
+        """Waits until the monotonic time `until`; returns True early once no players are online."""
+        while time.monotonic() < until:
+            if not supervisor.parser.players:
+                return True
+            if cancel.wait(min(RESTART_POLL_SECONDS, until - time.monotonic())): raise RestartCancelled()
+        return False
+
+    def _countdown(self, supervisor, cancel):
+        warnings = sorted({int(seconds) for seconds in load_settings().get('restart_warnings', []) if int(seconds) > 0}, reverse=True)
+        end = time.monotonic() + (warnings[0] if warnings else 0)
+        for seconds in warnings:
+            if self._drain(supervisor, cancel, end - seconds):
+                return
+            supervisor.send_command(f"say 伺服器將在 {format_countdown(seconds)}後重新啟動")
+        self._drain(supervisor, cancel, end)
+
+    def _restart(self, supervisor, job):
+        job['state'] = 'stopping'
+        if supervisor.parser.players:
+            supervisor.send_command("say 伺服器正在重新啟動...")
+        # Saving before 'stop' takes the bulk of the write off the shutdown timeout
+        if supervisor.send_command_and_wait("save-all", r"Saved the game", RESTART_SAVE_TIMEOUT) is None:
+            supervisor._emit("[Manager] save-all 沒有在時限內完成，仍繼續重新啟動")
+        down_at = time.monotonic()
+        job['exit_code'] = supervisor.stop()
+        job['state'] = 'starting'
+        run_server(supervisor.server_path)
+        deadline = time.monotonic() + RESTART_READY_TIMEOUT
+        while not supervisor.parser.ready:
+            if time.monotonic() >= deadline:
+                raise Exception(f"伺服器在 {RESTART_READY_TIMEOUT} 秒內沒有啟動完成")
+            if not supervisor.is_running() and (supervisor.stop_event.is_set() or not load_settings().get('auto_restart', True)):
+                raise Exception("伺服器在啟動過程中停止")
+            time.sleep(1)
+        job['downtime_seconds'] = round(time.monotonic() - down_at, 1)
+        job.update(state='done', ok=True)
+        supervisor._emit(f"[Manager] 重新啟動完成，停機 {job['downtime_seconds']} 秒")
+        print(f"已重新啟動 {job['path']}，停機 {job['downtime_seconds']} 秒")
+
+    def status(self):
+        with self.lock:
+            return {'active': [dict(job) for job in self.active.values()],
+                    'history': [dict(job) for job in self.history]}
+
+RESTARTS = RestartManager()
+RESTART_SCHEDULER = CronScheduler(get_restart_schedule, RESTARTS.submit, "重新啟動")
+
+def restart_server(server_path, countdown=True):
+    """Restarts a supervised server in the background, with the player countdown unless countdown is False."""
+    if not is_server_running(server_path):
+        raise Exception(f"伺服器 {os.path.basename(os.path.normpath(server_path))} 沒有在執行中！")
+    if not RESTARTS.submit(server_path, 'manual', countdown):
+        raise Exception(f"伺服器 {os.path.basename(os.path.normpath(server_path))} 已經在重新啟動中！")
+
+def start_restart_scheduler():
+    RESTART_SCHEDULER.start()
+
+# --- Asynchronous Task Management ---
+class Worker(threading.Thread):
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.result = None
+        self.daemon = True
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.result = e
+
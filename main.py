@@ -3,22 +3,26 @@
 # Built: 2025/11/30
 
 import customtkinter as ctk
-import requests
 import os
-import json
-import threading
-import subprocess
-import shutil
-import datetime
+import queue
+import re
 import webbrowser
 import psutil
 import sys
-import platform
-import zipfile
-import io
-import xml.etree.ElementTree as ET
 from tkinter import filedialog, messagebox
 from PIL import Image
+from core import (
+    SUPERVISORS, Worker, load_settings, save_settings, get_versions, install_server,
+    load_provision_spec, provision_servers, prefetch_catalogues, list_artifact_cache, prune_artifact_cache,
+    ServerProperties, scan_for_servers, run_server, stop_server, stop_all_servers,
+    is_server_running, get_supervisor, get_server_metrics, create_backup, get_known_servers,
+    ServerWatcher, PROFILE_FILE_NAME, JVM_PROFILES, read_server_profile, server_java_version, build_jvm_args,
+    update_jvm_settings, compare_jvm_profiles, format_jvm_comparison, check_capacity, plan_capacity,
+    parse_cpu_list, format_cpu_list, set_cpu_affinity, CronSchedule, start_backup_scheduler, is_backup_running,
+    list_backups, browse_backup, restore_backup, analyze_world, format_world_report, prune_world,
+    PREGEN, PREGEN_METHODS, format_pregen_status, RESTARTS, RESTART_STATE_LABELS, restart_server, start_restart_scheduler
+)
+from api import run_api_server
 
 if getattr(sys, 'frozen', False):
     BUNDLE_DIR = os.path.dirname(sys.executable)
@@ -27,494 +31,6 @@ else:
 
 ICON_PATH = os.path.join(BUNDLE_DIR, 'app.ico')
 
-# ==============================================================================
-# CORE BACKEND MODULE - Server Management & Configuration
-# ==============================================================================
-
-# --- Configuration Management System ---
-APP_DIR = os.path.join(os.getenv('APPDATA'), 'MinecraftServerTool')
-JAVA_DIR = os.path.join(APP_DIR, 'java')
-CONFIG_FILE = os.path.join(APP_DIR, 'settings.json')
-DEFAULT_SETTINGS = {
-    'scan_path': os.path.join(os.path.expanduser('~'), 'Desktop'),
-    'min_ram_mb': 1024,
-    'max_ram_mb': 2048,
-    # Theme setting removed in v1.0.0
-    'appearance_mode': 'system', 
-    'use_server_gui': False,
-    'auto_download_java': False,
-    'auto_accept_eula': True,
-    'java_executable_path': 'java',
-    'default_server_port': '25565',
-    'default_max_players': '20',
-    'default_difficulty': 'easy',
-    'default_gamemode': 'survival',
-    'default_online_mode': True,
-    'default_pvp': True
-}
-
-def ensure_config_exists():
-    os.makedirs(APP_DIR, exist_ok=True)
-    os.makedirs(JAVA_DIR, exist_ok=True)
-    if not os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(DEFAULT_SETTINGS, f, indent=4)
-
-def load_settings():
-    ensure_config_exists()
-    try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            settings = DEFAULT_SETTINGS.copy()
-            settings.update(json.load(f))
-            return settings
-    except (json.JSONDecodeError, FileNotFoundError):
-        return DEFAULT_SETTINGS
-
-def save_settings(settings):
-    ensure_config_exists()
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(settings, f, indent=4)
-
-# --- API Integration & Java Runtime Management ---
-API_URLS = {
-    "Paper": "https://api.papermc.io/v2/projects/paper",
-    "Purpur": "https://api.purpurmc.org/v2/purpur",
-    "Vanilla": "https://launchermeta.mojang.com/mc/game/version_manifest.json",
-    "Forge": "https://files.minecraftforge.net/net/minecraftforge/forge/maven-metadata.json",
-    "NeoForge": "https://maven.neoforged.net/net/neoforged/neoforge/maven-metadata.xml",
-    "Fabric": "https://meta.fabricmc.net/v2/versions/game"
-}
-
-def get_versions(core_type, filters={"release"}):
-    try:
-        if core_type in ["Paper", "Purpur"]:
-            response = requests.get(API_URLS[core_type])
-            response.raise_for_status()
-            versions = response.json()['versions'][::-1]
-            filtered_versions = []
-            for v in versions:
-                is_snapshot = "pre" in v or "rc" in v or "SNAPSHOT" in v.upper()
-                if "release" in filters and not is_snapshot: filtered_versions.append(v)
-                if "snapshot" in filters and is_snapshot: filtered_versions.append(v)
-            return filtered_versions
-        elif core_type == "Vanilla":
-            response = requests.get(API_URLS[core_type])
-            response.raise_for_status()
-            return [v['id'] for v in response.json()['versions'] if v['type'] in filters]
-        elif core_type == "Fabric":
-            response = requests.get(API_URLS[core_type])
-            response.raise_for_status()
-            versions = response.json()
-            filtered_versions = []
-            for v in versions:
-                if "release" in filters and v['stable']:
-                    filtered_versions.append(v['version'])
-                if "snapshot" in filters and not v['stable']:
-                    filtered_versions.append(v['version'])
-            return filtered_versions
-        elif core_type == "Forge":
-            response = requests.get(API_URLS[core_type])
-            response.raise_for_status()
-            # The keys of the JSON are the Minecraft versions, return them in reverse order
-            return sorted(list(response.json().keys()), reverse=True)
-        elif core_type == "NeoForge":
-            response = requests.get(API_URLS[core_type])
-            response.raise_for_status()
-            root = ET.fromstring(response.content)
-            # Find all <version> tags and return their text content in reverse order
-            versions = [v.text for v in root.findall('.//versioning/versions/version')]
-            return sorted(versions, reverse=True)
-    except (requests.RequestException, ET.ParseError, KeyError, json.JSONDecodeError) as e:
-        print(f"｡ﾟ(ﾟ´Д｀)ﾟ｡ 網路錯誤或資料解析失敗：{e}")
-        return []
-    return []
-
-def get_download_url(core_type, mc_version):
-    try:
-        if core_type == "Paper":
-            build_res = requests.get(f"{API_URLS[core_type]}/versions/{mc_version}/builds")
-            build_res.raise_for_status()
-            latest_build = build_res.json()['builds'][-1]['build']
-            jar_name = build_res.json()['builds'][-1]['downloads']['application']['name']
-            return f"{API_URLS[core_type]}/versions/{mc_version}/builds/{latest_build}/downloads/{jar_name}"
-        elif core_type == "Purpur":
-            return f"{API_URLS[core_type]}/{mc_version}/latest/download"
-        elif core_type == "Vanilla":
-            manifest_res = requests.get(API_URLS['Vanilla'])
-            manifest_res.raise_for_status()
-            version_url = next((v['url'] for v in manifest_res.json()['versions'] if v['id'] == mc_version), None)
-            if version_url:
-                version_data_res = requests.get(version_url)
-                version_data_res.raise_for_status()
-                return version_data_res.json()['downloads']['server']['url']
-        elif core_type == "Fabric":
-            # Get latest stable loader version
-            loader_res = requests.get(f"https://meta.fabricmc.net/v2/versions/loader/{mc_version}")
-            loader_res.raise_for_status()
-            # The 'stable' key is inside the 'loader' object
-            stable_loaders = [v for v in loader_res.json() if v.get('loader', {}).get('stable')]
-            if not stable_loaders:
-                raise Exception(f"找不到適用於 Minecraft {mc_version} 的穩定版 Fabric loader")
-            loader_version = stable_loaders[0]['loader']['version']
-            
-            # Get latest stable installer version
-            installer_res = requests.get("https://meta.fabricmc.net/v2/versions/installer")
-            installer_res.raise_for_status()
-            stable_installers = [v for v in installer_res.json() if v.get('stable')]
-            if not stable_installers:
-                raise Exception("找不到穩定版的 Fabric 安裝程式")
-            installer_version = stable_installers[0]['version']
-            
-            return f"https://meta.fabricmc.net/v2/versions/loader/{mc_version}/{loader_version}/{installer_version}/server/jar"
-        elif core_type == "Forge":
-            # Forge downloads are behind an ad-wall, so we can't download directly.
-            # Instead, we'll return a special URL to open in the user's browser.
-            return f"WEBPAGE::https://files.minecraftforge.net/net/minecraftforge/forge/index_{mc_version}.html"
-        elif core_type == "NeoForge":
-            # For NeoForge, the mc_version is the full version string
-            return f"https://maven.neoforged.net/net/neoforged/neoforge/{mc_version}/neoforge-{mc_version}-installer.jar"
-
-    except (requests.RequestException, StopIteration, KeyError, json.JSONDecodeError) as e:
-        print(f"(＃`Д´) 找不到下載連結啦：{e}")
-        return None
-    return None
-
-def get_required_java_version(mc_version_str):
-    try:
-        major_version = int(mc_version_str.split('.')[1])
-        if major_version >= 21: return 21
-        if major_version >= 17: return 17
-        if major_version >= 16: return 16
-    except (ValueError, IndexError): pass
-    return 8
-
-def get_java_download_link(version):
-    os_name = "windows" if sys.platform == "win32" else "mac" if sys.platform == "darwin" else "linux"
-    arch = "x64" if platform.machine().endswith('64') else "x86"
-    api_url = f"https://api.adoptium.net/v3/assets/latest/{version}/hotspot?vendor=eclipse&os={os_name}&architecture={arch}"
-    try:
-        res = requests.get(api_url)
-        res.raise_for_status()
-        binary_info = next(pkg for pkg in res.json() if pkg['binary']['image_type'] == 'jdk')
-        return binary_info['binary']['package']['link']
-    except (requests.RequestException, StopIteration, KeyError) as e:
-        print(f"找不到 Java {version} 的下載連結: {e}")
-        return None
-
-def manage_java_installation(mc_version, progress_callback):
-    java_version = get_required_java_version(mc_version)
-    java_install_path = os.path.join(JAVA_DIR, f"jdk-{java_version}")
-    java_exe = os.path.join(java_install_path, 'bin', 'java.exe' if sys.platform == "win32" else "java")
-
-    if os.path.exists(java_install_path):
-        progress_callback(f"已找到 Java {java_version}！", 0.1)
-        return java_exe
-
-    progress_callback(f"需要 Java {java_version}，正在尋找下載連結...", 0.02)
-    link = get_java_download_link(java_version)
-    if not link: raise Exception(f"無法找到 Java {java_version} 的下載點。")
-    
-    progress_callback(f"正在下載 Java {java_version}...", 0.05)
-    response = requests.get(link, stream=True)
-    response.raise_for_status()
-    
-    zip_bytes = io.BytesIO()
-    total_size = int(response.headers.get('content-length', 0))
-    bytes_downloaded = 0
-    for chunk in response.iter_content(chunk_size=8192):
-        bytes_downloaded += len(chunk)
-        zip_bytes.write(chunk)
-        if total_size > 0:
-            progress = (bytes_downloaded / total_size) * 0.3
-            progress_callback(f"下載 Java... {bytes_downloaded/1024/1024:.1f}MB / {total_size/1024/1024:.1f}MB", progress)
-    
-    progress_callback(f"正在解壓縮 Java {java_version}...", 0.35)
-    with zipfile.ZipFile(zip_bytes) as zf:
-        extracted_folder_name = zf.namelist()[0].split('/')[0]
-        zf.extractall(JAVA_DIR)
-    
-    os.rename(os.path.join(JAVA_DIR, extracted_folder_name), java_install_path)
-    progress_callback(f"Java {java_version} 安裝完成！", 0.4)
-    return java_exe
-
-# --- Server Installation System ---
-def install_server(core_type, mc_version, path, progress_callback):
-    try:
-        progress_callback("準備開始...", 0.0)
-        settings = load_settings()
-        
-        java_exe_path = settings['java_executable_path']
-        if settings['auto_download_java']:
-            java_mc_version = mc_version.split('-')[0]
-            java_exe_path = manage_java_installation(java_mc_version, progress_callback)
-        else:
-            progress_callback("使用系統預設 Java...", 0.4)
-
-        os.makedirs(path, exist_ok=True)
-        
-        progress_callback(f"正在尋找 {core_type} {mc_version}...", 0.42)
-        url = get_download_url(core_type, mc_version)
-        if not url: raise Exception("找不到下載連結或對應頁面。")
-
-        INSTALLER_CORES = ["Forge", "NeoForge", "Fabric"]
-        is_installer_core = core_type in INSTALLER_CORES
-        
-        jar_name = "server.jar" # Default
-        bat_content = "" # Default empty
-        download_target_path = ""
-
-        # --- Download Phase ---
-        if url.startswith("WEBPAGE::"):
-            page_url = url.replace("WEBPAGE::", "")
-            webbrowser.open(page_url)
-            proceed = messagebox.askokcancel("需要手動下載", 
-                f"""因為 Forge 的下載受廣告保護，無法自動下載。
-
-已經為您打開下載網頁，請按照以下步驟操作：
-
-1. 在網頁上點擊 "Installer" (安裝程式)。
-2. 將下載的 .jar 檔案儲存到以下資料夾：
-{path}
-3. 完成後，點擊「確定」繼續安裝。
-
-如果不想繼續，請點擊「取消」。"""
-            )
-            if not proceed:
-                raise Exception("使用者取消了手動下載。")
-            
-            # Scan for the downloaded installer
-            jars_in_dir = [f for f in os.listdir(path) if f.endswith('.jar')]
-            if len(jars_in_dir) == 0:
-                raise Exception(f"在 {path} 中找不到任何手動下載的 .jar 安裝檔。")
-            if len(jars_in_dir) > 1:
-                raise Exception(f"在 {path} 中找到多個 .jar 檔案，無法確定哪一個是安裝檔。")
-            download_target_path = os.path.join(path, jars_in_dir[0])
-            progress_callback("偵測到手動下載的安裝檔！", 0.85)
-
-        else: # Automatic download for other cores
-            download_target_name = "installer.jar" if is_installer_core else "server.jar"
-            download_target_path = os.path.join(path, download_target_name)
-            
-            progress_callback(f"正在下載 {download_target_name}...", 0.45)
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            with open(download_target_path, 'wb') as f:
-                bytes_downloaded = 0
-                for chunk in response.iter_content(chunk_size=8192):
-                    bytes_downloaded += len(chunk)
-                    f.write(chunk)
-                    if total_size > 0:
-                        progress = 0.45 + (bytes_downloaded / total_size) * 0.4
-                        progress_callback(f"下載伺服器核心... {bytes_downloaded/1024/1024:.1f}MB / {total_size/1024/1024:.1f}MB", progress)
-            progress_callback("下載完成！", 0.85)
-
-        # --- Installation/Setup Phase ---
-        if is_installer_core:
-            progress_callback(f"正在執行 {core_type} 安裝程式...", 0.86)
-            try:
-                result = subprocess.run(
-                    [java_exe_path, "-jar", download_target_path, "--installServer"],
-                    cwd=path, check=True, capture_output=True, text=True, encoding='utf-8'
-                )
-            except subprocess.CalledProcessError as e:
-                error_message = f"""安裝程式執行失敗！
-返回碼: {e.returncode}
-輸出: {e.stdout}
-錯誤: {e.stderr}"""
-                raise Exception(error_message)
-            except FileNotFoundError:
-                 raise Exception(f"找不到 Java 執行檔 '{java_exe_path}'。請檢查您的 Java 設定或啟用自動下載。")
-
-            # Clean up installer only if it was automatically downloaded
-            if not url.startswith("WEBPAGE::"):
-                os.remove(download_target_path)
-                
-            progress_callback("安裝程式執行完畢，正在設定啟動腳本...", 0.9)
-
-            if core_type in ["Forge", "NeoForge"]:
-                user_args_file = os.path.join(path, 'user_jvm_args.txt')
-                run_bat_file = os.path.join(path, 'run.bat')
-
-                if os.path.exists(run_bat_file):
-                    # For modern Forge/NeoForge, write memory settings to user_jvm_args.txt
-                    if os.path.exists(user_args_file):
-                        with open(user_args_file, 'w', encoding='utf-8') as f:
-                            f.write(f'''# Generated by Minecraft Server Tool
--Xmx{settings["max_ram_mb"]}M
--Xms{settings["min_ram_mb"]}M
-''')
-                    
-                    os.rename(run_bat_file, os.path.join(path, 'start.bat'))
-                    if os.path.exists(os.path.join(path, 'run.sh')):
-                        os.rename(os.path.join(path, 'run.sh'), os.path.join(path, 'start.sh'))
-                    
-                    bat_content = None  # Signal to skip default bat creation
-                    jar_name = "N/A (Installer Core)"
-                else:
-                    # Fallback for older versions that might not create run.bat
-                    raise Exception("安裝後找不到 run.bat。可能是不支援的 Forge/NeoForge 版本。")
-
-            elif core_type == "Fabric":
-                jar_name = "fabric-server-launch.jar"
-        
-        # --- Finalization (for non-installer cores and Fabric) ---
-        if bat_content is not None:
-            java_args = f"-Xms{settings['min_ram_mb']}M -Xmx{settings['max_ram_mb']}M"
-            gui_flag = "" if settings['use_server_gui'] else "nogui"
-            
-            bat_content = f'''
-@echo off
-"{java_exe_path}" {java_args} -jar "{jar_name}" {gui_flag}
-pause
-'''.strip()
-            with open(os.path.join(path, 'start.bat'), 'w', encoding='utf-8') as f: f.write(bat_content)
-        
-        progress_callback("啟動腳本建立完成...", 0.92)
-        
-        if settings['auto_accept_eula']:
-            with open(os.path.join(path, 'eula.txt'), 'w', encoding='utf-8') as f: f.write("eula=true")
-            progress_callback("已自動同意 EULA...", 0.95)
-
-        # Create default server.properties if it doesn't exist
-        settings = load_settings()
-        default_properties = {
-            'server-port': settings.get('default_server_port', '25565'),
-            'max-players': settings.get('default_max_players', '20'),
-            'online-mode': str(settings.get('default_online_mode', True)).lower(),
-            'difficulty': settings.get('default_difficulty', 'easy'),
-            'gamemode': settings.get('default_gamemode', 'survival'),
-            'pvp': str(settings.get('default_pvp', True)).lower()
-        }
-        
-        properties_path = os.path.join(path, 'server.properties')
-        if not os.path.exists(properties_path):
-            with open(properties_path, 'w', encoding='utf-8') as f:
-                f.write("# Minecraft server properties\n")
-                for key, value in default_properties.items():
-                    f.write(f"{key}={value}\n")
-        
-        profile = {"core_type": core_type, "version": mc_version, "jar_name": jar_name}
-        with open(os.path.join(path, 'installer_profile.json'), 'w', encoding='utf-8') as f: json.dump(profile, f, indent=4)
-        progress_callback("伺服器設定檔建立完成！", 1.0)
-        
-        return f"{core_type} {mc_version}"
-    except Exception as e:
-        raise e
-
-# --- Server Properties Configuration Handler ---
-def read_properties(server_path):
-    props = {}
-    props_file = os.path.join(server_path, 'server.properties')
-    if not os.path.exists(props_file): return None
-    with open(props_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                key, value = line.split('=', 1)
-                props[key.strip()] = value.strip()
-    return props
-
-def write_properties(server_path, new_values):
-    props_file = os.path.join(server_path, 'server.properties')
-    lines = []
-    with open(props_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    with open(props_file, 'w', encoding='utf-8') as f:
-        written_keys = set()
-        for line in lines:
-            line_stripped = line.strip()
-            if line_stripped and not line_stripped.startswith('#'):
-                key = line_stripped.split('=', 1)[0].strip()
-                if key in new_values:
-                    f.write(f"{key}={new_values[key]}\n")
-                    written_keys.add(key)
-                else:
-                    f.write(line)
-            else:
-                f.write(line)
-        for key, value in new_values.items():
-            if key not in written_keys:
-                f.write(f"{key}={value}\n")
-
-# --- Server Discovery & Management Module ---
-def scan_for_servers(path):
-    found_servers = []
-    if not os.path.isdir(path): return []
-    for root, dirs, files in os.walk(path):
-        if 'installer_profile.json' in files:
-            profile_path = os.path.join(root, 'installer_profile.json')
-            try:
-                with open(profile_path, 'r') as f:
-                    profile_data = json.load(f)
-                    profile_data['path'] = root
-                    found_servers.append(profile_data)
-                dirs[:] = []
-            except (json.JSONDecodeError, KeyError): continue
-    return found_servers
-
-def run_server(server_path):
-    bat_file = os.path.join(server_path, 'start.bat')
-    if os.path.exists(bat_file):
-        subprocess.Popen([bat_file], creationflags=subprocess.CREATE_NEW_CONSOLE, cwd=server_path)
-    else:
-        raise FileNotFoundError("找不到 start.bat 啟動檔！")
-
-def create_backup(server_path, progress_callback):
-    """
-    Creates a zip archive of a Minecraft server directory.
-    This function intelligently excludes the 'backups' directory itself.
-    """
-    try:
-        progress_callback("初始化打包過程...", 0.1)
-
-        # Define the target directory for storing backups.
-        backup_dir = os.path.join(server_path, 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-
-        # Generate a timestamped, unique filename for the new archive.
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        backup_filename = f"backup-{timestamp}"
-        backup_zip_path = os.path.join(backup_dir, f"{backup_filename}.zip")
-
-        progress_callback("掃描和打包檔案中...", 0.3)
-
-        with zipfile.ZipFile(backup_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Walk through the entire directory tree of the server.
-            for root, dirs, files in os.walk(server_path):
-
-                # Exclude backup directory
-                if 'backups' in dirs:
-                    dirs.remove('backups')
-
-                # Add each file to the zip archive.
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    archive_name = os.path.relpath(file_path, server_path)
-                    zipf.write(file_path, archive_name)
-
-        progress_callback("備份完成!", 1.0)
-        return f"{backup_filename}.zip"
-
-    except Exception as e:
-        raise e
-
-# --- Asynchronous Task Management ---
-class Worker(threading.Thread):
-    def __init__(self, func, *args, **kwargs):
-        super().__init__()
-        self.func, self.args, self.kwargs = func, args, kwargs
-        self.result = None
-        self.daemon = True
-
-    def run(self):
-        try:
-            self.result = self.func(*self.args, **self.kwargs)
-        except Exception as e:
-            self.result = e
-
 # ==============================================================================
 # GRAPHICAL USER INTERFACE MODULE - Frontend Components
 # ==============================================================================
@@ -572,15 +88,23 @@ class InstallView(ctk.CTkFrame):
                                          font=ctk.CTkFont(family="Noto Sans TC"))
         self.browse_button.grid(row=3, column=2, padx=10, pady=10)
 
+        ctk.CTkLabel(self, text="預先生成半徑:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=4, column=0, padx=20, pady=10, sticky="w")
+        self.pregen_entry = ctk.CTkEntry(self, placeholder_text="安裝後預先生成的世界半徑 (格)，留空則不生成",
+                                         font=ctk.CTkFont(family="Noto Sans TC"))
+        self.pregen_entry.grid(row=4, column=1, padx=20, pady=10, sticky="ew")
+
         self.progress_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(family="Noto Sans TC"))
-        self.progress_label.grid(row=4, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+        self.progress_label.grid(row=5, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
         self.progressbar = ctk.CTkProgressBar(self)
-        self.progressbar.grid(row=5, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+        self.progressbar.grid(row=6, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
         self.progressbar.set(0)
 
         self.install_button = ctk.CTkButton(self, text="🚀 開始安裝！", command=self.start_installation, height=40,
                                           font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
-        self.install_button.grid(row=6, column=1, padx=20, pady=20)
+        self.install_button.grid(row=7, column=1, padx=20, pady=20)
+        self.batch_button = ctk.CTkButton(self, text="📄 批次安裝...", command=self.start_batch_installation,
+                                          font=ctk.CTkFont(family="Noto Sans TC"))
+        self.batch_button.grid(row=7, column=2, padx=10, pady=20)
 
         self.after(100, self.trigger_version_update)
 
@@ -610,11 +134,72 @@ class InstallView(ctk.CTkFrame):
         if not path or "..." in path:
             messagebox.showerror("錯誤", "請選擇一個有效的安裝路徑！ Σ(°Д°)"); return
         if os.listdir(path) and not messagebox.askyesno("警告", "資料夾不是空的！\n檔案可能會被覆蓋，確定要繼續嗎？"): return
+        try:
+            capacity_warning = check_capacity({path: load_settings()['max_ram_mb']})
+        except Exception as e:
+            messagebox.showerror("記憶體不足", str(e)); return
+        if capacity_warning and not messagebox.askyesno("記憶體不足", f"{capacity_warning}\n\n仍要繼續安裝嗎？"): return
+        options = {}
+        if self.pregen_entry.get().strip():
+            try:
+                options['pregen_radius'] = int(self.pregen_entry.get())
+                if options['pregen_radius'] <= 0: raise ValueError
+            except ValueError:
+                messagebox.showerror("錯誤", "預先生成半徑必須是大於 0 的整數 (格)！"); return
         self.install_button.configure(state="disabled", text="安裝中...")
-        worker = Worker(install_server, self.core_var.get(), self.version_var.get(), path, self.update_progress)
+        worker = Worker(install_server, self.core_var.get(), self.version_var.get(), path, self.update_progress,
+                        options, manual_download_handler=self.confirm_manual_download)
         worker.start()
         self.after(100, self.check_status, worker, "安裝")
 
+    def confirm_manual_download(self, page_url, path):
+        webbrowser.open(page_url)
+        return messagebox.askokcancel("需要手動下載", 
+            f"""因為 Forge 的下載受廣告保護，無法自動下載。
+
+已經為您打開下載網頁，請按照以下步驟操作：
+
+1. 在網頁上點擊 "Installer" (安裝程式)。
+2. 將下載的 .jar 檔案儲存到以下資料夾：
+{path}
+3. 完成後，點擊「確定」繼續安裝。
+
+如果不想繼續，請點擊「取消」。"""
+        )
+
+    def start_batch_installation(self):
+        spec_path = filedialog.askopenfilename(filetypes=[("批次設定檔", "*.json *.toml")])
+        if not spec_path: return
+        try:
+            spec = load_provision_spec(spec_path)
+        except Exception as e:
+            messagebox.showerror("錯誤", f"無法讀取批次設定檔：\n{e}"); return
+        self.install_button.configure(state="disabled", text="安裝中...")
+        self.batch_button.configure(state="disabled")
+        self.batch_progress = {}
+        worker = Worker(provision_servers, spec, self.update_batch_progress)
+        worker.start()
+        self.after(100, self.check_batch_status, worker)
+
+    def update_batch_progress(self, server_path, text, value):
+        self.batch_progress[server_path] = value
+        overall = sum(self.batch_progress.values()) / len(self.batch_progress)
+        self.update_progress(f"[{os.path.basename(server_path)}] {text}", overall)
+
+    def check_batch_status(self, worker):
+        if worker.is_alive():
+            self.after(100, self.check_batch_status, worker); return
+        self.install_button.configure(state="normal", text="🚀 開始安裝！")
+        self.batch_button.configure(state="normal")
+        if isinstance(worker.result, Exception):
+            messagebox.showerror("批次安裝失敗", f"發生錯誤：\n{worker.result}")
+            self.update_progress("批次安裝失敗 ( TДT)", 0); return
+        failed = [r for r in worker.result if not r['ok']]
+        summary = "\n".join(f"{'✔' if r['ok'] else '✘'} {r['path']} (port {r['port']})" + ("" if r['ok'] else f"：{r['error']}")
+                            for r in worker.result)
+        (messagebox.showwarning if failed else messagebox.showinfo)("批次安裝完成", summary)
+        self.update_progress(f"批次安裝完成：成功 {len(worker.result) - len(failed)}，失敗 {len(failed)}", 1)
+
     def update_progress(self, text, value):
         self.progress_label.configure(text=text); self.progressbar.set(value); self.update_idletasks()
 
@@ -632,19 +217,26 @@ class InstallView(ctk.CTkFrame):
 
 # --- Server Properties Editor Window ---
 class PropertiesEditor(ctk.CTkToplevel):
+    EDITED_KEYS = ('server-port', 'max-players', 'online-mode', 'pvp', 'difficulty', 'gamemode')
+
     def __init__(self, master, server_path):
         super().__init__(master)
         self.server_path = server_path
         self.title(f"編輯 {os.path.basename(server_path)} 屬性")
-        self.geometry("500x400")
+        self.geometry("560x680")
         self.grab_set()
         self.grid_columnconfigure(1, weight=1)
 
-        self.properties = read_properties(self.server_path)
-        if self.properties is None:
+        try:
+            self.model = ServerProperties.load(self.server_path)
+        except FileNotFoundError:
             ctk.CTkLabel(self, text="找不到 server.properties！\n請先啟動一次伺服器以生成檔案。", 
                         font=ctk.CTkFont(family="Noto Sans TC")).pack(pady=20)
             return
+        except Exception as e:
+            ctk.CTkLabel(self, text=f"無法讀取 server.properties：\n{e}", font=ctk.CTkFont(family="Noto Sans TC")).pack(pady=20)
+            return
+        self.properties = self.model.as_dict()
 
         # 基本設定
         ctk.CTkLabel(self, text="基本設定", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=0, column=0, columnspan=2, padx=10, pady=(10, 5), sticky="w")
@@ -681,9 +273,22 @@ class PropertiesEditor(ctk.CTkToplevel):
                                         values=["survival", "creative", "adventure", "spectator"],
                                         font=ctk.CTkFont(family="Noto Sans TC"))
         gamemode_menu.grid(row=7, column=1, padx=10, pady=5, sticky="ew")
-        
+
+        # Every other key in the file, including ones this tool does not know about
+        ctk.CTkLabel(self, text="其他屬性", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=8, column=0, columnspan=2, padx=10, pady=(15, 5), sticky="w")
+        other_frame = ctk.CTkScrollableFrame(self)
+        other_frame.grid(row=9, column=0, columnspan=2, padx=10, pady=5, sticky="nsew")
+        other_frame.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(9, weight=1)
+        self.other_vars = {}
+        other_keys = [key for key in self.model.keys() if key not in self.EDITED_KEYS]
+        for row, key in enumerate(other_keys):
+            ctk.CTkLabel(other_frame, text=key, anchor="w", font=ctk.CTkFont(family="Noto Sans TC")).grid(row=row, column=0, padx=(5, 10), pady=2, sticky="w")
+            self.other_vars[key] = ctk.StringVar(value=self.properties[key])
+            ctk.CTkEntry(other_frame, textvariable=self.other_vars[key], font=ctk.CTkFont(family="Noto Sans TC")).grid(row=row, column=1, padx=5, pady=2, sticky="ew")
+
         ctk.CTkButton(self, text="💾 儲存並關閉", command=self.save_and_close, 
-                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=8, column=1, padx=10, pady=20, sticky="e")
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=10, column=1, padx=10, pady=20, sticky="e")
         
     def save_and_close(self):
         new_values = {
@@ -694,15 +299,547 @@ class PropertiesEditor(ctk.CTkToplevel):
             'difficulty': self.difficulty_var.get(),
             'gamemode': self.gamemode_var.get()
         }
+        new_values.update({key: var.get() for key, var in self.other_vars.items() if var.get() != self.properties[key]})
         try:
-            write_properties(self.server_path, new_values)
+            self.model.update(new_values)
+            self.model.save(self.server_path)
             messagebox.showinfo("成功", "伺服器屬性已儲存！", parent=self)
             self.destroy()
         except Exception as e:
             messagebox.showerror("錯誤", f"儲存失敗：\n{e}", parent=self)
 
+# --- JVM Profile Editor Window ---
+class JvmEditor(ctk.CTkToplevel):
+    """Edits the JVM profile, memory, extra flags and CPU pinning of one server and compares the profiles it has run with."""
+    def __init__(self, master, server_path):
+        super().__init__(master)
+        self.server_path = server_path
+        self.title(f"編輯 {os.path.basename(server_path)} JVM 參數")
+        self.geometry("760x660")
+        self.grab_set()
+        self.grid_columnconfigure(1, weight=1)
+
+        try:
+            self.profile = read_server_profile(self.server_path)
+        except Exception as e:
+            ctk.CTkLabel(self, text=f"無法讀取 installer_profile.json：\n{e}", font=ctk.CTkFont(family="Noto Sans TC")).pack(pady=20)
+            return
+        settings = load_settings()
+        self.java_version = server_java_version(self.profile)
+        self.profile_names = {label: name for name, label in JVM_PROFILES.items()}
+
+        ctk.CTkLabel(self, text="參數設定:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=0, padx=10, pady=(10, 5), sticky="w")
+        self.profile_var = ctk.StringVar(value=JVM_PROFILES.get(self.profile.get('jvm_profile', 'custom'), JVM_PROFILES['custom']))
+        ctk.CTkOptionMenu(self, variable=self.profile_var, values=list(JVM_PROFILES.values()), command=self.update_preview,
+                         font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=1, padx=10, pady=(10, 5), sticky="w")
+
+        ctk.CTkLabel(self, text="最小記憶體 (MB):", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.min_ram_var = ctk.StringVar(value=str(self.profile.get('min_ram_mb', settings['min_ram_mb'])))
+        min_entry = ctk.CTkEntry(self, textvariable=self.min_ram_var, width=120, font=ctk.CTkFont(family="Noto Sans TC"))
+        min_entry.grid(row=1, column=1, padx=10, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text="最大記憶體 (MB):", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        self.max_ram_var = ctk.StringVar(value=str(self.profile.get('max_ram_mb', settings['max_ram_mb'])))
+        max_entry = ctk.CTkEntry(self, textvariable=self.max_ram_var, width=120, font=ctk.CTkFont(family="Noto Sans TC"))
+        max_entry.grid(row=2, column=1, padx=10, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text="額外參數:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        self.extra_var = ctk.StringVar(value=" ".join(self.profile.get('jvm_extra_args', [])))
+        extra_entry = ctk.CTkEntry(self, textvariable=self.extra_var, font=ctk.CTkFont(family="Noto Sans TC"))
+        extra_entry.grid(row=3, column=1, padx=10, pady=5, sticky="ew")
+        for entry in (min_entry, max_entry, extra_entry):
+            entry.bind("<KeyRelease>", self.update_preview)
+
+        ctk.CTkLabel(self, text="CPU 綁定:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=4, column=0, padx=10, pady=5, sticky="w")
+        self.cpu_var = ctk.StringVar(value=format_cpu_list(self.profile.get('cpu_affinity', [])))
+        ctk.CTkEntry(self, textvariable=self.cpu_var, width=120, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text=f"產生的啟動參數 (Java {self.java_version})", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=5, column=0, columnspan=2, padx=10, pady=(15, 5), sticky="w")
+        self.preview_box = ctk.CTkTextbox(self, height=120, wrap="word", font=ctk.CTkFont(family="Consolas"))
+        self.preview_box.grid(row=6, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
+
+        # Filled from the logs of earlier runs; see core.record_jvm_run
+        ctk.CTkLabel(self, text="各設定的啟動時間與 GC 暫停", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=7, column=0, columnspan=2, padx=10, pady=(15, 5), sticky="w")
+        comparison_box = ctk.CTkTextbox(self, wrap="none", font=ctk.CTkFont(family="Consolas"))
+        comparison_box.grid(row=8, column=0, columnspan=2, padx=10, pady=5, sticky="nsew")
+        comparison_box.insert("end", "\n".join(format_jvm_comparison(compare_jvm_profiles(self.server_path))))
+        comparison_box.configure(state="disabled")
+        self.grid_rowconfigure(8, weight=1)
+
+        ctk.CTkButton(self, text="💾 儲存並重新產生啟動檔", command=self.save_and_close,
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=9, column=1, padx=10, pady=20, sticky="e")
+        self.update_preview()
+
+    def read_values(self):
+        return (self.profile_names[self.profile_var.get()], int(self.min_ram_var.get()), int(self.max_ram_var.get()),
+                self.extra_var.get().split())
+
+    def update_preview(self, _=None):
+        try:
+            profile_name, min_ram, max_ram, extra_args = self.read_values()
+            text = " ".join(build_jvm_args(min_ram, max_ram, self.java_version, profile_name, extra_args,
+                                           load_settings().get('jvm_gc_logging', True)))
+            try: capacity_warning = check_capacity({self.server_path: max_ram})
+            except Exception as e: capacity_warning = str(e)
+            if capacity_warning: text += f"\n\n⚠ {capacity_warning}"
+        except ValueError:
+            text = "記憶體必須是整數 (MB)"
+        except Exception as e:
+            text = str(e)
+        self.preview_box.delete("1.0", "end")
+        self.preview_box.insert("end", text)
+
+    def save_and_close(self):
+        try:
+            cpus = parse_cpu_list(self.cpu_var.get())
+            update_jvm_settings(self.server_path, *self.read_values())
+            set_cpu_affinity(self.server_path, cpus)
+            messagebox.showinfo("成功", "JVM 參數已儲存，下次啟動伺服器時生效！", parent=self)
+            self.destroy()
+        except ValueError:
+            messagebox.showerror("錯誤", "記憶體必須是整數 (MB)", parent=self)
+        except Exception as e:
+            messagebox.showerror("錯誤", f"儲存失敗：\n{e}", parent=self)
+
+# --- Backup Restore Window ---
+class RestoreWindow(ctk.CTkToplevel):
+    """Browses the backups of one server and restores all of it, one dimension, or the ticked files and folders."""
+    MAX_LISTED = 300
+    SCOPES = {"整個伺服器": None, "主世界": 'overworld', "地獄": 'nether', "終界": 'end', "勾選的檔案": 'files'}
+
+    def __init__(self, master, server_path):
+        super().__init__(master)
+        self.server_path = server_path
+        self.title(f"還原 {os.path.basename(server_path)} 的備份")
+        self.geometry("760x620")
+        self.grab_set()
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(3, weight=1)
+        self.prefix = ''
+        self.selected = {}
+
+        backups = [backup['name'] for backup in list_backups(server_path)]
+        if not backups:
+            ctk.CTkLabel(self, text="這個伺服器還沒有任何備份。", font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=0, padx=20, pady=20)
+            return
+
+        ctk.CTkLabel(self, text="備份:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=0, padx=10, pady=(10, 5), sticky="w")
+        self.backup_var = ctk.StringVar(value=backups[0])
+        ctk.CTkOptionMenu(self, variable=self.backup_var, values=backups, command=self.change_backup, width=280,
+                         font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=1, padx=10, pady=(10, 5), sticky="w")
+
+        ctk.CTkLabel(self, text="還原範圍:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.scope_var = ctk.StringVar(value="勾選的檔案")
+        ctk.CTkOptionMenu(self, variable=self.scope_var, values=list(self.SCOPES), width=160,
+                         font=ctk.CTkFont(family="Noto Sans TC")).grid(row=1, column=1, padx=10, pady=5, sticky="w")
+
+        nav_frame = ctk.CTkFrame(self, fg_color="transparent"); nav_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
+        ctk.CTkButton(nav_frame, text="⬆ 上一層", width=80, command=self.go_up,
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left")
+        self.prefix_label = ctk.CTkLabel(nav_frame, text="", anchor="w", font=ctk.CTkFont(family="Consolas"))
+        self.prefix_label.pack(side="left", padx=10)
+
+        self.list_frame = ctk.CTkScrollableFrame(self)
+        self.list_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky="nsew")
+        self.list_frame.grid_columnconfigure(1, weight=1)
+
+        self.progressbar = ctk.CTkProgressBar(self); self.progressbar.set(0)
+        self.progressbar.grid(row=4, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
+        self.status_label = ctk.CTkLabel(self, text="", anchor="w", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.status_label.grid(row=5, column=0, columnspan=2, padx=10, sticky="w")
+        self.restore_button = ctk.CTkButton(self, text="♻ 還原", command=self.start_restore,
+                                            font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.restore_button.grid(row=6, column=1, padx=10, pady=15, sticky="e")
+        self.show_folder('')
+
+    def change_backup(self, _=None):
+        self.selected.clear()
+        self.show_folder('')
+
+    def go_up(self):
+        if self.prefix: self.show_folder(self.prefix.rpartition('/')[0])
+
+    def show_folder(self, prefix):
+        try:
+            children = browse_backup(self.server_path, self.backup_var.get(), prefix)
+        except Exception as e:
+            messagebox.showerror("錯誤", f"無法讀取備份：\n{e}", parent=self); return
+        self.prefix = prefix
+        self.prefix_label.configure(text=f"/{prefix}")
+        for widget in self.list_frame.winfo_children(): widget.destroy()
+        for row, child in enumerate(children[:self.MAX_LISTED]):
+            name = child['name'].rpartition('/')[2]
+            if child['name'] not in self.selected: self.selected[child['name']] = ctk.BooleanVar()
+            var = self.selected[child['name']]
+            ctk.CTkCheckBox(self.list_frame, text="", width=24, variable=var).grid(row=row, column=0, padx=5, pady=2)
+            if child['type'] == 'dir':
+                ctk.CTkButton(self.list_frame, text=f"📁 {name}", anchor="w", fg_color="transparent", text_color=("gray10", "gray90"),
+                             command=lambda path=child['name']: self.show_folder(path),
+                             font=ctk.CTkFont(family="Noto Sans TC")).grid(row=row, column=1, padx=5, pady=2, sticky="ew")
+            else:
+                ctk.CTkLabel(self.list_frame, text=f"📄 {name}", anchor="w",
+                             font=ctk.CTkFont(family="Noto Sans TC")).grid(row=row, column=1, padx=13, pady=2, sticky="ew")
+            ctk.CTkLabel(self.list_frame, text=f"{child['size'] / 1024 / 1024:.1f} MB ({child['files']} 個檔案)", text_color="gray",
+                         font=ctk.CTkFont(family="Noto Sans TC")).grid(row=row, column=2, padx=10, pady=2, sticky="e")
+        if len(children) > self.MAX_LISTED:
+            ctk.CTkLabel(self.list_frame, text=f"只顯示前 {self.MAX_LISTED} 項 (共 {len(children)} 項)，可勾選整個資料夾一起還原", text_color="gray",
+                         font=ctk.CTkFont(family="Noto Sans TC")).grid(row=self.MAX_LISTED, column=1, padx=5, pady=5, sticky="w")
+
+    def start_restore(self):
+        scope = self.SCOPES[self.scope_var.get()]
+        dimension, paths = (None, None) if scope in (None, 'files') else (scope, None)
+        if scope == 'files':
+            paths = [name for name, var in self.selected.items() if var.get()]
+            if not paths:
+                messagebox.showerror("錯誤", "請先勾選要還原的檔案或資料夾！", parent=self); return
+        target = self.scope_var.get() if scope != 'files' else f"{len(paths)} 個勾選的項目"
+        if not messagebox.askyesno("確認還原", f"要用 {self.backup_var.get()} 覆蓋{target}嗎？\n目前的檔案將被取代。", parent=self):
+            return
+        self.restore_button.configure(state="disabled")
+        worker = Worker(restore_backup, self.server_path, self.backup_var.get(), self.report_progress, dimension=dimension, paths=paths)
+        worker.start()
+        self.after(100, self.check_restore_status, worker)
+
+    def report_progress(self, text, value):
+        self.status_label.configure(text=text)
+        self.progressbar.set(value)
+
+    def check_restore_status(self, worker):
+        if worker.is_alive():
+            self.after(100, self.check_restore_status, worker); return
+        self.restore_button.configure(state="normal")
+        if isinstance(worker.result, Exception):
+            messagebox.showerror("還原失敗", f"發生錯誤，伺服器檔案未被修改：\n{worker.result}", parent=self)
+        else:
+            messagebox.showinfo("還原成功", f"已還原 {worker.result} 個檔案！", parent=self)
+            self.destroy()
+
+# --- World Analysis Window ---
+class WorldWindow(ctk.CTkToplevel):
+    """Region file statistics of one server's world, and pruning of chunks players never spent time in."""
+    def __init__(self, master, server_path):
+        super().__init__(master)
+        self.server_path = server_path
+        self.title(f"{os.path.basename(server_path)} 世界分析")
+        self.geometry("820x600")
+        self.grab_set()
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        top_frame = ctk.CTkFrame(self, fg_color="transparent"); top_frame.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
+        self.analyze_button = ctk.CTkButton(top_frame, text="🔍 分析", width=90, command=self.start_analysis,
+                                            font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.analyze_button.pack(side="left")
+        self.inhabited_var = ctk.BooleanVar()
+        ctk.CTkCheckBox(top_frame, text="讀取玩家停留時間 (InhabitedTime，較慢)", variable=self.inhabited_var,
+                        font=ctk.CTkFont(family="Noto Sans TC")).pack(side="left", padx=15)
+
+        self.report_box = ctk.CTkTextbox(self, wrap="none", font=ctk.CTkFont(family="Consolas"))
+        self.report_box.grid(row=1, column=0, padx=10, pady=5, sticky="nsew")
+
+        prune_frame = ctk.CTkFrame(self, fg_color="transparent"); prune_frame.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
+        ctk.CTkLabel(prune_frame, text="刪除玩家停留不超過", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left")
+        self.threshold_var = ctk.StringVar(value=str(load_settings().get('world_prune_max_inhabited_seconds', 0)))
+        ctk.CTkEntry(prune_frame, textvariable=self.threshold_var, width=70, font=ctk.CTkFont(family="Noto Sans TC")).pack(side="left", padx=5)
+        ctk.CTkLabel(prune_frame, text="秒的區塊", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left")
+        self.prune_button = ctk.CTkButton(prune_frame, text="🧹 清理", width=90, command=lambda: self.start_prune(False),
+                                          font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.prune_button.pack(side="right")
+        self.preview_button = ctk.CTkButton(prune_frame, text="預覽", width=90, command=lambda: self.start_prune(True),
+                                            font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.preview_button.pack(side="right", padx=10)
+
+        self.progressbar = ctk.CTkProgressBar(self); self.progressbar.set(0)
+        self.progressbar.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+        self.status_label = ctk.CTkLabel(self, text="", anchor="w", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.status_label.grid(row=4, column=0, padx=10, pady=(0, 10), sticky="w")
+
+    def set_busy(self, busy):
+        for button in (self.analyze_button, self.prune_button, self.preview_button):
+            button.configure(state="disabled" if busy else "normal")
+
+    def report_progress(self, text, value):
+        self.status_label.configure(text=text)
+        self.progressbar.set(value)
+
+    def start_analysis(self):
+        self.set_busy(True)
+        worker = Worker(analyze_world, self.server_path, self.inhabited_var.get(), self.report_progress)
+        worker.start()
+        self.after(100, self.check_worker, worker, self.show_report)
+
+    def start_prune(self, dry_run):
+        try:
+            threshold = int(self.threshold_var.get())
+        except ValueError:
+            messagebox.showerror("錯誤", "停留時間必須是整數 (秒)", parent=self); return
+        if not dry_run and not messagebox.askyesno(
+                "確認清理", f"要刪除玩家停留不超過 {threshold} 秒的區塊嗎？\n這些區塊會在玩家再次到達時重新生成，建議先備份。", parent=self):
+            return
+        self.set_busy(True)
+        worker = Worker(prune_world, self.server_path, threshold, None, dry_run, self.report_progress)
+        worker.start()
+        self.after(100, self.check_worker, worker, self.show_prune_result)
+
+    def check_worker(self, worker, on_done):
+        if worker.is_alive():
+            self.after(100, self.check_worker, worker, on_done); return
+        self.set_busy(False)
+        if isinstance(worker.result, Exception):
+            messagebox.showerror("錯誤", f"發生錯誤：\n{worker.result}", parent=self)
+        else:
+            on_done(worker.result)
+
+    def show_report(self, report):
+        self.report_box.delete("1.0", "end")
+        self.report_box.insert("end", "\n".join(format_world_report(report)))
+        self.status_label.configure(text="分析完成")
+
+    def show_prune_result(self, result):
+        if result['dry_run']:
+            text = f"將刪除 {result['chunks_removed']} 個區塊 (影響 {result['regions_changed']} 個區域檔)"
+        else:
+            text = (f"已刪除 {result['chunks_removed']} 個區塊，移除 {result['regions_deleted']} 個區域檔，"
+                    f"釋放 {result['bytes_freed'] / 1024 / 1024:.1f} MB")
+        self.status_label.configure(text=text)
+
+# --- World Pre-generation Window ---
+class PregenWindow(ctk.CTkToplevel):
+    """Starts, pauses and cancels chunk pre-generation of one server and shows its rate, ETA and memory."""
+    def __init__(self, master, server_path):
+        super().__init__(master)
+        self.server_path = server_path
+        self.title(f"預先生成 {os.path.basename(server_path)} 的世界")
+        self.geometry("640x360")
+        self.grid_columnconfigure(1, weight=1)
+        settings = load_settings()
+
+        ctk.CTkLabel(self, text="半徑 (格):", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=0, padx=10, pady=(10, 5), sticky="w")
+        self.radius_var = ctk.StringVar(value="2000")
+        ctk.CTkEntry(self, textvariable=self.radius_var, width=120, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=1, padx=10, pady=(10, 5), sticky="w")
+
+        ctk.CTkLabel(self, text="中心 X Z:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.center_var = ctk.StringVar()
+        ctk.CTkEntry(self, textvariable=self.center_var, width=120, placeholder_text="重生點",
+                     font=ctk.CTkFont(family="Noto Sans TC")).grid(row=1, column=1, padx=10, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text="方式:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        self.method_var = ctk.StringVar(value=settings.get('pregen_method', 'auto'))
+        ctk.CTkOptionMenu(self, variable=self.method_var, values=list(PREGEN_METHODS), width=120,
+                         font=ctk.CTkFont(family="Noto Sans TC")).grid(row=2, column=1, padx=10, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text="MSPT 門檻:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        self.mspt_var = ctk.StringVar(value=str(settings.get('pregen_mspt_threshold', 45)))
+        ctk.CTkEntry(self, textvariable=self.mspt_var, width=120, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=3, column=1, padx=10, pady=5, sticky="w")
+
+        self.progressbar = ctk.CTkProgressBar(self); self.progressbar.set(0)
+        self.progressbar.grid(row=4, column=0, columnspan=2, padx=10, pady=(15, 5), sticky="ew")
+        self.status_label = ctk.CTkLabel(self, text="", anchor="w", wraplength=600, justify="left", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.status_label.grid(row=5, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+        button_frame = ctk.CTkFrame(self, fg_color="transparent"); button_frame.grid(row=6, column=0, columnspan=2, padx=10, pady=15, sticky="e")
+        self.start_button = ctk.CTkButton(button_frame, text="▶ 開始", width=90, command=self.start_job,
+                                          font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.start_button.pack(side="left", padx=5)
+        self.pause_button = ctk.CTkButton(button_frame, text="⏸ 暫停", width=90, command=self.toggle_pause,
+                                          font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.pause_button.pack(side="left", padx=5)
+        self.cancel_button = ctk.CTkButton(button_frame, text="■ 取消", width=90, command=lambda: self.control(PREGEN.cancel),
+                                           font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.cancel_button.pack(side="left", padx=5)
+        self.refresh_status()
+
+    def start_job(self):
+        try:
+            center = [int(value) for value in self.center_var.get().split()] or None
+            if center is not None and len(center) != 2: raise ValueError
+            PREGEN.start(self.server_path, int(self.radius_var.get()), center=center, method=self.method_var.get(),
+                         mspt_threshold=float(self.mspt_var.get()))
+        except ValueError:
+            messagebox.showerror("錯誤", "半徑與 MSPT 門檻必須是數字，中心座標請輸入兩個整數 (X Z)！", parent=self)
+        except Exception as e:
+            messagebox.showerror("錯誤", str(e), parent=self)
+
+    def toggle_pause(self):
+        job = PREGEN.get(self.server_path)
+        self.control(PREGEN.resume if job and job.user_paused else PREGEN.pause)
+
+    def control(self, action):
+        try: action(self.server_path)
+        except Exception as e: messagebox.showerror("錯誤", str(e), parent=self)
+
+    def refresh_status(self):
+        if not self.winfo_exists(): return
+        job = PREGEN.get(self.server_path)
+        active = job is not None and job.is_active()
+        if job:
+            status = job.status()
+            self.status_label.configure(text=format_pregen_status(status))
+            self.progressbar.set(status['percent'] / 100)
+        self.start_button.configure(state="disabled" if active else "normal")
+        self.pause_button.configure(state="normal" if active else "disabled", text="▶ 繼續" if active and job.user_paused else "⏸ 暫停")
+        self.cancel_button.configure(state="normal" if active else "disabled")
+        self.after(1000, self.refresh_status)
+
+# --- Sparkline Widget ---
+class Sparkline(ctk.CTkCanvas):
+    def __init__(self, master, color, width=120, height=28, **kwargs):
+        # Canvas has no transparency, so borrow the colour of the nearest opaque parent
+        parent = master
+        while parent.cget("fg_color") == "transparent":
+            parent = parent.master
+        bg = parent._apply_appearance_mode(parent.cget("fg_color"))
+        super().__init__(master, width=width, height=height, bg=bg, highlightthickness=0, **kwargs)
+        self.color, self.width, self.height = color, width, height
+
+    def draw(self, values, max_value=None):
+        self.delete("all")
+        if len(values) < 2: return
+        top = max_value or max(values) or 1
+        step = self.width / (len(values) - 1)
+        points = []
+        for index, value in enumerate(values):
+            points += [index * step, self.height - 2 - (min(value, top) / top) * (self.height - 4)]
+        self.create_line(*points, fill=self.color, width=1.5)
+
+# --- Server Console Window ---
+class ConsoleWindow(ctk.CTkToplevel):
+    def __init__(self, master, server_path):
+        super().__init__(master)
+        self.supervisor = get_supervisor(server_path)
+        self.title(f"{os.path.basename(server_path)} 主控台")
+        self.geometry("800x500")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self.output_box = ctk.CTkTextbox(self, wrap="none", font=ctk.CTkFont(family="Consolas"))
+        self.output_box.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="nsew")
+        self.command_entry = ctk.CTkEntry(self, placeholder_text="輸入指令後按 Enter 送出...",
+                                          font=ctk.CTkFont(family="Noto Sans TC"))
+        self.command_entry.grid(row=1, column=0, padx=10, pady=(5, 10), sticky="ew")
+        self.command_entry.bind("<Return>", self.send_command)
+
+        # Output arrives on the supervisor's reader thread, so hand it over through a queue
+        self.pending_lines = queue.Queue()
+        if self.supervisor.console:
+            self.output_box.insert("end", "\n".join(self.supervisor.console) + "\n")
+        self.supervisor.add_listener(self.pending_lines.put)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.after(200, self.drain_output)
+
+    def drain_output(self):
+        lines = []
+        while not self.pending_lines.empty() and len(lines) < 500:
+            lines.append(self.pending_lines.get_nowait())
+        if lines:
+            self.output_box.insert("end", "\n".join(lines) + "\n")
+            self.output_box.see("end")
+        self.after(200, self.drain_output)
+
+    def send_command(self, event=None):
+        command = self.command_entry.get().strip()
+        if not command: return
+        try:
+            self.supervisor.send_command(command)
+            self.command_entry.delete(0, "end")
+        except Exception as e:
+            messagebox.showerror("錯誤", str(e), parent=self)
+
+    def close(self):
+        self.supervisor.remove_listener(self.pending_lines.put)
+        self.destroy()
+
+# --- Server List Row ---
+class ServerRow(ctk.CTkFrame):
+    """One row of the server list. Rows are recycled while scrolling; show() points a row at another server."""
+    def __init__(self, master, view, **kwargs):
+        # The list area is transparent, so use the raised colour the old cards got from their scrollable frame
+        kwargs.setdefault("fg_color", ctk.ThemeManager.theme["CTkFrame"]["top_fg_color"])
+        super().__init__(master, **kwargs)
+        self.view = view
+        self.path = None
+        self.grid_columnconfigure(0, weight=1)
+        self.title_label = ctk.CTkLabel(self, text="", anchor="w", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.title_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.path_label = ctk.CTkLabel(self, text="", anchor="w", text_color="gray", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.path_label.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="w")
+
+        metrics_frame = ctk.CTkFrame(self, fg_color="transparent"); metrics_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="w")
+        self.cpu_line = Sparkline(metrics_frame, color="#2098D1"); self.cpu_line.pack(side="left", padx=(0, 5))
+        self.ram_line = Sparkline(metrics_frame, color="#3FA34D"); self.ram_line.pack(side="left", padx=5)
+        self.metrics_label = ctk.CTkLabel(metrics_frame, text="未執行", text_color="gray", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.metrics_label.pack(side="left", padx=10)
+
+        # Buttons read self.path when clicked, so they follow the row to whichever server it shows
+        button_frame = ctk.CTkFrame(self, fg_color="transparent"); button_frame.grid(row=0, column=1, rowspan=2, padx=10, pady=5, sticky="e")
+        ctk.CTkButton(button_frame, text="▶ 啟動", width=80, command=lambda: self.view.start_server(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="■ 停止", width=80, command=lambda: self.view.request_stop(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="🔄 重啟", width=80, command=lambda: self.view.request_restart(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="📜 主控台", width=80, command=lambda: self.view.open_console(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        self.backup_button = ctk.CTkButton(button_frame, text="💾 備份", width=80, command=lambda: self.view.backup_server(self.path),
+                                           font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
+        self.backup_button.pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="⚙ 屬性", width=80, command=lambda: self.view.open_properties_editor(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="☕ JVM", width=80, command=lambda: self.view.open_jvm_editor(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="♻ 還原", width=80, command=lambda: self.view.open_restore_window(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="🌍 世界", width=80, command=lambda: self.view.open_world_window(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="⛏ 預生成", width=80, command=lambda: self.view.open_pregen_window(self.path),
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+
+    @staticmethod
+    def set_text(widget, text):
+        # Reconfiguring a CTk widget redraws it, so skip values that did not change
+        if widget.cget("text") != text: widget.configure(text=text)
+
+    def show(self, server_info):
+        path = os.path.normpath(server_info['path'])
+        if path != self.path:
+            self.path = path
+            self.cpu_line.draw([]); self.ram_line.draw([])
+        self.set_text(self.title_label, f"類型: {server_info.get('core_type', '?')} | 版本: {server_info.get('version', '?')}")
+        self.set_text(self.path_label, f"路徑: {server_info['path']}")
+        backing_up = path in self.view.backups_running or is_backup_running(path)
+        self.set_text(self.backup_button, "備份中..." if backing_up else "💾 備份")
+        self.backup_button.configure(state="disabled" if backing_up else "normal")
+        self.refresh_metrics()
+
+    def refresh_metrics(self):
+        history = get_server_metrics(self.path)
+        latest = history.latest() if history and is_server_running(self.path) else None
+        if latest is None:
+            self.set_text(self.metrics_label, "未執行")
+            self.cpu_line.draw([]); self.ram_line.draw([])
+            return
+        self.cpu_line.draw(history.series('cpu_percent'), max_value=100 * (os.cpu_count() or 1))
+        self.ram_line.draw(history.series('rss_mb'))
+        text = (f"CPU {latest['cpu_percent']:.0f}% | RAM {latest['rss_mb']:.0f}MB | "
+                f"執行緒 {latest['threads']:.0f} | 讀 {latest['read_kbps']:.0f}KB/s 寫 {latest['write_kbps']:.0f}KB/s")
+        parser = get_supervisor(self.path).parser
+        if parser.tps: text += f" | TPS {parser.tps[0]:.1f}"
+        if parser.mspt: text += f" | MSPT {parser.mspt[0]:.1f}"
+        if parser.ready: text += f" | 玩家 {len(parser.players)}"
+        job = PREGEN.get(self.path)
+        if job and job.is_active(): text += f" | 預先生成 {job.done * 100 / job.total:.0f}%"
+        restart = RESTARTS.active.get(self.path)
+        if restart: text += f" | 重新啟動：{RESTART_STATE_LABELS.get(restart['state'], restart['state'])}"
+        self.set_text(self.metrics_label, text)
+
 # --- Server Management Interface ---
 class ManageView(ctk.CTkFrame):
+    ALL_CORES, ALL_STATUSES = "全部核心", "全部狀態"
+    STATUS_FILTERS = [ALL_STATUSES, "執行中", "已停止"]
+    SORT_OPTIONS = ["名稱", "核心", "版本", "狀態", "CPU", "記憶體"]
+    # Sort orders that depend on live state are re-applied on every metrics refresh
+    LIVE_SORTS = {"狀態", "CPU", "記憶體"}
+
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs, fg_color="transparent")
         self.grid_columnconfigure(0, weight=1)
@@ -716,16 +853,188 @@ class ManageView(ctk.CTkFrame):
                      font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=2, padx=5, pady=10)
         ctk.CTkButton(self.scan_frame, text="🔍 掃描伺服器", command=self.scan_servers,
                      font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=3, padx=10, pady=10)
-        self.scrollable_frame = ctk.CTkScrollableFrame(self, label_text="找到的伺服器")
-        self.scrollable_frame.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
-        self.grid_rowconfigure(1, weight=1)
+
+        filter_frame = ctk.CTkFrame(self, fg_color="transparent")
+        filter_frame.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="ew")
+        filter_frame.grid_columnconfigure(0, weight=1)
+        self.search_entry = ctk.CTkEntry(filter_frame, placeholder_text="🔎 搜尋路徑、核心或版本...",
+                                         font=ctk.CTkFont(family="Noto Sans TC"))
+        self.search_entry.grid(row=0, column=0, padx=(0, 10), sticky="ew")
+        self.search_entry.bind("<KeyRelease>", lambda event: self.schedule_refresh())
+        self.core_filter_var = ctk.StringVar(value=self.ALL_CORES)
+        self.core_filter_menu = ctk.CTkOptionMenu(filter_frame, variable=self.core_filter_var, values=[self.ALL_CORES], width=120,
+                                                  command=lambda value: self.schedule_refresh(), font=ctk.CTkFont(family="Noto Sans TC"))
+        self.core_filter_menu.grid(row=0, column=1, padx=5)
+        self.status_filter_var = ctk.StringVar(value=self.ALL_STATUSES)
+        ctk.CTkOptionMenu(filter_frame, variable=self.status_filter_var, values=self.STATUS_FILTERS, width=110,
+                          command=lambda value: self.schedule_refresh(), font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=2, padx=5)
+        ctk.CTkLabel(filter_frame, text="排序:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=3, padx=(10, 5))
+        self.sort_var = ctk.StringVar(value=self.SORT_OPTIONS[0])
+        ctk.CTkOptionMenu(filter_frame, variable=self.sort_var, values=self.SORT_OPTIONS, width=100,
+                          command=lambda value: self.schedule_refresh(), font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=4, padx=(5, 0))
+
+        # Only as many rows as fit on screen exist; scrolling rebinds them to other servers
+        list_frame = ctk.CTkFrame(self)
+        list_frame.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
+        list_frame.grid_columnconfigure(0, weight=1)
+        list_frame.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.rows_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
+        self.rows_frame.grid(row=0, column=0, sticky="nsew")
+        self.rows_frame.grid_propagate(False)
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.scrollbar = ctk.CTkScrollbar(list_frame, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, padx=(0, 5), pady=5, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.rows_frame, text="", font=ctk.CTkFont(family="Noto Sans TC"))
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_all(sequence, self.on_mouse_wheel, add="+")
+
         self.status_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(family="Noto Sans TC"))
-        self.status_label.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
+        self.status_label.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+
+        self.servers = {}
+        self.filtered_paths = []
+        self.rows = [ServerRow(self.rows_frame, self)]
+        self.rows_frame.update_idletasks()
+        self.row_height = self.rows[0].winfo_reqheight() + 10
+        self.visible_rows = 1
+        self.rows_frame.bind("<Configure>", self.on_list_resize)
+        self.offset = 0
+        self.refresh_pending = False
+        self.backups_running = set()
+        self.scan_worker = None
+        self.watcher = None
+        self.watch_queue = queue.Queue()
         self.load_path_and_scan()
+        self.after(500, self.apply_watch_events)
+        self.after(1000, self.refresh_metrics)
 
+    def refresh_metrics(self):
+        if self.sort_var.get() in self.LIVE_SORTS or self.status_filter_var.get() != self.ALL_STATUSES:
+            self.refresh_list()
+        else:
+            for row in self.rows[:self.visible_rows]:
+                if row.path is not None: row.refresh_metrics()
+        self.after(int(load_settings().get('metrics_interval_seconds', 2) * 1000), self.refresh_metrics)
+
+    # --- Server list model ---
+    def add_server(self, server_info):
+        self.servers[os.path.normpath(server_info['path'])] = server_info
+        self.schedule_refresh()
+
+    def remove_server(self, path):
+        if self.servers.pop(path, None) is not None:
+            self.schedule_refresh()
+
+    def schedule_refresh(self):
+        # Streaming scans and watcher bursts add many servers at once; redraw once per idle
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.after_idle(self.refresh_list)
+
+    @staticmethod
+    def version_key(version):
+        return [int(part) if part.isdigit() else 0 for part in re.split(r'[.\-+]', str(version))]
+
+    @staticmethod
+    def latest_metric(path, field):
+        history = get_server_metrics(path)
+        latest = history.latest() if history and is_server_running(path) else None
+        return latest[field] if latest else -1.0
+
+    def sort_key(self, path):
+        server = self.servers[path]
+        name = os.path.basename(path).lower()
+        mode = self.sort_var.get()
+        if mode == "核心": return (server.get('core_type', ''), name)
+        if mode == "版本": return (self.version_key(server.get('version', '')), name)
+        if mode == "狀態": return (not is_server_running(path), name)
+        if mode == "CPU": return (-self.latest_metric(path, 'cpu_percent'), name)
+        if mode == "記憶體": return (-self.latest_metric(path, 'rss_mb'), name)
+        return (name, path)
+
+    def matches_filters(self, path):
+        server = self.servers[path]
+        core_filter, status_filter = self.core_filter_var.get(), self.status_filter_var.get()
+        if core_filter != self.ALL_CORES and server.get('core_type') != core_filter: return False
+        if status_filter != self.ALL_STATUSES and is_server_running(path) != (status_filter == "執行中"): return False
+        search = self.search_entry.get().strip().lower()
+        if search:
+            haystack = f"{path} {server.get('core_type', '')} {server.get('version', '')}".lower()
+            return all(term in haystack for term in search.split())
+        return True
+
+    def refresh_list(self):
+        self.refresh_pending = False
+        cores = sorted({server.get('core_type', '?') for server in self.servers.values()})
+        values = [self.ALL_CORES] + cores
+        if self.core_filter_menu.cget("values") != values:
+            self.core_filter_menu.configure(values=values)
+        self.filtered_paths = sorted((path for path in self.servers if self.matches_filters(path)), key=self.sort_key)
+        self.render_rows()
+
+    # --- Virtualized rendering ---
+    def on_list_resize(self, event):
+        needed = max(1, -(-event.height // self.row_height))
+        while len(self.rows) < needed:
+            self.rows.append(ServerRow(self.rows_frame, self))
+        if needed != self.visible_rows:
+            self.visible_rows = needed
+            self.render_rows()
+
+    def max_offset(self):
+        fully_visible = max(1, self.rows_frame.winfo_height() // self.row_height)
+        return max(0, len(self.filtered_paths) - fully_visible)
+
+    def render_rows(self):
+        self.offset = min(self.offset, self.max_offset())
+        visible_paths = self.filtered_paths[self.offset:self.offset + self.visible_rows]
+        for index, row in enumerate(self.rows):
+            if index < len(visible_paths):
+                row.show(self.servers[visible_paths[index]])
+                row.grid(row=index, column=0, padx=10, pady=5, sticky="ew")
+            else:
+                row.grid_remove()
+                row.path = None
+
+        if self.filtered_paths:
+            self.empty_label.grid_remove()
+        else:
+            self.empty_label.configure(text="(´・ω・`) 找不到任何由本工具安裝的伺服器..." if not self.servers
+                                       else "沒有符合篩選條件的伺服器")
+            self.empty_label.grid(row=0, column=0, pady=20)
+        total = len(self.filtered_paths)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render_rows()
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(round(float(value) * len(self.filtered_paths)))
+        elif action == "scroll":
+            step = self.visible_rows - 1 if unit == "pages" else 1
+            self.scroll_to(self.offset + int(float(value)) * max(1, step))
+
+    def on_mouse_wheel(self, event):
+        widget, rows = str(event.widget), str(self.rows_frame)
+        if widget != rows and not widget.startswith(rows + "."): return
+        direction = -1 if event.num == 4 or getattr(event, 'delta', 0) > 0 else 1
+        self.scroll_to(self.offset + direction)
+
+    # --- Scanning and live updates ---
     def load_path_and_scan(self):
         settings = load_settings()
-        self.scan_path_entry.insert(0, settings.get('scan_path', '')); self.scan_servers()
+        self.scan_path_entry.insert(0, settings.get('scan_path', ''))
+        # Servers remembered from the last scan show up at once; the rescan then runs in the background
+        for server in get_known_servers(self.scan_path_entry.get()): self.add_server(server)
+        self.scan_servers()
 
     def browse_scan_path(self):
         path = filedialog.askdirectory()
@@ -735,50 +1044,126 @@ class ManageView(ctk.CTkFrame):
 
     def scan_servers(self):
         if not self.scan_path_entry.get(): return
-        for widget in self.scrollable_frame.winfo_children(): widget.destroy()
-        servers = scan_for_servers(self.scan_path_entry.get())
-        if not servers:
-            ctk.CTkLabel(self.scrollable_frame, text="(´・ω・`) 找不到任何由本工具安裝的伺服器...",
-                        font=ctk.CTkFont(family="Noto Sans TC")).pack(pady=20)
+        if self.scan_worker is not None and self.scan_worker.is_alive(): return
+        found_queue = queue.Queue()
+        self.scan_worker = Worker(scan_for_servers, self.scan_path_entry.get(), found_queue.put)
+        self.scan_worker.start()
+        self.status_label.configure(text="正在掃描伺服器...")
+        self.after(100, self.check_scan_status, found_queue, set())
+
+    def check_scan_status(self, found_queue, found_paths):
+        while True:
+            try: server = found_queue.get_nowait()
+            except queue.Empty: break
+            path = os.path.normpath(server['path'])
+            found_paths.add(path)
+            if self.servers.get(path) != server: self.add_server(server)
+        if self.scan_worker.is_alive():
+            self.after(100, self.check_scan_status, found_queue, found_paths)
             return
-        for server in servers: self.add_server_widget(server)
-
-    def add_server_widget(self, server_info):
-        card = ctk.CTkFrame(self.scrollable_frame); card.pack(fill="x", padx=10, pady=5)
-        card.grid_columnconfigure(0, weight=1)
-        ctk.CTkLabel(card, text=f"類型: {server_info['core_type']} | 版本: {server_info['version']}", anchor="w",
-                    font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=0, padx=10, pady=5, sticky="w")
-        ctk.CTkLabel(card, text=f"路徑: {server_info['path']}", anchor="w", text_color="gray",
-                    font=ctk.CTkFont(family="Noto Sans TC")).grid(row=1, column=0, padx=10, pady=(0, 5), sticky="w")
-        
-        button_frame = ctk.CTkFrame(card, fg_color="transparent"); button_frame.grid(row=0, column=1, rowspan=2, padx=10, pady=5, sticky="e")
-        ctk.CTkButton(button_frame, text="▶ 啟動", width=80, command=lambda p=server_info['path']: self.start_server(p),
-                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
-        backup_button = ctk.CTkButton(button_frame, text="💾 備份", width=80,
-                                    font=ctk.CTkFont(family="Noto Sans TC", weight="bold"))
-        backup_button.configure(command=lambda p=server_info['path'], b=backup_button: self.backup_server(p, b))
-        backup_button.pack(side="left", padx=5)
-        ctk.CTkButton(button_frame, text="⚙ 屬性", width=80, command=lambda p=server_info['path']: self.open_properties_editor(p),
-                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=5)
+        if isinstance(self.scan_worker.result, Exception):
+            self.status_label.configure(text=f"掃描失敗：{self.scan_worker.result}")
+            return
+        if not found_queue.empty():
+            self.after(0, self.check_scan_status, found_queue, found_paths)
+            return
+        for path in [path for path in self.servers if path not in found_paths]:
+            self.remove_server(path)
+        self.status_label.configure(text=f"找到 {len(self.servers)} 個伺服器")
+        self.start_watcher()
+
+    def start_watcher(self):
+        root = os.path.normpath(os.path.abspath(self.scan_path_entry.get()))
+        if self.watcher is not None:
+            if self.watcher.root == root: return
+            self.watcher.stop()
+            self.watcher = None
+        if not load_settings().get('watch_filesystem', True): return
+        # Events arrive on the watcher thread and are applied from the Tk loop
+        self.watcher = ServerWatcher(root, self.watch_queue.put)
+        self.watcher.start()
+
+    def apply_watch_events(self):
+        while True:
+            try: events = self.watch_queue.get_nowait()
+            except queue.Empty: break
+            for event in events:
+                path = os.path.normpath(event['path'])
+                if event['type'] == 'removed':
+                    if path in self.servers:
+                        self.remove_server(path)
+                        self.status_label.configure(text=f"{os.path.basename(path)} 已被移除")
+                elif event['type'] == 'added':
+                    if path not in self.servers:
+                        self.add_server(event['server'])
+                        self.status_label.configure(text=f"發現新的伺服器：{os.path.basename(path)}")
+                elif path in self.servers:
+                    if PROFILE_FILE_NAME in event['files']:
+                        self.add_server(event['server'])
+                    if 'server.properties' in event['files']:
+                        self.status_label.configure(text=f"{os.path.basename(path)} 的 server.properties 已在外部修改")
+        self.after(500, self.apply_watch_events)
 
     def open_properties_editor(self, server_path): PropertiesEditor(self, server_path)
 
+    def open_jvm_editor(self, server_path): JvmEditor(self, server_path)
+
+    def open_restore_window(self, server_path):
+        if is_server_running(server_path):
+            messagebox.showerror("錯誤", "請先停止伺服器再還原備份！"); return
+        RestoreWindow(self, server_path)
+
+    def open_world_window(self, server_path): WorldWindow(self, server_path)
+
+    def open_pregen_window(self, server_path): PregenWindow(self, server_path)
+
+    def open_console(self, server_path): ConsoleWindow(self, server_path)
+
     def start_server(self, path):
-        try: run_server(path); self.status_label.configure(text=f"正在啟動 {os.path.basename(path)}...")
-        except Exception as e: messagebox.showerror("啟動失敗", f"無法啟動伺服器：\n{e}")
+        try: warning = run_server(path); self.status_label.configure(text=f"正在啟動 {os.path.basename(path)}...")
+        except Exception as e: messagebox.showerror("啟動失敗", f"無法啟動伺服器：\n{e}"); return
+        if warning: messagebox.showwarning("記憶體不足", warning)
+
+    def request_stop(self, path):
+        if not is_server_running(path):
+            self.status_label.configure(text=f"{os.path.basename(path)} 沒有在執行中。"); return
+        self.status_label.configure(text=f"正在停止 {os.path.basename(path)}，請稍候...")
+        worker = Worker(stop_server, path)
+        worker.start()
+        self.after(100, self.check_stop_status, worker, path)
+
+    def request_restart(self, path):
+        name = os.path.basename(path)
+        if not is_server_running(path):
+            self.status_label.configure(text=f"{name} 沒有在執行中。"); return
+        if not messagebox.askyesno("重新啟動", f"要重新啟動 {name} 嗎？\n線上玩家會先收到倒數通知，所有玩家離線後會立即重啟。"): return
+        try: restart_server(path)
+        except Exception as e: messagebox.showerror("重新啟動失敗", str(e)); return
+        self.status_label.configure(text=f"正在重新啟動 {name}，停機時間會顯示在主控台")
+
+    def check_stop_status(self, worker, path):
+        if worker.is_alive():
+            self.after(100, self.check_stop_status, worker, path)
+        elif isinstance(worker.result, Exception):
+            messagebox.showerror("停止失敗", f"發生錯誤：\n{worker.result}")
+        else:
+            self.status_label.configure(text=f"{os.path.basename(path)} 已停止 (代碼 {worker.result})")
 
-    def backup_server(self, path, button):
-        button.configure(state="disabled", text="備份中...")
+    def backup_server(self, path):
+        if path in self.backups_running: return
+        self.backups_running.add(path)
+        self.render_rows()
         self.status_label.configure(text=f"正在備份 {os.path.basename(path)}，請稍候...")
         worker = Worker(create_backup, path, lambda t, v: self.status_label.configure(text=t))
         worker.start()
-        self.after(100, self.check_backup_status, worker, button)
+        self.after(100, self.check_backup_status, worker, path)
 
-    def check_backup_status(self, worker, button):
+    def check_backup_status(self, worker, path):
         if worker.is_alive():
-            self.after(100, self.check_backup_status, worker, button)
+            self.after(100, self.check_backup_status, worker, path)
         else:
-            button.configure(state="normal", text="💾 備份")
+            self.backups_running.discard(path)
+            self.render_rows()
             if isinstance(worker.result, Exception):
                 messagebox.showerror("備份失敗", f"發生錯誤：\n{worker.result}")
                 self.status_label.configure(text="備份失敗！ ( TДT)")
@@ -810,7 +1195,9 @@ class SettingsView(ctk.CTkFrame):
         self.mode_menu.grid(row=0, column=1, padx=(0, 20), pady=5, sticky="w")
 
         # --- 伺服器啟動設定 ---
-        ctk.CTkLabel(self, text="伺服器啟動設定", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=2, column=0, columnspan=3, padx=20, pady=(20, 5), sticky="w")
+        ctk.CTkLabel(self, text="伺服器啟動設定", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=2, column=0, padx=20, pady=(20, 5), sticky="w")
+        self.capacity_label = ctk.CTkLabel(self, text="", text_color="gray", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.capacity_label.grid(row=2, column=1, columnspan=2, padx=20, pady=(20, 5), sticky="e")
         
         self.total_ram_mb = round(psutil.virtual_memory().total / (1024**2))
         
@@ -831,8 +1218,11 @@ class SettingsView(ctk.CTkFrame):
         self.gui_switch_var = ctk.BooleanVar()
         ctk.CTkSwitch(self, text="啟動伺服器時顯示圖形化介面 (GUI)", variable=self.gui_switch_var,
                      font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=6, column=0, columnspan=2, padx=20, pady=15, sticky="w")
+        self.restart_switch_var = ctk.BooleanVar()
+        ctk.CTkSwitch(self, text="伺服器當機時自動重新啟動", variable=self.restart_switch_var,
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=7, column=0, columnspan=2, padx=20, pady=15, sticky="w")
 
-        eula_frame = ctk.CTkFrame(self, fg_color="transparent"); eula_frame.grid(row=7, column=0, columnspan=2, padx=20, pady=15, sticky="w")
+        eula_frame = ctk.CTkFrame(self, fg_color="transparent"); eula_frame.grid(row=8, column=0, columnspan=2, padx=20, pady=15, sticky="w")
         self.eula_switch_var = ctk.BooleanVar()
         ctk.CTkSwitch(eula_frame, text="自動同意 Mojang EULA", variable=self.eula_switch_var,
                      font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left")
@@ -842,10 +1232,10 @@ class SettingsView(ctk.CTkFrame):
         eula_link.pack(side="left", padx=10)
         eula_link.bind("<Button-1>", lambda e: webbrowser.open("https://www.minecraft.net/eula"))
         
-        ctk.CTkLabel(self, text="新伺服器預設設定", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=8, column=0, columnspan=3, padx=20, pady=(20, 10), sticky="w")
+        ctk.CTkLabel(self, text="新伺服器預設設定", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=9, column=0, columnspan=3, padx=20, pady=(20, 10), sticky="w")
         
         props_frame1 = ctk.CTkFrame(self, fg_color="transparent")
-        props_frame1.grid(row=9, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+        props_frame1.grid(row=10, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
         props_frame1.grid_columnconfigure((1, 3), weight=1)
         
         ctk.CTkLabel(props_frame1, text="預設連接埠:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=0, padx=(0, 10), pady=5, sticky="w")
@@ -857,7 +1247,7 @@ class SettingsView(ctk.CTkFrame):
         ctk.CTkEntry(props_frame1, textvariable=self.default_players_var, width=100, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=3, pady=5, sticky="w")
         
         props_frame2 = ctk.CTkFrame(self, fg_color="transparent")
-        props_frame2.grid(row=10, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+        props_frame2.grid(row=11, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
         props_frame2.grid_columnconfigure((1, 3), weight=1)
         
         ctk.CTkLabel(props_frame2, text="預設遊戲難度:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=0, padx=(0, 10), pady=5, sticky="w")
@@ -871,7 +1261,7 @@ class SettingsView(ctk.CTkFrame):
                          width=120, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=3, pady=5, sticky="w")
         
         props_frame3 = ctk.CTkFrame(self, fg_color="transparent")
-        props_frame3.grid(row=11, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+        props_frame3.grid(row=12, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
         
         self.default_online_mode_var = ctk.BooleanVar(value=True)
         ctk.CTkSwitch(props_frame3, text="預設啟用正版驗證", variable=self.default_online_mode_var,
@@ -879,12 +1269,93 @@ class SettingsView(ctk.CTkFrame):
         
         self.default_pvp_var = ctk.BooleanVar(value=True)
         ctk.CTkSwitch(props_frame3, text="預設啟用PVP", variable=self.default_pvp_var,
-                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left")
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=(0, 30))
+
+        ctk.CTkLabel(props_frame3, text="預設 JVM 參數:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=(0, 10))
+        self.default_jvm_profile_var = ctk.StringVar(value=JVM_PROFILES['auto'])
+        ctk.CTkOptionMenu(props_frame3, variable=self.default_jvm_profile_var, values=list(JVM_PROFILES.values()),
+                         width=180, font=ctk.CTkFont(family="Noto Sans TC")).pack(side="left")
         
+        ctk.CTkLabel(self, text="備份與重新啟動設定", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=13, column=0, columnspan=3, padx=20, pady=(20, 10), sticky="w")
+
+        backup_frame = ctk.CTkFrame(self, fg_color="transparent")
+        backup_frame.grid(row=14, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+
+        ctk.CTkLabel(backup_frame, text="備份模式:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=0, padx=(0, 10), pady=5, sticky="w")
+        self.backup_mode_var = ctk.StringVar(value="完整壓縮檔")
+        ctk.CTkOptionMenu(backup_frame, variable=self.backup_mode_var, values=["完整壓縮檔", "增量備份"],
+                         width=140, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=1, pady=5, sticky="w")
+
+        ctk.CTkLabel(backup_frame, text="排程 (cron):", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=2, padx=(20, 10), pady=5, sticky="w")
+        self.backup_schedule_var = ctk.StringVar()
+        ctk.CTkEntry(backup_frame, textvariable=self.backup_schedule_var, width=140, placeholder_text="例如 0 */6 * * *",
+                     font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=3, pady=5, sticky="w")
+        ctk.CTkLabel(backup_frame, text="同時備份數:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=0, column=4, padx=(20, 10), pady=5, sticky="w")
+        self.backup_concurrency_var = ctk.StringVar()
+        ctk.CTkEntry(backup_frame, textvariable=self.backup_concurrency_var, width=50,
+                     font=ctk.CTkFont(family="Noto Sans TC")).grid(row=0, column=5, pady=5, sticky="w")
+
+        ctk.CTkLabel(backup_frame, text="備份位置:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=1, column=0, padx=(0, 10), pady=5, sticky="w")
+        self.backup_target_var = ctk.StringVar()
+        ctk.CTkEntry(backup_frame, textvariable=self.backup_target_var, font=ctk.CTkFont(family="Noto Sans TC")).grid(row=1, column=1, columnspan=4, pady=5, sticky="ew")
+        ctk.CTkButton(backup_frame, text="瀏覽", width=60, command=self.browse_backup_target,
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=1, column=5, padx=(10, 0), pady=5, sticky="w")
+
+        retention_frame = ctk.CTkFrame(backup_frame, fg_color="transparent"); retention_frame.grid(row=2, column=0, columnspan=6, pady=5, sticky="w")
+        self.backup_prune_var = ctk.BooleanVar()
+        ctk.CTkSwitch(retention_frame, text="排程備份後清理舊備份，保留:", variable=self.backup_prune_var,
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left", padx=(0, 10))
+        self.retention_vars = {}
+        for key, label in (('last', "最新"), ('hourly', "每小時"), ('daily', "每日"), ('weekly', "每週")):
+            ctk.CTkLabel(retention_frame, text=label, font=ctk.CTkFont(family="Noto Sans TC")).pack(side="left", padx=(10, 5))
+            self.retention_vars[key] = ctk.StringVar()
+            ctk.CTkEntry(retention_frame, textvariable=self.retention_vars[key], width=45,
+                         font=ctk.CTkFont(family="Noto Sans TC")).pack(side="left")
+
+        ctk.CTkLabel(backup_frame, text="重啟排程 (cron):", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=3, column=0, padx=(0, 10), pady=5, sticky="w")
+        self.restart_schedule_var = ctk.StringVar()
+        ctk.CTkEntry(backup_frame, textvariable=self.restart_schedule_var, width=140, placeholder_text="例如 0 5 * * *",
+                     font=ctk.CTkFont(family="Noto Sans TC")).grid(row=3, column=1, pady=5, sticky="w")
+        ctk.CTkLabel(backup_frame, text="錯開秒數:", font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=3, column=2, padx=(20, 10), pady=5, sticky="w")
+        self.restart_stagger_var = ctk.StringVar()
+        ctk.CTkEntry(backup_frame, textvariable=self.restart_stagger_var, width=50,
+                     font=ctk.CTkFont(family="Noto Sans TC")).grid(row=3, column=3, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text="下載快取", font=ctk.CTkFont(family="Noto Sans TC", size=16, weight="bold")).grid(row=15, column=0, columnspan=3, padx=20, pady=(20, 10), sticky="w")
+
+        cache_frame = ctk.CTkFrame(self, fg_color="transparent")
+        cache_frame.grid(row=16, column=0, columnspan=3, padx=20, pady=5, sticky="ew")
+        self.cache_label = ctk.CTkLabel(cache_frame, text="", font=ctk.CTkFont(family="Noto Sans TC"))
+        self.cache_label.pack(side="left", padx=(0, 20))
+        ctk.CTkButton(cache_frame, text="🧹 清空快取", width=120, command=self.clear_artifact_cache,
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).pack(side="left")
+
         ctk.CTkButton(self, text="💾 儲存設定", command=self.save_all_settings,
-                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=12, column=1, columnspan=2, padx=20, pady=20, sticky="e")
+                     font=ctk.CTkFont(family="Noto Sans TC", weight="bold")).grid(row=17, column=1, columnspan=2, padx=20, pady=20, sticky="e")
         self.load_and_display_settings()
 
+    def browse_backup_target(self):
+        path = filedialog.askdirectory()
+        if path: self.backup_target_var.set(path)
+
+    def refresh_capacity_label(self):
+        plan = plan_capacity()
+        text = (f"主機 {plan['total_mb']} MB，{len(plan['servers'])} 台伺服器預估使用 {plan['committed_mb']} MB / "
+                f"可配置 {plan['budget_mb']} MB")
+        if plan['over_commit_mb']:
+            self.capacity_label.configure(text=f"{text} (超額 {plan['over_commit_mb']} MB)", text_color=("red", "#cc0000"))
+        else:
+            self.capacity_label.configure(text=f"{text}，建議新伺服器最大 {plan['suggested_new_max_ram_mb']} MB", text_color="gray")
+
+    def refresh_cache_label(self):
+        entries, total = list_artifact_cache()
+        self.cache_label.configure(text=f"快取大小: {total/1024/1024:.1f} MB ({len(entries)} 個檔案)")
+
+    def clear_artifact_cache(self):
+        removed, freed = prune_artifact_cache(max_bytes=0)
+        self.refresh_cache_label()
+        messagebox.showinfo("成功", f"已清除 {removed} 個快取檔案，釋放 {freed/1024/1024:.1f} MB。")
+
     def change_mode(self, mode_chinese: str):
         mode_map = {"淺色": "light", "深色": "dark", "系統": "system"}
         ctk.set_appearance_mode(mode_map.get(mode_chinese, "system"))
@@ -923,6 +1394,7 @@ class SettingsView(ctk.CTkFrame):
         self.java_switch_var.set(self.settings.get('auto_download_java', False))
         self.gui_switch_var.set(self.settings.get('use_server_gui', False))
         self.eula_switch_var.set(self.settings.get('auto_accept_eula', True))
+        self.restart_switch_var.set(self.settings.get('auto_restart', True))
         
         self.default_port_var.set(self.settings.get('default_server_port', '25565'))
         self.default_players_var.set(self.settings.get('default_max_players', '20'))
@@ -930,6 +1402,20 @@ class SettingsView(ctk.CTkFrame):
         self.default_gamemode_var.set(self.settings.get('default_gamemode', 'survival'))
         self.default_online_mode_var.set(self.settings.get('default_online_mode', True))
         self.default_pvp_var.set(self.settings.get('default_pvp', True))
+        self.default_jvm_profile_var.set(JVM_PROFILES.get(self.settings.get('default_jvm_profile', 'auto'), JVM_PROFILES['auto']))
+
+        backup_mode_map_rev = {"full": "完整壓縮檔", "incremental": "增量備份"}
+        self.backup_mode_var.set(backup_mode_map_rev.get(self.settings.get('backup_mode', 'full'), "完整壓縮檔"))
+        self.backup_schedule_var.set(self.settings.get('backup_schedule', ''))
+        self.backup_concurrency_var.set(str(self.settings.get('backup_max_concurrent', 2)))
+        self.backup_target_var.set(self.settings.get('backup_target_dir', ''))
+        self.backup_prune_var.set(self.settings.get('backup_prune', False))
+        for key, var in self.retention_vars.items():
+            var.set(str(self.settings.get(f'backup_keep_{key}', 0)))
+        self.restart_schedule_var.set(self.settings.get('restart_schedule', ''))
+        self.restart_stagger_var.set(str(self.settings.get('restart_stagger_seconds', 60)))
+        self.refresh_cache_label()
+        self.refresh_capacity_label()
     
     def save_all_settings(self):
         mode_map = {"淺色": "light", "深色": "dark", "系統": "system"}
@@ -941,6 +1427,7 @@ class SettingsView(ctk.CTkFrame):
         self.settings['auto_download_java'] = self.java_switch_var.get()
         self.settings['use_server_gui'] = self.gui_switch_var.get()
         self.settings['auto_accept_eula'] = self.eula_switch_var.get()
+        self.settings['auto_restart'] = self.restart_switch_var.get()
         
         self.settings['default_server_port'] = self.default_port_var.get()
         self.settings['default_max_players'] = self.default_players_var.get()
@@ -948,6 +1435,30 @@ class SettingsView(ctk.CTkFrame):
         self.settings['default_gamemode'] = self.default_gamemode_var.get()
         self.settings['default_online_mode'] = self.default_online_mode_var.get()
         self.settings['default_pvp'] = self.default_pvp_var.get()
+        self.settings['default_jvm_profile'] = {label: name for name, label in JVM_PROFILES.items()}.get(self.default_jvm_profile_var.get(), 'auto')
+
+        backup_mode_map = {"完整壓縮檔": "full", "增量備份": "incremental"}
+        self.settings['backup_mode'] = backup_mode_map.get(self.backup_mode_var.get(), "full")
+        backup_schedule = self.backup_schedule_var.get().strip()
+        restart_schedule = self.restart_schedule_var.get().strip()
+        # Schedules are checked on their own, so a bad cron field is never reported as a bad number
+        try:
+            for schedule in (backup_schedule, restart_schedule):
+                if schedule: CronSchedule(schedule)
+        except Exception as e:
+            messagebox.showerror("錯誤", str(e)); return
+        try:
+            numbers = {'backup_max_concurrent': max(1, int(self.backup_concurrency_var.get())),
+                       'restart_stagger_seconds': max(0, int(self.restart_stagger_var.get()))}
+            for key, var in self.retention_vars.items():
+                numbers[f'backup_keep_{key}'] = max(0, int(var.get()))
+        except ValueError:
+            messagebox.showerror("錯誤", "同時備份數、保留數量與錯開秒數必須是整數！"); return
+        self.settings['backup_schedule'] = backup_schedule
+        self.settings['restart_schedule'] = restart_schedule
+        self.settings.update(numbers)
+        self.settings['backup_target_dir'] = self.backup_target_var.get().strip()
+        self.settings['backup_prune'] = self.backup_prune_var.get()
         
         save_settings(self.settings)
 
@@ -1102,6 +1613,21 @@ class App(ctk.CTk):
         self.about_frame = AboutView(master=self.tab_view.tab("ℹ 關於"))
         self.about_frame.pack(fill="both", expand=True)
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        Worker(prefetch_catalogues).start()
+        start_backup_scheduler()
+        start_restart_scheduler()
+        if load_settings().get('api_enabled'):
+            # Servers started through the API share SUPERVISORS with the GUI
+            Worker(run_api_server).start()
+
+    def on_close(self):
+        if any(supervisor.is_running() for supervisor in SUPERVISORS.values()):
+            if not messagebox.askyesno("伺服器仍在執行", "還有伺服器正在執行中！\n要停止所有伺服器並離開嗎？"):
+                return
+            stop_all_servers()
+        self.destroy()
+
 if __name__ == "__main__":
     # Load settings to apply appearance mode before app starts
     settings = load_settings()
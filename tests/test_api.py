@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import core
+
+TOKEN = 'test-token'
+
+class ControlServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patcher = mock.patch.object(core, 'load_settings', return_value=dict(core.DEFAULT_SETTINGS))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.control = api.ControlServer(host='127.0.0.1', port=0, token=TOKEN)
+        await self.control.start()
+        self.addAsyncCleanup(self.close_server)
+
+    async def close_server(self):
+        self.control.server.close()
+        await self.control.server.wait_closed()
+
+    async def request(self, method, path, payload=None, token=TOKEN):
+        """Sends one HTTP/1.1 request over a real socket and returns (status, JSON body)."""
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.control.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        headers = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\nContent-Length: {len(body)}\r\n"
+        if token is not None:
+            headers += f"Authorization: Bearer {token}\r\n"
+        writer.write(headers.encode('latin-1') + b"\r\n" + body)
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1')
+        length = int(next(line.split(':', 1)[1] for line in head.split("\r\n") if line.lower().startswith('content-length')))
+        data = await reader.readexactly(length)
+        writer.close()
+        return int(head.split(' ')[1]), json.loads(data)
+
+    async def test_token_is_required(self):
+        for token in (None, 'wrong-token'):
+            status, body = await self.request('GET', '/api/pregen', token=token)
+            self.assertEqual(status, 401)
+            self.assertIn('error', body)
+        status, _ = await self.request('GET', f'/api/pregen?token={TOKEN}', token=None)
+        self.assertEqual(status, 200)
+
+    async def test_dispatch(self):
+        status, body = await self.request('GET', '/api/pregen')
+        self.assertEqual((status, body), (200, {'jobs': []}))
+        self.assertEqual((await self.request('GET', '/api/nowhere'))[0], 404)
+        self.assertEqual((await self.request('GET', '/api/servers/stop'))[0], 405)
+        self.assertEqual((await self.request('POST', '/api/servers/stop', {}))[0], 400)
+        status, body = await self.request('GET', '/api/console?path=/not/a/managed/server')
+        self.assertEqual(status, 404)
+        self.assertNotIn(os.path.normpath('/not/a/managed/server'), core.SUPERVISORS)
+
+    async def test_handler_errors_get_a_response(self):
+        with mock.patch.object(core.BACKUP_QUEUE, 'submit', side_effect=RuntimeError("boom")):
+            status, body = await self.request('POST', '/api/servers/backup', {'path': '/srv/a', 'queue': True})
+        self.assertEqual((status, body), (500, {'error': "boom"}))
+
+    async def test_outside_server_is_not_killed_on_windows(self):
+        proc = mock.Mock()
+        with mock.patch.object(core, 'find_server_process', return_value=proc), \
+             mock.patch.object(core.sys, 'platform', 'win32'):
+            status, body = await self.request('POST', '/api/servers/stop', {'path': '/srv/outside'})
+        self.assertEqual(status, 400)
+        proc.terminate.assert_not_called()
+        proc.kill.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
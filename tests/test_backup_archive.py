@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+class BackupArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        source = os.path.join(self.temp.name, 'server')
+        os.makedirs(os.path.join(source, 'world', 'region'))
+        self.contents = {
+            'server.properties': b"motd=A Minecraft Server\n" * 50,
+            'empty.txt': b'',
+            # Spans several blocks, so the deflate streams of different workers are concatenated
+            'world/level.dat': os.urandom(1024) * (core.BACKUP_BLOCK_SIZE * 2 // 1024 + 3),
+            # Stored as-is
+            'world/region/r.0.0.mca': os.urandom(core.BACKUP_BLOCK_SIZE + 17),
+        }
+        self.file_list = []
+        for name, data in self.contents.items():
+            path = os.path.join(source, *name.split('/'))
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.file_list.append((path, name))
+        settings = dict(core.DEFAULT_SETTINGS, backup_workers=4)
+        patcher = mock.patch.object(core, 'load_settings', return_value=settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_and_check(self):
+        zip_path = os.path.join(self.temp.name, 'backup.zip')
+        calls = []
+        core.write_backup_archive(zip_path, self.file_list, lambda text, value: calls.append(value))
+        with zipfile.ZipFile(zip_path) as zipf:
+            self.assertIsNone(zipf.testzip())
+            self.assertEqual(sorted(zipf.namelist()), sorted(self.contents))
+            for name, data in self.contents.items():
+                self.assertEqual(zipf.read(name), data)
+            self.assertEqual(zipf.getinfo('world/region/r.0.0.mca').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zipf.getinfo('world/level.dat').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertAlmostEqual(calls[-1], 1.0)
+
+    def test_parallel_writer(self):
+        with zipfile.ZipFile(os.path.join(self.temp.name, 'probe.zip'), 'w') as zipf:
+            if not core._supports_raw_zip_writes(zipf):
+                self.skipTest("parallel writer is not enabled on this Python version")
+        self.write_and_check()
+
+    def test_fallback_writer(self):
+        with mock.patch.object(core, '_supports_raw_zip_writes', return_value=False):
+            self.write_and_check()
+
+if __name__ == '__main__':
+    unittest.main()
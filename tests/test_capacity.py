@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+SERVERS = [{'path': '/srv/a', 'max_ram_mb': 2048}, {'path': '/srv/b', 'max_ram_mb': 4096}]
+
+class CapacityPlanTest(unittest.TestCase):
+    def setUp(self):
+        for target, value in (('load_settings', mock.Mock(return_value=dict(core.DEFAULT_SETTINGS))),
+                              ('get_known_servers', mock.Mock(return_value=SERVERS)),
+                              ('_running_scan', {'time': float('-inf'), 'paths': frozenset(), 'found': frozenset()})):
+            patcher = mock.patch.object(core, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.scan = mock.Mock(return_value={'/srv/b': mock.Mock()})
+        patcher = mock.patch.object(core, 'find_server_processes', self.scan)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_heap_checks_do_not_scan_processes(self):
+        for max_ram in range(1024, 1034):
+            core.check_capacity({'/srv/a': max_ram})
+        self.scan.assert_not_called()
+
+    def test_process_scan_is_reused(self):
+        for _ in range(5):
+            plan = core.plan_capacity({'/srv/a': 1024}, running_only=True)
+            core.check_capacity({'/srv/a': 1024}, running_only=True)
+        self.assertEqual(self.scan.call_count, 1)
+        self.assertEqual(sorted(server['path'] for server in plan['servers']), ['/srv/a', '/srv/b'])
+        with mock.patch.object(core.time, 'monotonic', return_value=core.time.monotonic() + core.RUNNING_SCAN_TTL_SECONDS):
+            core.plan_capacity(running_only=True)
+        self.assertEqual(self.scan.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import ServerProperties
+
+# Characters str.splitlines() treats as line breaks but java.util.Properties does not
+NON_BREAKING = ['\f', '\v', '\x1c', '\x1d', '\x1e', '\x85', '\u2028', '\u2029']
+
+class ServerPropertiesRoundTripTest(unittest.TestCase):
+    def test_unchanged_file_is_written_back_verbatim(self):
+        for newline in ('\n', '\r\n', '\r'):
+            for char in NON_BREAKING:
+                text = f"#comment{newline}motd=a{char}b{newline}max-players=20{newline}"
+                properties = ServerProperties.parse(text)
+                self.assertEqual(properties.as_dict(), {'motd': f"a{char}b", 'max-players': '20'})
+                self.assertEqual(properties.dumps(), text)
+
+    def test_latin1_value_is_not_split(self):
+        data = "motd=caf\x85e\r\nlevel-name=world\r\n".encode('latin-1')
+        properties = ServerProperties.parse(data.decode('latin-1'), 'latin-1')
+        self.assertEqual(properties.keys(), ['motd', 'level-name'])
+        self.assertEqual(properties.dumps().encode('latin-1'), data)
+
+    def test_changed_values_survive_a_round_trip(self):
+        properties = ServerProperties.parse("motd=old\n")
+        for char in NON_BREAKING:
+            properties.set('motd', f"a{char}b", validate=False)
+            reparsed = ServerProperties.parse(properties.dumps())
+            self.assertEqual(reparsed.as_dict(), {'motd': f"a{char}b"})
+
+    def test_continuation_lines(self):
+        text = "motd=first \\\n    second\nport=25565\n"
+        properties = ServerProperties.parse(text)
+        self.assertEqual(properties.as_dict(), {'motd': 'first second', 'port': '25565'})
+        self.assertEqual(properties.dumps(), text)
+
+    def test_unicode_escapes(self):
+        properties = ServerProperties.parse("motd=\\u00e9t\\u00C9 \\ud83d\\ude00\n")
+        self.assertEqual(properties.get('motd'), "\u00e9t\u00c9 \U0001f600")
+
+    def test_malformed_unicode_escapes_are_rejected(self):
+        for escape in ("\\u0x41", "\\u+041", "\\u-041", "\\u 041", "\\u4", "\\u00g1", "\\u"):
+            with self.subTest(escape=escape):
+                with self.assertRaises(Exception):
+                    ServerProperties.parse(f"motd={escape}\nport=25565\n")
+
+    def test_unpaired_surrogates_round_trip(self):
+        for escape, value in (("\\ud800", "\ud800"), ("\\udc00x", "\udc00x"), ("\\ude00\\ud83d", "\ude00\ud83d")):
+            with self.subTest(escape=escape):
+                text = f"motd={escape}\n"
+                properties = ServerProperties.parse(text)
+                self.assertEqual(properties.get('motd'), value)
+                self.assertEqual(properties.dumps(), text)
+                properties.set('level-name', value, validate=False)
+                self.assertEqual(ServerProperties.parse(properties.dumps()).get('level-name'), value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+# Prints a Done line like a server and exits cleanly on 'stop', otherwise runs until stdin closes
+FAKE_SERVER = r"""
+import sys
+print('[00:00:00] [Server thread/INFO]: Done (0.1s)! For help, type "help"', flush=True)
+for line in sys.stdin:
+    if line.strip().lstrip('/') == 'stop':
+        print('[00:00:00] [Server thread/INFO]: Stopping server', flush=True)
+        sys.exit(0)
+"""
+
+class ServerSupervisorTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        settings = dict(core.DEFAULT_SETTINGS, auto_restart=True)
+        for target, value in (('load_settings', mock.Mock(return_value=settings)),
+                              ('build_launch_command', mock.Mock(return_value=[sys.executable, '-c', FAKE_SERVER])),
+                              ('record_jvm_run', mock.Mock())):
+            patcher = mock.patch.object(core, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # A crash would be relaunched at once, so a wrong relaunch shows up within the test
+        patcher = mock.patch.object(core.ServerSupervisor, 'RESTART_BACKOFF_BASE', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.supervisor = core.ServerSupervisor(self.temp.name)
+        self.addCleanup(self.supervisor.stop, 5)
+
+    def launches(self):
+        return sum(line.startswith("[Manager] 啟動伺服器") for line in list(self.supervisor.console))
+
+    def start_until_ready(self):
+        self.supervisor.start()
+        deadline = time.monotonic() + 10
+        while not self.supervisor.parser.ready and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return deadline
+
+    def test_console_stop_is_not_restarted(self):
+        for command in ('stop', '/stop', ' stop '):
+            with self.subTest(command=command):
+                deadline = self.start_until_ready()
+                process = self.supervisor.process
+                self.supervisor.send_command(command)
+                process.wait(10)
+                self.supervisor.watch_thread.join(10)
+                time.sleep(0.5)
+                self.assertFalse(self.supervisor.is_running())
+                self.assertEqual(self.supervisor.last_exit_code, 0)
+                self.assertLess(time.monotonic(), deadline)
+        self.assertEqual(self.launches(), 3)
+
+    def test_unexpected_exit_is_restarted(self):
+        self.start_until_ready()
+        self.supervisor.process.stdin.close()
+        deadline = time.monotonic() + 10
+        while self.launches() < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.launches(), 2)
+
+if __name__ == '__main__':
+    unittest.main()